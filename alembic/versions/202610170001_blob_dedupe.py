@@ -0,0 +1,51 @@
+"""blob-level dedupe tables
+
+Revision ID: 202610170001
+Revises: 202607230001
+Create Date: 2026-10-17 00:01:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "202610170001"
+down_revision = "202607230001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("file_versions", sa.Column("blob_oid", sa.String(length=64)))
+    op.create_table(
+        "blobs",
+        sa.Column("repo_id", sa.String(length=80), sa.ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("oid", sa.String(length=64), primary_key=True),
+        sa.Column("language", sa.String(length=80)),
+        sa.Column("chunker_version", sa.String(length=40), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("first_sha", sa.String(length=40), nullable=False),
+        sa.Column("storage_kind", sa.String(length=40), nullable=False),
+        sa.Column("s3_key", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_table(
+        "blob_chunks",
+        sa.Column("repo_id", sa.String(length=80), sa.ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("blob_oid", sa.String(length=64), primary_key=True),
+        sa.Column("ordinal", sa.Integer(), primary_key=True),
+        sa.Column("chunk_type", sa.String(length=40), nullable=False),
+        sa.Column("node_type", sa.String(length=80), nullable=False),
+        sa.Column("symbol_name", sa.Text()),
+        sa.Column("line_start", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("line_end", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("blob_chunks")
+    op.drop_table("blobs")
+    with op.batch_alter_table("file_versions") as batch:
+        batch.drop_column("blob_oid")
@@ -0,0 +1,83 @@
+"""packed float embedding cache vectors
+
+Revision ID: 202610170002
+Revises: 202610170001
+Create Date: 2026-10-17 00:02:00
+"""
+
+from array import array
+import json
+import struct
+import sys
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "202610170002"
+down_revision = "202610170001"
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+
+
+def _pack(vector: list[float]) -> bytes:
+    packed = array("f", vector)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: bytes, dtype: str) -> list[float]:
+    if dtype == "float16":
+        return list(struct.unpack(f"<{len(data) // 2}e", data))
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def _convert(select_sql: str, update: sa.TextClause, convert) -> None:
+    # Keyset pagination over the primary key; each fetched batch is rewritten before the next read.
+    bind = op.get_bind()
+    last_id = ""
+    while True:
+        rows = bind.execute(sa.text(select_sql), {"last_id": last_id, "limit": _BATCH}).fetchall()
+        if not rows:
+            return
+        updates = [{"id": row[0], "value": convert(*row[1:])} for row in rows if row[1] is not None]
+        if updates:
+            bind.execute(update, updates)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column("embedding_cache", sa.Column("vector_blob", sa.LargeBinary()))
+    op.add_column(
+        "embedding_cache",
+        sa.Column("vector_dtype", sa.String(length=16), nullable=False, server_default="float32"),
+    )
+    _convert(
+        "SELECT id, vector_json FROM embedding_cache WHERE id > :last_id ORDER BY id LIMIT :limit",
+        sa.text("UPDATE embedding_cache SET vector_blob = :value WHERE id = :id").bindparams(
+            sa.bindparam("value", type_=sa.LargeBinary())
+        ),
+        lambda value: _pack(json.loads(value) if isinstance(value, str) else value),
+    )
+    with op.batch_alter_table("embedding_cache") as batch:
+        batch.drop_column("vector_json")
+
+
+def downgrade() -> None:
+    op.add_column("embedding_cache", sa.Column("vector_json", sa.JSON()))
+    _convert(
+        "SELECT id, vector_blob, vector_dtype FROM embedding_cache WHERE id > :last_id ORDER BY id LIMIT :limit",
+        sa.text("UPDATE embedding_cache SET vector_json = :value WHERE id = :id").bindparams(
+            sa.bindparam("value", type_=sa.JSON())
+        ),
+        lambda value, dtype: _unpack(bytes(value), dtype),
+    )
+    with op.batch_alter_table("embedding_cache") as batch:
+        batch.drop_column("vector_dtype")
+        batch.drop_column("vector_blob")
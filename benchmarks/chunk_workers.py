@@ -0,0 +1,52 @@
+"""Throughput of ``ChunkingExecutor`` from one process up to ``--max-workers``.
+
+Chunks the first commit of a synthetic repository (every file is new, as in a
+bootstrap). Pool start-up is excluded by warming each executor with one batch
+before timing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+from time import perf_counter
+
+from gitrag.ingest.executor import ChunkingExecutor
+from synthetic_repo import python_module
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--functions", type=int, default=40)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    items = [
+        (f"src/module_{index}.py", python_module(index, 0, args.functions), "Python") for index in range(args.files)
+    ]
+    levels = sorted({1, *(2**n for n in range(1, 8) if 2**n < args.max_workers), args.max_workers})
+    baseline = None
+    expected = None
+    for workers in levels:
+        with ChunkingExecutor(workers) as executor:
+            executor.map(items[: workers * 2])
+            samples = []
+            for _ in range(args.repeat):
+                start = perf_counter()
+                results = executor.map(items)
+                samples.append(perf_counter() - start)
+        expected = expected or results
+        assert results == expected, "pool results differ from single-process chunking"
+        elapsed = statistics.median(samples)
+        baseline = baseline or elapsed
+        print(
+            f"workers {workers:3}  {elapsed * 1000:9.1f} ms  {args.files / elapsed:8.0f} files/s"
+            f"  speedup {baseline / elapsed:4.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
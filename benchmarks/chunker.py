@@ -0,0 +1,70 @@
+"""Microbenchmark for ``chunk_file_content`` on large generated Python and JavaScript files.
+
+Compares the cursor-based walk with the previous recursive generator.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+from time import perf_counter
+
+from gitrag.ingest.chunker import chunk_file_content, get_parser, is_chunk_node, node_chunk
+from synthetic_repo import python_module
+
+
+def javascript_module(functions: int) -> str:
+    parts = []
+    for fn in range(functions):
+        parts.append(f"function fn{fn}(value) {{\n  const total = value + {fn};\n  return total;\n}}\n")
+        parts.append(f"const arrow{fn} = (value) => {{\n  return value * {fn};\n}};\n")
+    return "".join(parts)
+
+
+def recursive_chunks(path: str, content: str, parser, language: str) -> list:
+    def walk(node):
+        yield node
+        for child in node.children:
+            yield from walk(child)
+
+    source = content.encode("utf-8", errors="ignore")
+    tree = parser.parse(source)
+    return [node_chunk(node, source, path, language) for node in walk(tree.root_node) if is_chunk_node(node, language)]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append(perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("generated.py", "Python", python_module(0, 1, args.lines // 5)),
+        ("generated.js", "JavaScript", javascript_module(args.lines // 7)),
+    ]
+    for path, language, content in cases:
+        ts_parser = get_parser(language)
+        if ts_parser is None:
+            print(f"{language}: grammar not installed, skipped")
+            continue
+        assert recursive_chunks(path, content, ts_parser, language) == chunk_file_content(path, content, ts_parser, language)
+        recursive = timed(lambda: recursive_chunks(path, content, ts_parser, language), args.repeat)
+        cursor = timed(lambda: chunk_file_content(path, content, ts_parser, language), args.repeat)
+        lines = content.count("\n")
+        print(
+            f"{language:10} {lines:6} lines  recursive {recursive * 1000:8.1f} ms"
+            f"   cursor {cursor * 1000:8.1f} ms ({recursive / cursor:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Time and peak memory of ``build_commit_graph`` on a synthetic linear history."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import tempfile
+from time import perf_counter
+import tracemalloc
+
+from gitrag.git import build_commit_graph
+from synthetic_repo import build_repo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=1_000_000)
+    parser.add_argument("--repo", help="Existing bare repo to reuse instead of generating one")
+    parser.add_argument("--compare-dicts", action="store_true", help="Also measure the legacy dict-of-dicts layout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(args.repo) if args.repo else None
+        if repo is None:
+            start = perf_counter()
+            repo = build_repo(Path(tmp) / "graph.git", commits=args.commits, files=1, files_per_commit=0)
+            print(f"generated {args.commits} commits in {perf_counter() - start:.1f}s")
+
+        start = perf_counter()
+        graph = build_commit_graph(repo)
+        elapsed = perf_counter() - start
+        print(f"commits={len(graph)} max_depth={max(graph.depths, default=0)}")
+        print(f"build: {elapsed:.2f}s ({len(graph) / elapsed:,.0f} commits/sec)")
+        del graph
+
+        # tracemalloc slows allocation-heavy code a lot, so memory is measured on a second pass.
+        tracemalloc.start()
+        graph = build_commit_graph(repo)
+        retained, peak = tracemalloc.get_traced_memory()
+        print(f"array graph: retained={retained / 2**20:.1f} MiB peak={peak / 2**20:.1f} MiB")
+        if args.compare_dicts:
+            as_dicts = {sha: graph[sha] for sha in graph}
+            total, _ = tracemalloc.get_traced_memory()
+            print(f"equivalent dict-of-dicts: +{(total - retained) / 2**20:.1f} MiB for {len(as_dicts)} commits")
+        tracemalloc.stop()
+
+if __name__ == "__main__":
+    main()
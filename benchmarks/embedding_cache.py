@@ -0,0 +1,105 @@
+"""Embedding cache hit latency: JSON float lists filtered by content hash vs packed floats by primary key.
+
+Both tables live in one SQLite file. ``json`` replays the previous lookup
+(``content_hash IN (...)`` with no index, then ``list(row.vector_json)``);
+``float32``/``float16`` run ``Embedder`` against packed ``vector_blob`` rows.
+Each sample uses a fresh ``Embedder`` so its in-process cache starts empty.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import statistics
+import tempfile
+from time import perf_counter
+
+from sqlalchemy import JSON, Column, MetaData, String, Table, create_engine, select
+from sqlalchemy.orm import Session
+
+from gitrag.config import Settings
+from gitrag.db.models import Base, EmbeddingCache
+from gitrag.db.session import insert_if_absent
+from gitrag.ids import embedding_cache_id, stable_hash
+from gitrag.retrieval.embedding import Embedder, deterministic_vector, pack_vector
+
+legacy_metadata = MetaData()
+legacy = Table(
+    "embedding_cache_json",
+    legacy_metadata,
+    Column("id", String(48), primary_key=True),
+    Column("content_hash", String(64), nullable=False),
+    Column("model", String(120), nullable=False),
+    Column("vector_json", JSON),
+)
+
+
+def legacy_lookup(session: Session, hashes: list[str], model: str) -> dict[str, list[float]]:
+    vectors = {}
+    pending = iter(hashes)
+    while batch := list(itertools.islice(pending, 500)):
+        stmt = select(legacy.c.content_hash, legacy.c.vector_json).where(
+            legacy.c.content_hash.in_(batch), legacy.c.model == model
+        )
+        for hash_value, vector in session.execute(stmt):
+            vectors[hash_value] = list(vector)
+    return vectors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hashes", type=int, default=10_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    settings = Settings()
+    model = settings.openai_embedding_model
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'cache.db')}")
+        Base.metadata.create_all(engine)
+        legacy_metadata.create_all(engine)
+        hashes = [stable_hash(f"chunk-{n}", 64) for n in range(args.hashes)]
+        vectors = {hash_value: deterministic_vector(hash_value, args.dimensions) for hash_value in hashes}
+        with Session(engine) as session:
+            session.execute(
+                legacy.insert(),
+                [
+                    {"id": embedding_cache_id(h, model), "content_hash": h, "model": model, "vector_json": vectors[h]}
+                    for h in hashes
+                ],
+            )
+            session.commit()
+
+        for dtype in ("json", "float32", "float16"):
+            if dtype != "json":
+                with Session(engine) as session:
+                    session.query(EmbeddingCache).delete()
+                    rows = (
+                        {
+                            "id": embedding_cache_id(h, model),
+                            "content_hash": h,
+                            "model": model,
+                            "vector_blob": pack_vector(vectors[h], dtype),
+                            "vector_dtype": dtype,
+                        }
+                        for h in hashes
+                    )
+                    insert_if_absent(session, EmbeddingCache, rows)
+                    session.commit()
+            samples = []
+            for _ in range(args.repeat):
+                with Session(engine) as session:
+                    start = perf_counter()
+                    if dtype == "json":
+                        found = legacy_lookup(session, hashes, model)
+                    else:
+                        found = Embedder(settings)._cached_vectors(session, hashes)
+                    samples.append(perf_counter() - start)
+                assert len(found) == len(hashes)
+            print(f"{dtype:8} {statistics.median(samples) * 1000:9.1f} ms for {args.hashes} hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Measure ``diff_for_file_async`` throughput at different git concurrency limits."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import tempfile
+from time import perf_counter
+
+from gitrag.git import diff_for_file, diff_for_file_async, rev_list_between, set_git_concurrency
+from synthetic_repo import build_repo
+
+
+async def run_diffs(repo: Path, pairs: list[tuple[str, str]]) -> None:
+    await asyncio.gather(*(diff_for_file_async(repo, sha, path) for sha, path in pairs))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--files-per-commit", type=int, default=3)
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = build_repo(Path(tmp) / "bench.git", commits=args.commits, files=args.files, files_per_commit=args.files_per_commit)
+        shas = rev_list_between(repo, None, "main")
+        pairs = [
+            (sha, f"src/module_{(n * args.files_per_commit + k) % args.files}.py")
+            for n, sha in enumerate(shas)
+            for k in range(args.files_per_commit)
+        ]
+
+        start = perf_counter()
+        for sha, path in pairs:
+            diff_for_file(repo, sha, path)
+        baseline = len(pairs) / (perf_counter() - start)
+        print(f"diffs={len(pairs)}")
+        print(f"sync run_git:  {baseline:10.1f} diffs/sec")
+
+        for level in (int(value) for value in args.levels.split(",")):
+            set_git_concurrency(level)
+            start = perf_counter()
+            asyncio.run(run_diffs(repo, pairs))
+            rate = len(pairs) / (perf_counter() - start)
+            print(f"async x{level:<3}     {rate:10.1f} diffs/sec ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare per-file ``git show`` processes with the persistent cat-file reader."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import tempfile
+from time import perf_counter
+
+from gitrag.git import read_blobs, rev_list_between, run_git
+from synthetic_repo import build_repo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--files-per-commit", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = build_repo(Path(tmp) / "bench.git", commits=args.commits, files=args.files, files_per_commit=args.files_per_commit)
+        shas = rev_list_between(repo, None, "main")
+        pairs = [
+            (sha, f"src/module_{(n * args.files_per_commit + k) % args.files}.py")
+            for n, sha in enumerate(shas)
+            for k in range(args.files_per_commit)
+        ]
+
+        start = perf_counter()
+        for sha, path in pairs:
+            run_git(repo, ["show", f"{sha}:{path}"])
+        subprocess_s = perf_counter() - start
+
+        start = perf_counter()
+        for n in range(0, len(pairs), args.files_per_commit):
+            read_blobs(repo, pairs[n : n + args.files_per_commit])
+        batch_s = perf_counter() - start
+
+    print(f"files={len(pairs)}")
+    print(f"git show:        {len(pairs) / subprocess_s:10.1f} files/sec")
+    print(f"cat-file --batch: {len(pairs) / batch_s:10.1f} files/sec ({subprocess_s / batch_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
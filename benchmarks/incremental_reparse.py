@@ -0,0 +1,59 @@
+"""Chunk every version of one large Python file: full reparse vs incremental tree edits."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import tempfile
+from time import perf_counter
+
+from gitrag.git import diff_for_file, read_blobs, rev_list_between
+from gitrag.ingest.chunker import chunk_file_content, get_parser
+from gitrag.ingest.incremental import chunk_file_incremental, line_edits_from_diff
+from synthetic_repo import build_repo
+
+PATH = "src/module_0.py"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--functions", type=int, default=2000)
+    args = parser.parse_args()
+
+    ts_parser = get_parser("Python")
+    if ts_parser is None:
+        raise SystemExit("tree_sitter_python is not installed")
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = build_repo(Path(tmp) / "bench.git", commits=args.commits, files=1, files_per_commit=1, functions=args.functions)
+        shas = rev_list_between(repo, None, "main")
+        contents = read_blobs(repo, [(sha, PATH) for sha in shas])
+        diffs = [diff_for_file(repo, sha, PATH) for sha in shas]
+
+    start = perf_counter()
+    full = [chunk_file_content(PATH, content, ts_parser, "Python") for content in contents]
+    full_s = perf_counter() - start
+
+    start = perf_counter()
+    previous = None
+    incremental = []
+    for content, diff in zip(contents, diffs):
+        chunks, previous = chunk_file_incremental(
+            PATH, content, ts_parser, "Python", previous=previous, line_edits=line_edits_from_diff(diff)
+        )
+        incremental.append(chunks)
+    incremental_s = perf_counter() - start
+
+    carried = sum(
+        sum(1 for a, b in zip(prev, cur) if a is b) for prev, cur in zip(incremental, incremental[1:])
+    )
+    total = sum(len(chunks) for chunks in incremental[1:])
+    print(f"versions={len(contents)} bytes/version={len(contents[-1].encode())} chunks/version={len(full[-1])}")
+    print(f"full reparse: {full_s / len(contents) * 1000:8.2f} ms/version")
+    print(f"incremental:  {incremental_s / len(contents) * 1000:8.2f} ms/version ({full_s / incremental_s:.1f}x)")
+    print(f"chunks carried over: {carried / max(total, 1):.1%}")
+    print(f"identical output: {full == incremental}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Local OpenAI-compatible server for load testing without the real API.
+
+Serves the ``/v1/embeddings`` and ``/v1/chat/completions`` shapes that
+``Embedder`` and ``QueryService._answer`` use, so setting ``OPENAI_BASE_URL``
+to this server runs the real client, dispatcher and retry paths offline. Each
+response is delayed by a sampled latency. Requests over the per-minute
+request/token quotas, plus a random ``--error-rate`` share, get a 429 with
+``Retry-After``. Prompt and completion tokens are counted per endpoint and
+served from ``GET /stats``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from collections import deque
+import random
+import time
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import numpy as np
+
+from gitrag.retrieval.embedding import EMBEDDING_DIMENSIONS, deterministic_vectors
+from gitrag.tokens import estimate_tokens
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """``fixed:MS``, ``uniform:LOW,HIGH`` or ``lognormal:MEDIAN,SIGMA`` (milliseconds) to a seconds sampler."""
+    kind, _, raw = spec.partition(":")
+    values = [float(value) for value in raw.split(",")] if raw else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000.0
+    if kind == "uniform" and len(values) == 2:
+        return lambda: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda: median / 1000.0 * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"unsupported latency spec: {spec!r}")
+
+
+class MinuteQuota:
+    """Sliding 60 s window over requests and tokens; 0 disables a limit."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._window: deque[tuple[float, int]] = deque()
+        self._tokens = 0
+
+    def admit(self, tokens: int) -> float | None:
+        """Record the request and return None, or return the seconds until it would fit."""
+        now = self._clock()
+        while self._window and now - self._window[0][0] >= 60.0:
+            self._tokens -= self._window.popleft()[1]
+        over_requests = self.requests_per_minute and len(self._window) + 1 > self.requests_per_minute
+        over_tokens = self.tokens_per_minute and self._tokens + tokens > self.tokens_per_minute
+        if over_requests or over_tokens:
+            return max(60.0 - (now - self._window[0][0]), 0.0) if self._window else 1.0
+        self._window.append((now, tokens))
+        self._tokens += tokens
+        return None
+
+
+def _rate_limited(retry_after: float, message: str) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": "requests", "param": None, "code": "rate_limit_exceeded"}},
+        status_code=429,
+        headers={"retry-after": f"{retry_after:.3f}"},
+    )
+
+
+def create_app(
+    *,
+    embedding_latency: str = "lognormal:80,0.4",
+    chat_latency: str = "lognormal:900,0.5",
+    requests_per_minute: int = 3000,
+    tokens_per_minute: int = 1_000_000,
+    error_rate: float = 0.0,
+    completion_tokens: int = 200,
+    seed: int | None = None,
+) -> FastAPI:
+    rng = random.Random(seed)
+    latency = {
+        "embeddings": parse_latency(embedding_latency, rng),
+        "chat": parse_latency(chat_latency, rng),
+    }
+    quota = MinuteQuota(requests_per_minute, tokens_per_minute)
+    stats = {
+        endpoint: {"requests": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_s": 0.0}
+        for endpoint in latency
+    }
+    app = FastAPI(title="OpenAI stub")
+
+    async def admit(endpoint: str, tokens: int) -> JSONResponse | None:
+        counters = stats[endpoint]
+        counters["requests"] += 1
+        retry_after = quota.admit(tokens)
+        if retry_after is None and rng.random() < error_rate:
+            retry_after = 0.0
+        if retry_after is not None:
+            counters["rate_limited"] += 1
+            return _rate_limited(retry_after, f"Rate limit reached for {endpoint}")
+        delay = latency[endpoint]()
+        counters["latency_s"] += delay
+        await asyncio.sleep(delay)
+        return None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Token-array inputs are embedded by their text form so they stay deterministic.
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        tokens = sum(len(text) if isinstance(text, list) else estimate_tokens(text) for text in inputs)
+        rejected = await admit("embeddings", tokens)
+        if rejected is not None:
+            return rejected
+        stats["embeddings"]["prompt_tokens"] += tokens
+        model = body.get("model", "text-embedding-3-small")
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+        vectors = deterministic_vectors(texts, dimensions)
+        if body.get("encoding_format") == "base64":
+            # The openai client requests base64 by default and decodes little-endian float32.
+            vectors = [base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode() for vector in vectors]
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": index, "embedding": vector} for index, vector in enumerate(vectors)],
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in body["messages"])
+        limit = body.get("max_completion_tokens") or body.get("max_tokens") or completion_tokens
+        output_tokens = min(completion_tokens, limit)
+        rejected = await admit("chat", prompt_tokens + output_tokens)
+        if rejected is not None:
+            return rejected
+        stats["chat"]["prompt_tokens"] += prompt_tokens
+        stats["chat"]["completion_tokens"] += output_tokens
+        content = " ".join(["stub"] * output_tokens)
+        return {
+            "id": f"chatcmpl-stub-{stats['chat']['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": prompt_tokens + output_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    def get_stats() -> dict:
+        return stats
+
+    @app.post("/stats/reset")
+    def reset_stats() -> dict:
+        for counters in stats.values():
+            for key in counters:
+                counters[key] = 0
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--embedding-latency", default="lognormal:80,0.4")
+    parser.add_argument("--chat-latency", default="lognormal:900,0.5")
+    parser.add_argument("--requests-per-minute", type=int, default=3000)
+    parser.add_argument("--tokens-per-minute", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of admitted requests answered with 429")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        embedding_latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        error_rate=args.error_rate,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Cold and warm latency of a small chunking job with per-job vs process-wide parsers.
+
+``per-job`` rebuilds every grammar and parser at the start of each job, as
+``ingest_commits`` used to; ``registry`` uses ``get_parser``. Cold numbers
+come from a fresh interpreter per sample, warm numbers from repeated jobs in
+one process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+FILES = [
+    ("src/app.py", "Python", "def handler(event):\n    return event\n\nclass Service:\n    def run(self):\n        return 1\n"),
+    ("web/index.js", "JavaScript", "function main() { return 1 }\nconst helper = () => 2\n"),
+    ("cmd/main.go", "Go", "package main\n\nfunc main() {}\n"),
+]
+
+
+def per_job_parsers() -> dict[str, object]:
+    import tree_sitter
+
+    from gitrag.ingest.chunker import GRAMMAR_MODULES, _import_optional, _ts_language
+
+    parsers = {}
+    for language, (module, attr) in GRAMMAR_MODULES.items():
+        ts_language = _ts_language(_import_optional(module), attr)
+        if ts_language is not None:
+            parsers[language] = tree_sitter.Parser(ts_language)
+    return parsers
+
+
+def run_job(mode: str) -> float:
+    from gitrag.ingest.chunker import chunk_file_content, get_parser
+
+    start = perf_counter()
+    if mode == "per-job":
+        parsers = per_job_parsers()
+        lookup = parsers.get
+    else:
+        lookup = get_parser
+    for path, language, content in FILES:
+        chunk_file_content(path, content, lookup(language), language)
+    return perf_counter() - start
+
+
+def child(mode: str, jobs: int) -> None:
+    import gitrag.ingest.chunker  # noqa: F401  (exclude package import time from the job)
+
+    print(json.dumps([run_job(mode) for _ in range(jobs)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cold-samples", type=int, default=5)
+    parser.add_argument("--warm-jobs", type=int, default=500)
+    parser.add_argument("--child", choices=["per-job", "registry"])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.warm_jobs)
+        return
+
+    for mode in ("per-job", "registry"):
+        cold = []
+        for _ in range(args.cold_samples):
+            out = subprocess.check_output([sys.executable, __file__, "--child", mode, "--warm-jobs", "1"], text=True)
+            cold.append(json.loads(out)[0])
+        out = subprocess.check_output([sys.executable, __file__, "--child", mode, "--warm-jobs", str(args.warm_jobs)], text=True)
+        warm = json.loads(out)[1:]
+        print(
+            f"{mode:9} cold {statistics.median(cold) * 1000:8.2f} ms"
+            f"   warm {statistics.median(warm) * 1000:8.3f} ms/job"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,17 @@ from datetime import datetime, timezone
 from gitrag.db.models import Chunk, ChunkRef, File, Repository
 from gitrag.db.session import create_all, session_scope
 from gitrag.ids import chunk_id, content_hash, file_id
-from gitrag.retrieval.embedding import deterministic_vector
+from gitrag.retrieval.embedding import deterministic_vectors
 from gitrag.retrieval.vector import get_vector_store
 
 
+def upsert(vector_store, rows: list[tuple[str, dict]], contents: list[str]) -> None:
+    # Vectors for the whole batch are generated in one call.
+    vector_store.upsert(
+        [(cid, vector, metadata) for (cid, metadata), vector in zip(rows, deterministic_vectors(contents))]
+    )
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--repo-id", default="bench")
@@ -35,6 +42,7 @@ def main() -> None:
         )
 
         vectors = []
+        contents = []
         for i in range(args.chunks):
             path = f"src/module_{i % 1000}.py"
             fid = file_id(args.repo_id, path)
@@ -73,10 +81,10 @@ def main() -> None:
                 )
             )
             session.merge(ChunkRef(chunk_id=cid, repo_id=args.repo_id, ref_name="main"))
+            contents.append(content)
             vectors.append(
                 (
                     cid,
-                    deterministic_vector(content),
                     {
                         "repo_id": args.repo_id,
                         "sha": f"{i % 100000:040x}",
@@ -90,13 +98,14 @@ def main() -> None:
                 )
             )
             if len(vectors) >= args.batch_size:
-                vector_store.upsert(vectors)
+                upsert(vector_store, vectors, contents)
                 session.flush()
                 vectors.clear()
+                contents.clear()
                 print(f"seeded {i + 1}/{args.chunks}")
 
         if vectors:
-            vector_store.upsert(vectors)
+            upsert(vector_store, vectors, contents)
         print(f"seeded {args.chunks} chunks")
 
 
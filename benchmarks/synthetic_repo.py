@@ -0,0 +1,51 @@
+"""Synthetic bare repositories built with ``git fast-import`` for benchmarks."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import subprocess
+
+
+def python_module(index: int, revision: int, functions: int = 20) -> str:
+    body = [f'"""Synthetic module {index}."""\n']
+    for fn in range(functions):
+        # Offset by ``functions`` so the edited value never equals an untouched default.
+        value = functions + revision if fn == revision % functions else fn
+        body.append(f"\n\ndef func_{index}_{fn}(value):\n    total = value + {value}\n    return total * {fn + 1}\n")
+    return "".join(body)
+
+
+def build_repo(
+    target: str | Path,
+    *,
+    commits: int,
+    files: int = 50,
+    files_per_commit: int = 3,
+    functions: int = 20,
+    branch: str = "main",
+) -> Path:
+    """Create a bare repo with a linear history that edits ``files_per_commit`` files per commit."""
+    target = Path(target)
+    subprocess.run(["git", "init", "-q", "--bare", "-b", branch, str(target)], check=True)
+    proc = subprocess.Popen(
+        ["git", "--git-dir", str(target), "fast-import", "--quiet", "--done"],
+        stdin=subprocess.PIPE,
+    )
+    write = proc.stdin.write
+    for n in range(commits):
+        message = f"commit {n}".encode()
+        write(f"commit refs/heads/{branch}\nmark :{n + 1}\n".encode())
+        write(f"committer Bench <bench@example.com> {1_700_000_000 + n} +0000\n".encode())
+        write(b"data %d\n%s\n" % (len(message), message))
+        if n:
+            write(f"from :{n}\n".encode())
+        touched = range(files) if n == 0 else [(n * files_per_commit + k) % files for k in range(files_per_commit)]
+        for index in touched:
+            data = python_module(index, n, functions).encode()
+            write(f"M 100644 inline src/module_{index}.py\n".encode())
+            write(b"data %d\n%s\n" % (len(data), data))
+    write(b"done\n")
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    return target
@@ -40,6 +40,8 @@ class Settings:
     kafka_bootstrap_servers: str = field(default_factory=lambda: os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"))
     kafka_ingestion_topic: str = field(default_factory=lambda: os.getenv("KAFKA_INGESTION_TOPIC", "gitrag.ingestion"))
     kafka_consumer_group: str = field(default_factory=lambda: os.getenv("KAFKA_CONSUMER_GROUP", "gitrag-workers"))
+    # Port the ingestion worker serves Prometheus metrics on; 0 disables it.
+    worker_metrics_port: int = field(default_factory=lambda: _int("WORKER_METRICS_PORT", 9100))
 
     aws_region: str = field(default_factory=lambda: os.getenv("AWS_REGION", os.getenv("PINECONE_REGION", "us-east-1")))
     s3_bucket: str = field(default_factory=lambda: os.getenv("S3_BUCKET", ""))
@@ -52,6 +54,8 @@ class Settings:
     vector_backend: str = field(default_factory=lambda: os.getenv("GITRAG_VECTOR_BACKEND", "pinecone"))
 
     openai_api_key: str = field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""))
+    # Empty uses the OpenAI client default; point at benchmarks/openai_stub.py for offline load tests.
+    openai_base_url: str = field(default_factory=lambda: os.getenv("OPENAI_BASE_URL", ""))
     openai_embedding_model: str = field(default_factory=lambda: os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
     openai_chat_model: str = field(default_factory=lambda: os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini"))
     deterministic_embeddings: bool = field(default_factory=lambda: _bool("GITRAG_DETERMINISTIC_EMBEDDINGS", False))
@@ -61,11 +65,45 @@ class Settings:
 
     snapshot_interval: int = field(default_factory=lambda: _int("SNAPSHOT_INTERVAL", 10))
     snapshot_change_threshold: float = field(default_factory=lambda: _float("SNAPSHOT_CHANGE_THRESHOLD", 0.30))
-    embedding_batch_size: int = field(default_factory=lambda: _int("EMBEDDING_BATCH_SIZE", 64))
+    # Requests are packed up to EMBEDDING_BATCH_TOKENS estimated tokens or EMBEDDING_BATCH_SIZE inputs.
+    embedding_batch_size: int = field(default_factory=lambda: _int("EMBEDDING_BATCH_SIZE", 512))
+    embedding_batch_tokens: int = field(default_factory=lambda: _int("EMBEDDING_BATCH_TOKENS", 100_000))
+    embedding_max_input_tokens: int = field(default_factory=lambda: _int("EMBEDDING_MAX_INPUT_TOKENS", 8191))
+    embedding_concurrency: int = field(default_factory=lambda: _int("EMBEDDING_CONCURRENCY", 4))
+    # Account quota shared by every embedder in the process; 0 disables a limit.
+    embedding_requests_per_minute: int = field(default_factory=lambda: _int("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+    embedding_tokens_per_minute: int = field(default_factory=lambda: _int("EMBEDDING_TOKENS_PER_MINUTE", 1_000_000))
+    # Pending chunks are embedded together once this many accumulate or the oldest is this old.
+    embedding_flush_chunks: int = field(default_factory=lambda: _int("EMBEDDING_FLUSH_CHUNKS", 2048))
+    embedding_flush_seconds: float = field(default_factory=lambda: _float("EMBEDDING_FLUSH_SECONDS", 10.0))
+    embedding_max_retries: int = field(default_factory=lambda: _int("EMBEDDING_MAX_RETRIES", 6))
+    # float32 or float16; float16 halves cache rows at ~1e-3 relative error per component.
+    embedding_cache_dtype: str = field(default_factory=lambda: os.getenv("EMBEDDING_CACHE_DTYPE", "float32"))
+    embedding_memory_cache_bytes: int = field(default_factory=lambda: _int("EMBEDDING_MEMORY_CACHE_BYTES", 256 * 1024 * 1024))
+    embedding_redis_cache: bool = field(default_factory=lambda: _bool("EMBEDDING_REDIS_CACHE", False))
+    embedding_redis_ttl_seconds: int = field(default_factory=lambda: _int("EMBEDDING_REDIS_TTL_SECONDS", 7 * 24 * 3600))
+    # Estimated tokens per chunk; larger functions and files are split into overlapping pieces.
+    chunk_token_budget: int = field(default_factory=lambda: _int("CHUNK_TOKEN_BUDGET", 2000))
+    # Processes used to chunk commits with many new files; 1 chunks in the ingest process.
+    chunk_workers: int = field(default_factory=lambda: _int("CHUNK_WORKERS", 1))
     vector_upsert_batch_size: int = field(default_factory=lambda: _int("VECTOR_UPSERT_BATCH_SIZE", 100))
     query_cache_ttl_seconds: int = field(default_factory=lambda: _int("QUERY_CACHE_TTL_SECONDS", 300))
+    # Question vectors outlive responses: they do not depend on filters or the index generation.
+    query_embedding_cache_ttl_seconds: int = field(
+        default_factory=lambda: _int("QUERY_EMBEDDING_CACHE_TTL_SECONDS", 24 * 3600)
+    )
+    query_embedding_cache_entries: int = field(default_factory=lambda: _int("QUERY_EMBEDDING_CACHE_ENTRIES", 10_000))
     default_top_k: int = field(default_factory=lambda: _int("DEFAULT_TOP_K", 8))
     index_vendor_code: bool = field(default_factory=lambda: _bool("INDEX_VENDOR_CODE", False))
+    max_file_bytes: int = field(default_factory=lambda: _int("MAX_FILE_BYTES", 1_000_000))
+    # JSON: repo id (or "*") -> FileFilter fields, e.g. {"*": {"exclude": ["*.snap"]}}.
+    file_filter_overrides: str = field(default_factory=lambda: os.getenv("FILE_FILTER_OVERRIDES", ""))
+    # Unchanged symbols at unchanged lines keep pointing at the parent version's chunk instead of
+    # getting a per-commit copy; symbols shifted by edits above them are re-emitted.
+    hunk_scoped_chunks: bool = field(default_factory=lambda: _bool("HUNK_SCOPED_CHUNKS", False))
+    rename_similarity_threshold: int = field(default_factory=lambda: _int("RENAME_SIMILARITY_THRESHOLD", 90))
+    mirror_fetch_max_age_seconds: float = field(default_factory=lambda: _float("MIRROR_FETCH_MAX_AGE_SECONDS", 30.0))
+    git_concurrency: int = field(default_factory=lambda: _int("GIT_CONCURRENCY", 8))
 
 
 def get_settings() -> Settings:
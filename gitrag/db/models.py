@@ -11,6 +11,7 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
@@ -113,11 +114,44 @@ class FileVersion(Base):
     storage_kind: Mapped[str] = mapped_column(String(40), nullable=False)
     s3_key: Mapped[str | None] = mapped_column(Text)
     content_hash: Mapped[str | None] = mapped_column(String(64))
+    blob_oid: Mapped[str | None] = mapped_column(String(64))
     size_bytes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     compressed_bytes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
 
 
+class Blob(Base):
+    """First-seen storage and chunking result for a git blob, reused by later occurrences."""
+
+    __tablename__ = "blobs"
+
+    repo_id: Mapped[str] = mapped_column(ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True)
+    oid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    language: Mapped[str | None] = mapped_column(String(80))
+    chunker_version: Mapped[str] = mapped_column(String(40), nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    first_sha: Mapped[str] = mapped_column(String(40), nullable=False)
+    storage_kind: Mapped[str] = mapped_column(String(40), nullable=False)
+    s3_key: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+class BlobChunk(Base):
+    __tablename__ = "blob_chunks"
+
+    repo_id: Mapped[str] = mapped_column(ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True)
+    blob_oid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    ordinal: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chunk_type: Mapped[str] = mapped_column(String(40), nullable=False)
+    node_type: Mapped[str] = mapped_column(String(80), nullable=False)
+    symbol_name: Mapped[str | None] = mapped_column(Text)
+    line_start: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    line_end: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+
 class Symbol(Base):
     __tablename__ = "symbols"
     __table_args__ = (Index("ix_symbols_repo_path_name", "repo_id", "path", "name"),)
@@ -197,7 +231,9 @@ class EmbeddingCache(Base):
     id: Mapped[str] = mapped_column(String(48), primary_key=True)
     content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
     model: Mapped[str] = mapped_column(String(120), nullable=False)
-    vector_json: Mapped[list | None] = mapped_column(JSON)
+    # Little-endian packed floats; see ``gitrag.retrieval.embedding.pack_vector``.
+    vector_blob: Mapped[bytes | None] = mapped_column(LargeBinary)
+    vector_dtype: Mapped[str] = mapped_column(String(16), default="float32", nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, nullable=False)
 
 
@@ -3,7 +3,8 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Iterator
+import itertools
+from typing import Iterable, Iterator
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -47,6 +48,42 @@ def create_all() -> None:
     Base.metadata.create_all(bind=get_engine())
 
 
+def insert_if_absent(session: Session, model, rows: Iterable[dict], *, batch_size: int = 1000) -> None:
+    """Bulk INSERT ``rows`` and silently skip any whose primary key already exists."""
+    _bulk_insert(session, model, rows, update=(), batch_size=batch_size)
+
+
+def upsert(session: Session, model, rows: Iterable[dict], *, update: Iterable[str], batch_size: int = 1000) -> None:
+    """Bulk INSERT ``rows``; where the primary key already exists, overwrite only the ``update`` columns."""
+    _bulk_insert(session, model, rows, update=tuple(update), batch_size=batch_size)
+
+
+def _bulk_insert(session: Session, model, rows: Iterable[dict], *, update: tuple[str, ...], batch_size: int) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            session.merge(model(**row))
+        return
+
+    # Core statements bypass the unit of work, so pending parent rows must be written first.
+    session.flush()
+    stmt = insert(model)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column.name for column in model.__table__.primary_key.columns],
+            set_={name: stmt.excluded[name] for name in update},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing()
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        session.execute(stmt, batch)
+
+
 @contextmanager
 def session_scope() -> Iterator[Session]:
     session = get_session_factory()()
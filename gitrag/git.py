@@ -4,14 +4,39 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+import asyncio
+import atexit
+import concurrent.futures
+from contextlib import contextmanager
+import itertools
 import os
+import queue
+import re
 import subprocess
-from typing import Iterable
+import threading
+import time
+import weakref
+from typing import Iterable, Iterator, Mapping
 
+from .graph import CommitGraph
 from .ids import normalize_repo_id
+from .metrics import record_mirror_fetch
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts fetch without a lock
+    fcntl = None
 
 
 ZERO_SHA = "0" * 40
+DEFAULT_BLOB_READERS = 2
+DEFAULT_GIT_CONCURRENCY = 8
+_LAST_FETCH_FILE = "gitrag-last-fetch"
+
+# Keep each pipelined write well under the smallest OS pipe buffer so the
+# writer can never block while git is blocked on an unread stdout.
+_BATCH_PIPELINE_BYTES = 8 * 1024
+_BATCH_HEADER = re.compile(rb"^([0-9a-f]{40,64}) (\w+) (\d+)\n$")
 
 
 class GitError(RuntimeError):
@@ -42,6 +67,16 @@ class ChangedFile:
     path: str
     status: str
     old_path: str | None = None
+    blob_oid: str | None = None
+    old_blob_oid: str | None = None
+    similarity: int | None = None
+
+
+@dataclass(frozen=True)
+class CommitChanges:
+    sha: str
+    parents: list[str]
+    files: list[ChangedFile]
 
 
 EXT_TO_LANG = {
@@ -73,18 +108,93 @@ def mirror_path(repo_url: str, clone_dir: str | Path) -> Path:
     return Path(clone_dir) / f"{repo_id}.git"
 
 
-def clone_or_fetch_mirror(repo_url: str, clone_dir: str | Path) -> Path:
+def clone_or_fetch_mirror(
+    repo_url: str,
+    clone_dir: str | Path,
+    *,
+    want_sha: str | None = None,
+    want_ref: str | None = None,
+    max_age_seconds: float = 0.0,
+) -> Path:
+    """Clone or fetch the mirror, coalescing concurrent and redundant fetches.
+
+    Callers serialise on a per-mirror lock file. A caller that waited while
+    another process fetched skips its own fetch. So does one whose mirror was
+    fetched within ``max_age_seconds``, provided it already matches the push:
+    ``want_ref`` (when given) points at ``want_sha``, or is absent for a
+    zero-SHA delete; otherwise ``want_sha`` (when given) is present.
+    """
     target = mirror_path(repo_url, clone_dir)
     target.parent.mkdir(parents=True, exist_ok=True)
-    if target.exists():
-        run_git(target, ["fetch", "--all", "--prune", "--tags"])
-    else:
-        proc = subprocess.run(["git", "clone", "--mirror", repo_url, str(target)], capture_output=True, text=True)
-        if proc.returncode != 0:
-            raise GitError(proc.stderr.strip() or f"git clone failed for {repo_url}")
+    requested_at = time.time()
+    with _mirror_lock(target):
+        # Record when the fetch started: only fetches begun after a request can contain its push.
+        started_at = time.time()
+        if target.exists():
+            last_fetch = _last_fetch_time(target)
+            fresh = last_fetch is not None and requested_at - last_fetch <= max_age_seconds
+            if fresh and want_sha is not None and want_ref:
+                # A new branch at a known commit, or a fast-forward onto one, still moves the ref.
+                fresh = ref_sha(target, want_ref) == (None if want_sha == ZERO_SHA else want_sha)
+            elif fresh and want_sha is not None:
+                # A deleted ref (zero SHA) still needs a fetch so the mirror prunes it.
+                fresh = want_sha != ZERO_SHA and has_commit(target, want_sha)
+            if fresh or (last_fetch is not None and last_fetch >= requested_at):
+                record_mirror_fetch("skipped")
+                return target
+            run_git(target, ["fetch", "--all", "--prune", "--tags"])
+            record_mirror_fetch("fetched")
+        else:
+            proc = subprocess.run(["git", "clone", "--mirror", repo_url, str(target)], capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise GitError(proc.stderr.strip() or f"git clone failed for {repo_url}")
+            record_mirror_fetch("cloned")
+        (target / _LAST_FETCH_FILE).write_text(repr(started_at), encoding="utf-8")
     return target
 
 
+@contextmanager
+def _mirror_lock(target: Path) -> Iterator[None]:
+    lock_path = target.with_name(target.name + ".lock")
+    with open(lock_path, "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _last_fetch_time(target: Path) -> float | None:
+    try:
+        return float((target / _LAST_FETCH_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def has_commit(repo_path: str | Path, sha: str) -> bool:
+    proc = subprocess.run(
+        ["git", "--git-dir", str(repo_path), "cat-file", "-e", f"{sha}^{{commit}}"],
+        capture_output=True,
+    )
+    return proc.returncode == 0
+
+
+def ref_sha(repo_path: str | Path, ref: str) -> str | None:
+    """The object a ref points at in the mirror, or None when it does not exist.
+
+    Bare branch names are taken as ``refs/heads/<name>``.
+    """
+    full = ref if ref.startswith("refs/") else f"refs/heads/{ref}"
+    proc = subprocess.run(
+        ["git", "--git-dir", str(repo_path), "rev-parse", "--verify", "--quiet", full],
+        capture_output=True,
+        text=True,
+    )
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
 def list_refs(repo_path: str | Path) -> list[GitRef]:
     out = run_git(
         repo_path,
@@ -111,67 +221,72 @@ def list_refs(repo_path: str | Path) -> list[GitRef]:
     return refs
 
 
-def list_commits(repo_path: str | Path, revs: Iterable[str] | None = None) -> list[CommitRecord]:
-    selectors = list(revs or ["--all"])
-    out = run_git(repo_path, ["log", *selectors, "--pretty=format:%H|%P|%an|%ae|%at|%s|%D"])
-    commits: list[CommitRecord] = []
-    for line in out.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split("|", 6)
-        if len(parts) < 6:
-            continue
-        refs = parts[6].split(", ") if len(parts) > 6 and parts[6] else []
-        commits.append(
-            CommitRecord(
-                sha=parts[0],
-                parents=parts[1].split() if parts[1] else [],
-                author=parts[2],
-                email=parts[3],
-                timestamp=int(parts[4] or 0),
-                message=parts[5],
-                refs=refs,
-            )
-        )
-    return commits
+_COMMIT_FORMAT = "%H%x00%P%x00%an%x00%ae%x00%at%x00%s%x00%D"
+_COMMIT_FIELDS = 7
+
 
+def iter_commit_records(
+    repo_path: str | Path,
+    revs: Iterable[str] | None = None,
+    *,
+    shas: Iterable[str] | None = None,
+) -> Iterator[CommitRecord]:
+    """Stream ``CommitRecord``s from NUL-delimited ``git log`` output without buffering it.
 
-def build_commit_graph(repo_path: str | Path) -> dict[str, dict]:
-    commits = {c.sha: c for c in list_commits(repo_path)}
-    children: dict[str, list[str]] = {sha: [] for sha in commits}
-    for commit in commits.values():
-        for parent in commit.parents:
-            if parent in children:
-                children[parent].append(commit.sha)
+    ``shas`` restricts the output to exactly those commits (no history walk).
+    """
+    args = ["log", "--no-show-signature", "-z", f"--format={_COMMIT_FORMAT}"]
+    stdin = None
+    if shas is not None:
+        stdin = [sha for sha in shas if sha]
+        if not stdin:
+            return
+        args += ["--stdin", "--no-walk=unsorted"]
+    else:
+        args += list(revs or ["--all"])
+    tokens = _git_stream(repo_path, args, stdin=stdin)
+    while True:
+        fields = list(itertools.islice(tokens, _COMMIT_FIELDS))
+        if len(fields) < _COMMIT_FIELDS:
+            return
+        sha, parents, author, email, timestamp, message, refs = fields
+        yield CommitRecord(
+            sha=sha.lstrip("\n"),
+            parents=parents.split(),
+            author=author,
+            email=email,
+            timestamp=int(timestamp or 0),
+            message=message,
+            refs=refs.split(", ") if refs else [],
+        )
 
-    depth_cache: dict[str, int] = {}
 
-    def depth(sha: str) -> int:
-        if sha in depth_cache:
-            return depth_cache[sha]
-        commit = commits.get(sha)
-        if commit is None or not commit.parents:
-            depth_cache[sha] = 0
-        else:
-            parent_depths = [depth(parent) for parent in commit.parents if parent in commits]
-            depth_cache[sha] = 1 + (max(parent_depths) if parent_depths else 0)
-        return depth_cache[sha]
-
-    return {
-        sha: {
-            "sha": record.sha,
-            "parents": record.parents,
-            "children": children.get(sha, []),
-            "author": record.author,
-            "email": record.email,
-            "timestamp": record.timestamp,
-            "message": record.message,
-            "refs": record.refs,
-            "depth": depth(sha),
-            "is_merge": len(record.parents) > 1,
-        }
-        for sha, record in commits.items()
-    }
+def list_commits(repo_path: str | Path, revs: Iterable[str] | None = None) -> list[CommitRecord]:
+    return list(iter_commit_records(repo_path, revs))
+
+
+def build_commit_graph(
+    repo_path: str | Path,
+    shas: Iterable[str] | None = None,
+    *,
+    base_depths: Mapping[str, int] | None = None,
+) -> CommitGraph:
+    """Build the whole reachable graph, or only ``shas`` when given.
+
+    ``base_depths`` supplies already-known depths for parents outside a partial graph.
+    """
+    graph = CommitGraph()
+    for record in iter_commit_records(repo_path, shas=shas):
+        graph.add(
+            record.sha,
+            record.parents,
+            author=record.author,
+            email=record.email,
+            timestamp=record.timestamp,
+            message=record.message,
+            refs=record.refs,
+        )
+    return graph.finalize(base_depths)
 
 
 def rev_list_between(repo_path: str | Path, before: str | None, after: str) -> list[str]:
@@ -183,45 +298,413 @@ def rev_list_between(repo_path: str | Path, before: str | None, after: str) -> l
     return [line.strip() for line in out.splitlines() if line.strip()]
 
 
-def changed_files(repo_path: str | Path, sha: str) -> list[ChangedFile]:
-    parents = run_git(repo_path, ["show", "--format=%P", "-s", sha]).strip().split()
-    if not parents:
-        out = run_git(repo_path, ["ls-tree", "-r", "--name-only", sha])
-        return [ChangedFile(path=line.strip(), status="A") for line in out.splitlines() if line.strip()]
-
-    out = run_git(repo_path, ["diff-tree", "--no-commit-id", "--name-status", "-r", "-m", sha])
-    files: list[ChangedFile] = []
+_RAW_LOG_ARGS = [
+    "-c",
+    "log.showRoot=true",
+    "log",
+    "--stdin",
+    "--no-walk=unsorted",
+    "--no-show-signature",
+    "--format=%x00%H %P",
+    "--raw",
+    "-z",
+    "--no-abbrev",
+    "--no-renames",
+    "-m",
+]
+
+
+def _raw_log_args(rename_threshold: int | None) -> list[str]:
+    if not rename_threshold:
+        return _RAW_LOG_ARGS
+    return [f"-M{rename_threshold}%" if arg == "--no-renames" else arg for arg in _RAW_LOG_ARGS]
+
+
+def iter_commit_changes(
+    repo_path: str | Path,
+    shas: Iterable[str],
+    *,
+    rename_threshold: int | None = None,
+) -> Iterator[CommitChanges]:
+    """Stream changed files for ``shas`` (in the given order) from a single ``git log --raw`` process.
+
+    Root commits list every file as added and merges report the union of their
+    per-parent diffs, matching what ``diff-tree -m`` and ``ls-tree -r`` produced.
+    With ``rename_threshold`` (a ``-M`` similarity percentage) moved files come
+    back as one ``R`` entry instead of a delete plus an add.
+    """
+    revs = [sha for sha in shas if sha]
+    if not revs:
+        return
+    yield from _parse_raw_log(_git_stream(repo_path, _raw_log_args(rename_threshold), stdin=revs))
+
+
+def _git_stream(repo_path: str | Path, args: list[str], *, stdin: list[str] | None = None) -> Iterator[str]:
+    """Run git and yield its NUL-separated output tokens as they arrive."""
+    proc = subprocess.Popen(
+        ["git", "--git-dir", str(repo_path), *args],
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        if stdin is not None:
+            try:
+                proc.stdin.write("".join(line + "\n" for line in stdin).encode("utf-8"))
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        yield from _nul_tokens(proc.stdout)
+        stderr = proc.stderr.read().decode("utf-8", errors="replace")
+        if proc.wait() != 0:
+            raise GitError(stderr.strip() or f"git command failed: git {' '.join(args)}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def _nul_tokens(stream, chunk_size: int = 1 << 16) -> Iterator[str]:
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts = (pending + chunk).split(b"\0")
+        pending = parts.pop()
+        for part in parts:
+            yield part.decode("utf-8", errors="surrogateescape")
+    if pending:
+        yield pending.decode("utf-8", errors="surrogateescape")
+
+
+def _parse_raw_log(tokens: Iterator[str]) -> Iterator[CommitChanges]:
+    current: CommitChanges | None = None
     seen: set[tuple[str, str]] = set()
-    for line in out.splitlines():
-        parts = line.split("\t")
-        if len(parts) < 2:
+    for token in tokens:
+        token = token.lstrip("\n")
+        if not token:
             continue
-        status = parts[0]
-        if status.startswith("R") and len(parts) >= 3:
-            item = ChangedFile(path=parts[2], status="R", old_path=parts[1])
-        else:
-            item = ChangedFile(path=parts[-1], status=status[:1])
-        key = (item.path, item.status)
-        if key not in seen:
-            files.append(item)
-            seen.add(key)
-    return files
+        if token.startswith(":"):
+            if current is None:
+                continue
+            _, _, old_oid, new_oid, status = token[1:].split(" ", 4)
+            if status[:1] in {"R", "C"}:
+                old_path, path = next(tokens), next(tokens)
+            else:
+                old_path, path = None, next(tokens)
+            item = ChangedFile(
+                path=path,
+                status=status[:1],
+                old_path=old_path,
+                blob_oid=None if new_oid == ZERO_SHA else new_oid,
+                old_blob_oid=None if old_oid == ZERO_SHA else old_oid,
+                similarity=int(status[1:]) if old_path is not None and status[1:] else None,
+            )
+            key = (item.path, item.status)
+            if key not in seen:
+                current.files.append(item)
+                seen.add(key)
+            continue
+        sha, _, parents = token.partition(" ")
+        if current is not None and current.sha == sha:
+            # ``-m`` repeats the header once per merge parent.
+            continue
+        if current is not None:
+            yield current
+        current = CommitChanges(sha=sha, parents=parents.split(), files=[])
+        seen = set()
+    if current is not None:
+        yield current
+
+
+def changed_files(repo_path: str | Path, sha: str, *, rename_threshold: int | None = None) -> list[ChangedFile]:
+    for changes in iter_commit_changes(repo_path, [sha], rename_threshold=rename_threshold):
+        return changes.files
+    return []
+
+
+class BlobReader:
+    """Long-lived ``git cat-file --batch`` process bound to one mirror."""
+
+    def __init__(self, repo_path: str | Path):
+        self.repo_path = str(repo_path)
+        self._proc: subprocess.Popen | None = None
+
+    def _process(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["git", "--git-dir", self.repo_path, "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._proc
+
+    def read_many(self, specs: list[str]) -> list[bytes | None]:
+        """Return blob bytes for each ``<rev>:<path>`` or object id, ``None`` when absent."""
+        results: list[bytes | None] = [None] * len(specs)
+        pending: list[int] = []
+        size = 0
+        for idx, spec in enumerate(specs):
+            if not spec or "\n" in spec:
+                continue
+            pending.append(idx)
+            size += len(spec) + 1
+            if size >= _BATCH_PIPELINE_BYTES:
+                self._exchange(specs, pending, results)
+                pending, size = [], 0
+        if pending:
+            self._exchange(specs, pending, results)
+        return results
+
+    def _exchange(self, specs: list[str], indexes: list[int], results: list[bytes | None]) -> None:
+        proc = self._process()
+        try:
+            proc.stdin.write("".join(specs[idx] + "\n" for idx in indexes).encode("utf-8"))
+            proc.stdin.flush()
+            for idx in indexes:
+                results[idx] = self._read_one(proc.stdout)
+        except (BrokenPipeError, OSError) as exc:
+            self.close()
+            raise GitError(f"git cat-file --batch failed for {self.repo_path}: {exc}") from exc
+
+    def _read_one(self, stdout) -> bytes | None:
+        header = stdout.readline()
+        if not header:
+            raise GitError(f"git cat-file --batch exited for {self.repo_path}")
+        match = _BATCH_HEADER.match(header)
+        if match is None:
+            return None
+        data = stdout.read(int(match.group(3)))
+        stdout.read(1)
+        return data if match.group(2) == b"blob" else None
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+
+
+class BlobReaderPool:
+    """Small set of ``BlobReader`` processes shared by threads working on one mirror."""
+
+    def __init__(self, repo_path: str | Path, size: int = DEFAULT_BLOB_READERS):
+        self.repo_path = str(repo_path)
+        self._readers: list[BlobReader] = [BlobReader(repo_path) for _ in range(max(size, 1))]
+        self._idle: queue.Queue[BlobReader] = queue.Queue()
+        for reader in self._readers:
+            self._idle.put(reader)
+
+    def read_many(self, specs: list[str]) -> list[bytes | None]:
+        reader = self._idle.get()
+        try:
+            return reader.read_many(specs)
+        finally:
+            self._idle.put(reader)
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+
+
+_git_concurrency = DEFAULT_GIT_CONCURRENCY
+_git_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+_blob_pools: dict[str, BlobReaderPool] = {}
+_blob_pools_lock = threading.Lock()
+
+
+def blob_reader_pool(repo_path: str | Path) -> BlobReaderPool:
+    key = str(Path(repo_path).resolve())
+    with _blob_pools_lock:
+        pool = _blob_pools.get(key)
+        if pool is None:
+            pool = _blob_pools[key] = BlobReaderPool(key)
+        return pool
+
+
+@atexit.register
+def close_blob_readers() -> None:
+    with _blob_pools_lock:
+        for pool in _blob_pools.values():
+            pool.close()
+        _blob_pools.clear()
+
+
+def decode_blob(data: bytes) -> str:
+    # Matches the newline translation ``subprocess`` text mode applied to ``git show``.
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_blobs(repo_path: str | Path, pairs: Iterable[tuple[str, str]]) -> list[str | None]:
+    """Read ``(sha, path)`` file contents through the mirror's persistent cat-file readers."""
+    specs = [f"{sha}:{path}" for sha, path in pairs]
+    if not specs:
+        return []
+    raw = blob_reader_pool(repo_path).read_many(specs)
+    return [decode_blob(data) if data is not None else None for data in raw]
 
 
 def file_at_sha(repo_path: str | Path, sha: str, path: str) -> str | None:
+    return read_blobs(repo_path, [(sha, path)])[0]
+
+
+def blob_sizes(repo_path: str | Path, oids: Iterable[str | None]) -> dict[str, int]:
+    """Blob sizes from one ``git cat-file --batch-check`` call, without reading any content."""
+    unique = sorted({oid for oid in oids if oid and oid != ZERO_SHA})
+    if not unique:
+        return {}
+    proc = subprocess.run(
+        ["git", "--git-dir", str(repo_path), "cat-file", "--batch-check"],
+        input="".join(oid + "\n" for oid in unique),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise GitError(proc.stderr.strip() or f"git cat-file --batch-check failed for {repo_path}")
+    sizes: dict[str, int] = {}
+    for line in proc.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == "blob":
+            sizes[parts[0]] = int(parts[2])
+    return sizes
+
+
+def diff_for_file(repo_path: str | Path, sha: str, path: str, *, old_path: str | None = None) -> str | None:
     try:
-        return run_git(repo_path, ["show", f"{sha}:{path}"])
+        return run_git(repo_path, _diff_args(sha, path, old_path))
     except GitError:
         return None
 
 
-def diff_for_file(repo_path: str | Path, sha: str, path: str) -> str | None:
+def _diff_args(sha: str, path: str, old_path: str | None) -> list[str]:
+    if old_path is None:
+        return ["show", "--format=", "--unified=80", sha, "--", path]
+    # Both sides of the pathspec let -M pair them, so only the edits show up.
+    return ["show", "--format=", "--unified=80", "-M", sha, "--", old_path, path]
+
+
+def set_git_concurrency(limit: int) -> None:
+    """Cap the number of git processes ``run_git_async`` runs at once per event loop."""
+    global _git_concurrency
+    _git_concurrency = max(int(limit), 1)
+    _git_semaphores.clear()
+
+
+def _git_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _git_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _git_semaphores[loop] = asyncio.Semaphore(_git_concurrency)
+    return semaphore
+
+
+async def run_git_async(
+    repo_path: str | Path | None,
+    args: list[str],
+    *,
+    cwd: str | Path | None = None,
+    stdin: str | None = None,
+) -> str:
+    cmd = ["git"]
+    if repo_path:
+        cmd += ["--git-dir", str(repo_path)]
+    cmd += args
+    async with _git_semaphore():
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate(stdin.encode("utf-8") if stdin is not None else None)
+    if proc.returncode != 0:
+        raise GitError(stderr.decode("utf-8", errors="replace").strip() or f"git command failed: {' '.join(cmd)}")
+    return decode_blob(stdout)
+
+
+async def file_at_sha_async(repo_path: str | Path, sha: str, path: str) -> str | None:
+    # The persistent cat-file readers are cheaper than a process per file; run them off-loop.
+    return await asyncio.to_thread(file_at_sha, repo_path, sha, path)
+
+
+async def diff_for_file_async(
+    repo_path: str | Path,
+    sha: str,
+    path: str,
+    *,
+    old_path: str | None = None,
+) -> str | None:
     try:
-        return run_git(repo_path, ["show", "--format=", "--unified=80", sha, "--", path])
+        return await run_git_async(repo_path, _diff_args(sha, path, old_path))
     except GitError:
         return None
 
 
+async def changed_files_async(
+    repo_path: str | Path,
+    sha: str,
+    *,
+    rename_threshold: int | None = None,
+) -> list[ChangedFile]:
+    out = await run_git_async(repo_path, _raw_log_args(rename_threshold), stdin=sha + "\n")
+    for changes in _parse_raw_log(iter(out.split("\0"))):
+        return changes.files
+    return []
+
+
+class AsyncGitRunner:
+    """Event loop on a daemon thread so synchronous ingestion can overlap git calls."""
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="gitrag-git-async", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "AsyncGitRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_async_runner: AsyncGitRunner | None = None
+
+
+def async_git_runner() -> AsyncGitRunner:
+    global _async_runner
+    with _blob_pools_lock:
+        if _async_runner is None:
+            _async_runner = AsyncGitRunner()
+        return _async_runner
+
+
+@atexit.register
+def close_async_git_runner() -> None:
+    global _async_runner
+    with _blob_pools_lock:
+        if _async_runner is not None:
+            _async_runner.close()
+            _async_runner = None
+
+
 def refs_containing_commit(repo_path: str | Path, sha: str) -> list[str]:
     out = run_git(repo_path, ["branch", "--all", "--contains", sha, "--format=%(refname:short)"])
     return [line.strip().lstrip("* ").strip() for line in out.splitlines() if line.strip()]
@@ -0,0 +1,327 @@
+"""Compact commit graph and branch-membership index used during ingestion."""
+
+from __future__ import annotations
+
+from array import array
+from collections import deque
+import sys
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping
+
+if TYPE_CHECKING:
+    from .git import GitRef
+
+BRANCH_REF_TYPES = {"branch", "remote_branch"}
+
+
+class CommitGraph(Mapping[str, dict]):
+    """Commit DAG stored in parallel arrays indexed by integer commit id.
+
+    Parent and child edges use a CSR layout (``*_offsets`` into ``*_ids``) so a
+    million-commit history costs a few flat buffers rather than a dict of lists
+    per commit. Parents that are referenced but never added (shallow or
+    partial histories) get ids too but are not members of the mapping. Reading
+    ``graph[sha]`` builds the per-commit dict on demand.
+    """
+
+    def __init__(self) -> None:
+        self.shas: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._present = bytearray()
+        self._count = 0
+        self.timestamps = array("q")
+        self.authors: list[str] = []
+        self.emails: list[str] = []
+        self.messages: list[str] = []
+        self.refs: list[tuple[str, ...]] = []
+        self._edge_child = array("I")
+        self._edge_parent = array("I")
+        self.parent_offsets = array("I", [0])
+        self.parent_ids = array("I")
+        self.child_offsets = array("I", [0])
+        self.child_ids = array("I")
+        self.depths = array("I")
+
+    def add(
+        self,
+        sha: str,
+        parents: Iterable[str],
+        *,
+        author: str = "",
+        email: str = "",
+        timestamp: int = 0,
+        message: str = "",
+        refs: Iterable[str] = (),
+    ) -> None:
+        idx = self._id(sha)
+        if self._present[idx]:
+            return
+        self._present[idx] = 1
+        self._count += 1
+        self.timestamps[idx] = timestamp
+        self.authors[idx] = sys.intern(author)
+        self.emails[idx] = sys.intern(email)
+        self.messages[idx] = message
+        self.refs[idx] = tuple(refs)
+        for parent in parents:
+            self._edge_child.append(idx)
+            self._edge_parent.append(self._id(parent))
+
+    def finalize(self, base_depths: Mapping[str, int] | None = None) -> "CommitGraph":
+        """Build the CSR edge arrays and depths once every commit has been added."""
+        n = len(self.shas)
+        self.parent_offsets, self.parent_ids = _csr(n, self._edge_child, self._edge_parent)
+        self.child_offsets, self.child_ids = _csr(n, self._edge_parent, self._edge_child)
+        self._edge_child, self._edge_parent = array("I"), array("I")
+        self.compute_depths(base_depths)
+        return self
+
+    def _id(self, sha: str) -> int:
+        idx = self._ids.get(sha)
+        if idx is None:
+            idx = self._ids[sha] = len(self.shas)
+            self.shas.append(sha)
+            self._present.append(0)
+            self.timestamps.append(0)
+            self.authors.append("")
+            self.emails.append("")
+            self.messages.append("")
+            self.refs.append(())
+        return idx
+
+    def external_parents(self) -> list[str]:
+        """Parent SHAs referenced by the graph but not part of it."""
+        return [sha for idx, sha in enumerate(self.shas) if not self._present[idx]]
+
+    def compute_depths(self, base_depths: Mapping[str, int] | None = None) -> None:
+        """Longest path from a root, computed with Kahn's algorithm instead of recursion.
+
+        ``base_depths`` gives depths for external parents so a partial graph lines
+        up with depths already persisted for the rest of the history.
+        """
+        base_depths = base_depths or {}
+        n = len(self.shas)
+        present, offsets, parent_ids = self._present, self.parent_offsets, self.parent_ids
+        depths = array("I", bytes(4 * n))
+        pending = array("I", bytes(4 * n))
+        ready: deque[int] = deque()
+        for idx in range(n):
+            if not present[idx]:
+                continue
+            start, end = offsets[idx], offsets[idx + 1]
+            # Commits whose parents are all outside the graph still sit one level above them.
+            external = [
+                base_depths.get(self.shas[parent_ids[pos]], 0)
+                for pos in range(start, end)
+                if not present[parent_ids[pos]]
+            ]
+            depths[idx] = 1 + max(external, default=0) if end > start else 0
+            pending[idx] = (end - start) - len(external)
+            if not pending[idx]:
+                ready.append(idx)
+        child_offsets, child_ids = self.child_offsets, self.child_ids
+        while ready:
+            idx = ready.popleft()
+            next_depth = depths[idx] + 1
+            for pos in range(child_offsets[idx], child_offsets[idx + 1]):
+                child = child_ids[pos]
+                if not present[child]:
+                    continue
+                if depths[child] < next_depth:
+                    depths[child] = next_depth
+                pending[child] -= 1
+                if not pending[child]:
+                    ready.append(child)
+        self.depths = depths
+
+    def __getitem__(self, sha: str) -> dict:
+        idx = self._ids.get(sha)
+        if idx is None or not self._present[idx]:
+            raise KeyError(sha)
+        parents = self.parents(sha)
+        return {
+            "sha": sha,
+            "parents": parents,
+            "children": self.children(sha),
+            "author": self.authors[idx],
+            "email": self.emails[idx],
+            "timestamp": self.timestamps[idx],
+            "message": self.messages[idx],
+            "refs": list(self.refs[idx]),
+            "depth": self.depths[idx],
+            "is_merge": len(parents) > 1,
+        }
+
+    def __contains__(self, sha: object) -> bool:
+        idx = self._ids.get(sha)  # type: ignore[arg-type]
+        return idx is not None and bool(self._present[idx])
+
+    def __iter__(self) -> Iterator[str]:
+        present = self._present
+        return (sha for idx, sha in enumerate(self.shas) if present[idx])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def parents(self, sha: str) -> list[str]:
+        idx = self._ids[sha]
+        return [self.shas[p] for p in self.parent_ids[self.parent_offsets[idx] : self.parent_offsets[idx + 1]]]
+
+    def children(self, sha: str) -> list[str]:
+        idx = self._ids[sha]
+        return [
+            self.shas[c]
+            for c in self.child_ids[self.child_offsets[idx] : self.child_offsets[idx + 1]]
+            if self._present[c]
+        ]
+
+    def depth(self, sha: str) -> int:
+        return self.depths[self._ids[sha]]
+
+    def shas_by_depth(self, *, reverse: bool = False) -> list[str]:
+        """Commits ordered by depth so parents come before children (ties by commit id)."""
+        present, depths = self._present, self.depths
+        ids = sorted((idx for idx in range(len(self.shas)) if present[idx]), key=depths.__getitem__, reverse=reverse)
+        return [self.shas[idx] for idx in ids]
+
+
+def _csr(n: int, keys: array, values: array) -> tuple[array, array]:
+    """Group ``values`` by ``keys`` into (offsets, ids), preserving insertion order per key."""
+    offsets = array("I", bytes(4 * (n + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for idx in range(n):
+        offsets[idx + 1] += offsets[idx]
+    cursor = array("I", offsets[:n])
+    ids = array("I", bytes(4 * len(values)))
+    for key, value in zip(keys, values):
+        ids[cursor[key]] = value
+        cursor[key] += 1
+    return offsets, ids
+
+
+class BranchIndex:
+    """Branch membership for every commit, stored as one ref bitset per commit.
+
+    Equivalent to ``git branch --all --contains <sha>`` for each commit, but
+    computed once from the commit graph and updated in place when refs move.
+    """
+
+    def __init__(self) -> None:
+        self._parents: dict[str, list[str]] = {}
+        self._bits: dict[str, int] = {}
+        self._tips: dict[str, str] = {}
+        self._bit_of: dict[str, int] = {}
+        self._free_bits: list[int] = []
+        self._names: dict[int, list[str]] = {}
+
+    @classmethod
+    def build(cls, graph: CommitGraph, refs: Iterable[GitRef]) -> "BranchIndex":
+        return cls.from_parents({sha: graph.parents(sha) for sha in graph.shas_by_depth(reverse=True)}, refs)
+
+    @classmethod
+    def from_parents(cls, parents_by_sha: Mapping[str, list[str]], refs: Iterable[GitRef]) -> "BranchIndex":
+        """Index from parent lists ordered children first (descending depth), e.g. persisted ``commit_parents``."""
+        index = cls()
+        order = list(parents_by_sha)
+        index.add_commits(parents_by_sha)
+        for ref in refs:
+            if ref.ref_type in BRANCH_REF_TYPES and ref.sha in index._parents:
+                mask = 1 << index._allocate(ref.name)
+                index._tips[ref.name] = ref.sha
+                index._bits[ref.sha] = index._bits.get(ref.sha, 0) | mask
+
+        # Children have a strictly greater depth than their parents, so one pass
+        # in descending depth pushes every tip's bit down its whole ancestry.
+        bits = index._bits
+        for sha in order:
+            child_bits = bits.get(sha)
+            if not child_bits:
+                continue
+            for parent in index._parents[sha]:
+                if parent not in index._parents:
+                    continue
+                current = bits.get(parent, 0)
+                merged = current | child_bits
+                if merged != current:
+                    # Reuse the child's int on linear stretches so chains share one object.
+                    bits[parent] = child_bits if merged == child_bits else merged
+        return index
+
+    def add_commits(self, parents_by_sha: Mapping[str, list[str]]) -> None:
+        for sha, parents in parents_by_sha.items():
+            self._parents[sha] = list(parents)
+
+    def __contains__(self, sha: str) -> bool:
+        return sha in self._parents
+
+    def refs_for(self, sha: str) -> list[str]:
+        bits = self._bits.get(sha, 0)
+        if not bits:
+            return []
+        names = self._names.get(bits)
+        if names is None:
+            names = sorted(name for name, bit in self._bit_of.items() if bits >> bit & 1)
+            self._names[bits] = names
+        return list(names)
+
+    def update_refs(self, refs: Iterable[GitRef]) -> None:
+        """Bring the index in line with the mirror's current branch tips."""
+        current = {ref.name: ref.sha for ref in refs if ref.ref_type in BRANCH_REF_TYPES}
+        for name in list(self._tips):
+            if name not in current:
+                self.remove_ref(name)
+        for name, sha in current.items():
+            self.move_ref(name, sha)
+
+    def move_ref(self, name: str, sha: str) -> None:
+        old = self._tips.get(name)
+        if old == sha:
+            return
+        self._tips[name] = sha
+        if sha not in self._parents:
+            # Commits outside the index keep their bits until the tip lands on a known commit.
+            return
+        mask = 1 << (self._bit_of[name] if name in self._bit_of else self._allocate(name))
+        if old is None:
+            self._propagate(sha, mask)
+            return
+        if not self._propagate(sha, mask, stop_at=old):
+            # Not a fast-forward: the old tip's ancestry may no longer be reachable.
+            self._clear(mask)
+            self._propagate(sha, mask)
+
+    def remove_ref(self, name: str) -> None:
+        bit = self._bit_of.pop(name, None)
+        self._tips.pop(name, None)
+        if bit is None:
+            return
+        self._clear(1 << bit)
+        self._free_bits.append(bit)
+
+    def _allocate(self, name: str) -> int:
+        bit = self._free_bits.pop() if self._free_bits else len(self._bit_of)
+        self._bit_of[name] = bit
+        self._names.clear()
+        return bit
+
+    def _propagate(self, start: str, mask: int, *, stop_at: str | None = None) -> bool:
+        """Set ``mask`` on ``start`` and its ancestors; report whether ``stop_at`` was reached."""
+        reached = False
+        stack = [start]
+        while stack:
+            sha = stack.pop()
+            parents = self._parents.get(sha)
+            if parents is None:
+                continue
+            bits = self._bits.get(sha, 0)
+            if bits & mask:
+                reached = reached or sha == stop_at
+                continue
+            self._bits[sha] = bits | mask
+            stack.extend(parents)
+        return reached
+
+    def _clear(self, mask: int) -> None:
+        for sha, bits in self._bits.items():
+            if bits & mask:
+                self._bits[sha] = bits & ~mask
@@ -67,6 +67,10 @@ def embedding_cache_id(hash_value: str, model: str) -> str:
     return f"emb_{stable_hash(hash_value + '|' + model, 32)}"
 
 
+def normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
+
 def query_cache_key(
     *,
     model: str,
@@ -82,7 +86,7 @@ def query_cache_key(
     payload: dict[str, Any] = {
         "model": model,
         "repo_id": repo_id,
-        "question": " ".join(question.split()).lower(),
+        "question": normalize_question(question),
         "branch": branch,
         "sha": sha,
         "path_prefix": path_prefix,
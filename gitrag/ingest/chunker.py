@@ -2,10 +2,21 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+import threading
 from typing import Iterable
 
 from gitrag.git import language_for_path
+from gitrag.tokens import estimate_tokens, truncate_to_tokens
+
+# Bump whenever chunk boundaries or content change so stored blob chunks are rebuilt.
+# 2: chunk text and symbol names are sliced by byte offset, not character index.
+# 3: chunks over the token budget are split instead of truncated.
+# 4: class chunks are skeletons with method bodies elided.
+CHUNKER_VERSION = "4"
+
+DEFAULT_CHUNK_TOKEN_BUDGET = 2000
+SPLIT_OVERLAP_LINES = 2
 
 DEFAULT_EXCLUDED_PARTS = {
     ".git",
@@ -35,6 +46,8 @@ class CodeChunk:
     line_start: int
     line_end: int
     symbol_name: str | None = None
+    # Estimated tokens left out of a class skeleton because they live in the method chunks.
+    elided_tokens: int = 0
 
 
 NODE_TYPES = {
@@ -59,6 +72,26 @@ NODE_TYPES = {
     "Go": {"function_declaration", "method_declaration"},
 }
 
+# Class chunks keep their own text but only the signatures of nested chunk nodes.
+CLASS_NODE_TYPES = frozenset({"class_definition", "class_declaration"})
+_ELIDED_BODY = {"Python": b"..."}
+_ELIDED_BRACE_BODY = b"{ ... }"
+
+
+GRAMMAR_MODULES = {
+    "JavaScript": ("tree_sitter_javascript", "language"),
+    "Python": ("tree_sitter_python", "language"),
+    "TypeScript": ("tree_sitter_typescript", "language_typescript"),
+    "Java": ("tree_sitter_java", "language"),
+    "Go": ("tree_sitter_go", "language"),
+}
+
+# Grammars load once per process on first use; parsers are not thread-safe, so
+# each thread gets its own, built from the shared Language objects.
+_ts_languages: dict[str, object | None] = {}
+_ts_languages_lock = threading.Lock()
+_thread_parsers = threading.local()
+
 
 def _import_optional(module_name: str):
     try:
@@ -78,47 +111,289 @@ def _ts_language(tree_sitter_module, language_attr: str = "language"):
         return None
 
 
+def get_ts_language(language: str):
+    """Shared tree-sitter ``Language`` for ``language``, or None if its grammar is unavailable."""
+    if language in _ts_languages:
+        return _ts_languages[language]
+    with _ts_languages_lock:
+        if language not in _ts_languages:
+            grammar = GRAMMAR_MODULES.get(language)
+            _ts_languages[language] = (
+                _ts_language(_import_optional(grammar[0]), grammar[1]) if grammar else None
+            )
+        return _ts_languages[language]
+
+
+def get_parser(language: str | None):
+    """Parser for ``language`` owned by the calling thread, created on first use."""
+    if language is None:
+        return None
+    parsers = getattr(_thread_parsers, "parsers", None)
+    if parsers is None:
+        parsers = _thread_parsers.parsers = {}
+    if language not in parsers:
+        ts_language = get_ts_language(language)
+        parsers[language] = _new_parser(ts_language) if ts_language is not None else None
+    return parsers[language]
+
+
+def _new_parser(ts_language):
+    import tree_sitter
+
+    return tree_sitter.Parser(ts_language)
+
+
 def build_parsers(languages: Iterable[str] | None = None) -> dict[str, object]:
-    """Return language -> parser. Missing parser packages are skipped."""
-    try:
-        import tree_sitter
-    except Exception:
-        return {}
-
-    modules = {
-        "JavaScript": (_import_optional("tree_sitter_javascript"), "language"),
-        "Python": (_import_optional("tree_sitter_python"), "language"),
-        "TypeScript": (_import_optional("tree_sitter_typescript"), "language_typescript"),
-        "Java": (_import_optional("tree_sitter_java"), "language"),
-        "Go": (_import_optional("tree_sitter_go"), "language"),
-    }
-    wanted = set(languages or modules.keys())
+    """Return language -> new parser. Missing parser packages are skipped."""
     parsers: dict[str, object] = {}
-    for language, (module, attr) in modules.items():
-        if language not in wanted:
-            continue
-        ts_language = _ts_language(module, attr)
-        if ts_language is None:
-            continue
-        parsers[language] = tree_sitter.Parser(ts_language)
+    for language in languages or GRAMMAR_MODULES:
+        ts_language = get_ts_language(language)
+        if ts_language is not None:
+            parsers[language] = _new_parser(ts_language)
     return parsers
 
 
-def traverse(node):
-    yield node
-    for child in node.children:
-        yield from traverse(child)
+def traverse(node, *, enter=None):
+    """Pre-order walk with a ``TreeCursor``; ``enter`` can prune a node and its subtree."""
+    cursor = node.walk()
+    while True:
+        current = cursor.node
+        if enter is None or enter(current):
+            yield current
+            if cursor.goto_first_child():
+                continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return
+
 
+def node_text(node, source: bytes) -> str:
+    return source[node.start_byte : node.end_byte].decode("utf-8", errors="ignore")
 
-def extract_symbol_name(node, content: str) -> str | None:
+
+def extract_symbol_name(node, source: bytes) -> str | None:
     for child in node.children:
         if child.type in {"identifier", "property_identifier", "type_identifier"}:
-            return content[child.start_byte : child.end_byte]
+            return node_text(child, source)
         if child.type in {"name"}:
-            return content[child.start_byte : child.end_byte]
+            return node_text(child, source)
     return None
 
 
+_FUNCTION_VALUE_TYPES = frozenset({"arrow_function", "function_expression"})
+
+
+def is_chunk_node(node, language: str) -> bool:
+    node_type = node.type
+    if node_type not in NODE_TYPES.get(language, ()):
+        return False
+    if node_type == "variable_declarator" and language == "JavaScript":
+        return any(child.type in _FUNCTION_VALUE_TYPES for child in node.children)
+    return True
+
+
+def _elided_bodies(node, language: str) -> list:
+    """Bodies of the outermost chunk nodes nested in ``node``, in source order."""
+    bodies = []
+
+    def enter(current) -> bool:
+        if current == node or not is_chunk_node(current, language):
+            return True
+        body = current.child_by_field_name("body")
+        if body is not None:
+            bodies.append(body)
+        return False
+
+    for _ in traverse(node, enter=enter):
+        pass
+    return bodies
+
+
+def class_skeleton(node, source: bytes, language: str) -> tuple[str, list[tuple[int, int]]] | None:
+    """Class text with nested method bodies elided, plus the source rows each skeleton line covers.
+
+    Returns None when nothing would be elided. Row pairs are 0-based
+    ``(first_row, last_row)`` so pieces of a split skeleton keep real line numbers.
+    Lines break on ``\n`` only, matching ``split_lines``, so every piece maps to a row.
+    """
+    bodies = _elided_bodies(node, language)
+    if not bodies:
+        return None
+    marker = _ELIDED_BODY.get(language, _ELIDED_BRACE_BODY)
+    text = bytearray()
+    rows: list[tuple[int, int]] = []
+    line_rows: list[int] = []
+
+    def keep(start_byte: int, end_byte: int, row: int) -> None:
+        segment = source[start_byte:end_byte]
+        for index, part in enumerate(segment.split(b"\n")):
+            if index:
+                rows.append((min(line_rows, default=row), max(line_rows, default=row)))
+                line_rows.clear()
+                row += 1
+            if part:
+                line_rows.append(row)
+        text.extend(segment)
+
+    cursor, cursor_row = node.start_byte, node.start_point[0]
+    for body in bodies:
+        keep(cursor, body.start_byte, cursor_row)
+        text.extend(marker)
+        line_rows.extend((body.start_point[0], body.end_point[0]))
+        cursor, cursor_row = body.end_byte, body.end_point[0]
+    keep(cursor, node.end_byte, cursor_row)
+    rows.append((min(line_rows, default=cursor_row), max(line_rows, default=cursor_row)))
+    return text.decode("utf-8", errors="ignore"), rows
+
+
+def node_chunk(node, source: bytes, path: str, language: str) -> CodeChunk:
+    return CodeChunk(
+        content=node_text(node, source),
+        path=path,
+        language=language,
+        chunk_type="code",
+        node_type=node.type,
+        line_start=node.start_point[0] + 1,
+        line_end=node.end_point[0] + 1,
+        symbol_name=extract_symbol_name(node, source),
+    )
+
+
+def node_chunks(node, source: bytes, path: str, language: str, token_budget: int | None = None) -> list[CodeChunk]:
+    """``node_chunk``, split at child-node or blank-line boundaries when it exceeds ``token_budget``.
+
+    Classes are emitted as skeletons (see ``class_skeleton``); their method
+    bodies are only embedded through the method chunks.
+    """
+    chunk = node_chunk(node, source, path, language)
+    skeleton = class_skeleton(node, source, language) if node.type in CLASS_NODE_TYPES else None
+    if skeleton is not None:
+        text, rows = skeleton
+        chunk = replace(
+            chunk,
+            content=text,
+            elided_tokens=max(estimate_tokens(chunk.content) - estimate_tokens(text), 0),
+        )
+        if not token_budget or estimate_tokens(text) <= token_budget:
+            return [chunk]
+        return [
+            replace(
+                chunk,
+                content=piece,
+                line_start=rows[first][0] + 1,
+                line_end=rows[last][1] + 1,
+                elided_tokens=chunk.elided_tokens if index == 0 else 0,
+            )
+            for index, (piece, first, last) in enumerate(split_lines(text, 0, token_budget))
+        ]
+    # Every token covers at least one byte, so short nodes skip the estimate.
+    if not token_budget or node.end_byte - node.start_byte <= token_budget:
+        return [chunk]
+    if estimate_tokens(chunk.content) <= token_budget:
+        return [chunk]
+    origin = node.start_point[0]
+    boundaries = set()
+    for child in node.children:
+        boundaries.add(child.start_point[0] - origin)
+        boundaries.update(grandchild.start_point[0] - origin for grandchild in child.children)
+    return [
+        replace(chunk, content=text, line_start=line_start, line_end=line_end)
+        for text, line_start, line_end in split_lines(chunk.content, chunk.line_start, token_budget, boundaries=boundaries)
+    ]
+
+
+def file_chunk(path: str, content: str, language: str) -> CodeChunk:
+    return CodeChunk(
+        content=content[:12000],
+        path=path,
+        language=language,
+        chunk_type="file",
+        node_type="file",
+        line_start=1,
+        line_end=max(len(_lines(content)), 1),
+        symbol_name=None,
+    )
+
+
+def file_chunks(path: str, content: str, language: str, token_budget: int | None = None) -> list[CodeChunk]:
+    """Whole-file fallback; with a budget the file is split rather than truncated."""
+    chunk = file_chunk(path, content, language)
+    if not token_budget:
+        return [chunk]
+    return [
+        replace(chunk, content=text, line_start=line_start, line_end=line_end)
+        for text, line_start, line_end in split_lines(content, 1, token_budget)
+    ]
+
+
+def _lines(text: str) -> list[str]:
+    """Lines with their ``\n`` kept, breaking on ``\n`` only as git and tree-sitter rows do.
+
+    ``str.splitlines`` also breaks on form feeds and Unicode line separators,
+    which would shift line numbers away from the source rows.
+    """
+    lines = text.split("\n")
+    if lines[-1]:
+        return [line + "\n" for line in lines[:-1]] + [lines[-1]]
+    return [line + "\n" for line in lines[:-1]]
+
+
+def _cut_line(line: str, token_budget: int) -> list[str]:
+    """Split one overlong line at token boundaries."""
+    parts = []
+    while estimate_tokens(line) > token_budget:
+        head = truncate_to_tokens(line, token_budget)
+        cut = max(len(head), 1)
+        parts.append(line[:cut])
+        line = line[cut:]
+    if line:
+        parts.append(line)
+    return parts
+
+
+def split_lines(
+    text: str,
+    first_line: int,
+    token_budget: int,
+    *,
+    boundaries: Iterable[int] = (),
+    overlap: int = SPLIT_OVERLAP_LINES,
+) -> list[tuple[str, int, int]]:
+    """Split ``text`` into ``(text, line_start, line_end)`` pieces of at most ``token_budget`` tokens.
+
+    A piece that would overflow ends before the last boundary line (relative
+    index) or blank line that fits, falling back to a hard line break. Each
+    piece after the first repeats the final ``overlap`` lines of the one
+    before. A single line longer than the budget is cut at token boundaries
+    into pieces that all report that line.
+    """
+    lines = _lines(text)
+    if not lines:
+        return [(text, first_line, first_line)]
+    costs = [estimate_tokens(line) for line in lines]
+    breaks = set(boundaries) | {index for index, line in enumerate(lines) if not line.strip()}
+    pieces: list[tuple[str, int, int]] = []
+    start = 0
+    while True:
+        end, total, best = start, 0, None
+        while end < len(lines) and (end == start or total + costs[end] <= token_budget):
+            total += costs[end]
+            end += 1
+            if end in breaks:
+                best = end
+        if end < len(lines) and best is not None and best > start + overlap:
+            end = best
+        if end == start + 1 and costs[start] > token_budget:
+            line_no = first_line + start
+            pieces.extend((part.rstrip("\n"), line_no, line_no) for part in _cut_line(lines[start], token_budget))
+        else:
+            piece = "".join(lines[start:end]).rstrip("\n")
+            pieces.append((piece, first_line + start, first_line + end - 1))
+        if end >= len(lines):
+            return pieces
+        start = max(end - overlap, start + 1)
+
+
 def should_index_path(path: str, *, include_vendor: bool = False) -> bool:
     if language_for_path(path) is None:
         return False
@@ -128,47 +403,29 @@ def should_index_path(path: str, *, include_vendor: bool = False) -> bool:
     return not bool(parts & DEFAULT_EXCLUDED_PARTS)
 
 
-def chunk_file_content(path: str, content: str, parser, language: str) -> list[CodeChunk]:
+def chunk_file_content(
+    path: str,
+    content: str,
+    parser,
+    language: str,
+    *,
+    token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET,
+) -> list[CodeChunk]:
     if not content.strip():
         return []
 
     chunks: list[CodeChunk] = []
     if parser is not None:
-        content_bytes = content.encode("utf-8", errors="ignore")
-        tree = parser.parse(content_bytes)
-        for node in traverse(tree.root_node):
-            target_types = NODE_TYPES.get(language, set())
-            if node.type not in target_types:
-                continue
-            if node.type == "variable_declarator" and language == "JavaScript":
-                child_types = {child.type for child in node.children}
-                if not {"arrow_function", "function_expression"} & child_types:
-                    continue
-            text = content[node.start_byte : node.end_byte]
-            chunks.append(
-                CodeChunk(
-                    content=text,
-                    path=path,
-                    language=language,
-                    chunk_type="code",
-                    node_type=node.type,
-                    line_start=node.start_point[0] + 1,
-                    line_end=node.end_point[0] + 1,
-                    symbol_name=extract_symbol_name(node, content),
-                )
-            )
+        source = content.encode("utf-8", errors="ignore")
+        tree = parser.parse(source)
+        target_types = NODE_TYPES.get(language, ())
+        chunks = [
+            piece
+            for node in traverse(tree.root_node)
+            if node.type in target_types and is_chunk_node(node, language)
+            for piece in node_chunks(node, source, path, language, token_budget)
+        ]
 
     if not chunks:
-        chunks.append(
-            CodeChunk(
-                content=content[:12000],
-                path=path,
-                language=language,
-                chunk_type="file",
-                node_type="file",
-                line_start=1,
-                line_end=max(len(content.splitlines()), 1),
-                symbol_name=None,
-            )
-        )
+        chunks = file_chunks(path, content, language, token_budget)
     return chunks
@@ -0,0 +1,113 @@
+"""Process pool that parses and chunks files on every core.
+
+Each worker process keeps its own tree-sitter parsers (``get_parser`` caches
+per thread, and workers are single-threaded), so grammars load once per
+process rather than once per file. Results are returned in submission order,
+which keeps chunk ids identical to in-process chunking.
+"""
+
+from __future__ import annotations
+
+import atexit
+import concurrent.futures
+from dataclasses import dataclass
+import multiprocessing
+import threading
+from typing import Iterable, Sequence
+
+from gitrag.ids import content_hash
+from gitrag.ingest.chunker import DEFAULT_CHUNK_TOKEN_BUDGET, CodeChunk, chunk_file_content, get_parser
+
+# Files per task: large enough to amortise pickling, small enough to balance uneven files.
+DEFAULT_CHUNK_BATCH_FILES = 16
+
+FileItem = tuple[str, str, str]  # (path, content, language)
+
+
+@dataclass(frozen=True)
+class ChunkedFile:
+    chunks: list[CodeChunk]
+    hashes: list[str]
+
+
+def chunk_batch(items: Sequence[FileItem], token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET) -> list[ChunkedFile]:
+    """Chunk and hash each ``(path, content, language)``; runs inside the worker processes."""
+    results = []
+    for path, content, language in items:
+        chunks = chunk_file_content(path, content, get_parser(language), language, token_budget=token_budget)
+        results.append(ChunkedFile(chunks=chunks, hashes=[content_hash(chunk.content) for chunk in chunks]))
+    return results
+
+
+class ChunkingExecutor:
+    """``ProcessPoolExecutor`` wrapper; with one worker everything runs in the calling process."""
+
+    def __init__(
+        self,
+        workers: int,
+        *,
+        token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET,
+        batch_files: int = DEFAULT_CHUNK_BATCH_FILES,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.token_budget = token_budget
+        self.batch_files = max(1, batch_files)
+        self._pool: concurrent.futures.ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawn rather than fork: the ingest process already runs the git event-loop thread.
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def map(self, items: Iterable[FileItem]) -> list[ChunkedFile]:
+        """Chunk ``items``; result ``i`` belongs to item ``i`` regardless of which worker ran it."""
+        items = list(items)
+        if self.workers == 1 or len(items) <= 1:
+            return chunk_batch(items, self.token_budget)
+        pool = self._executor()
+        size = min(self.batch_files, -(-len(items) // self.workers))
+        futures = [
+            pool.submit(chunk_batch, items[start : start + size], self.token_budget)
+            for start in range(0, len(items), size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def __enter__(self) -> "ChunkingExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_executors: dict[tuple[int, int | None], ChunkingExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def chunking_executor(workers: int, *, token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET) -> ChunkingExecutor:
+    """Process-wide executor so ingestion jobs share one pool instead of respawning workers."""
+    key = (max(1, workers), token_budget)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = _executors[key] = ChunkingExecutor(workers, token_budget=token_budget)
+        return executor
+
+
+@atexit.register
+def close_chunking_executors() -> None:
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.close()
+        _executors.clear()
@@ -0,0 +1,138 @@
+"""Cheap pre-parse checks that keep generated, minified and oversized files out of the index.
+
+Checks run in order of cost: path patterns first, then the blob size from
+``git cat-file --batch-check``, and only then the content itself (generated
+markers near the top, line lengths, byte entropy). Each returns a skip
+reason, or None when the file should be indexed.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, fields, replace
+from fnmatch import fnmatch
+import json
+import math
+import re
+
+# Name patterns of compiler and bundler outputs (protobuf, gRPC, minifiers).
+GENERATED_NAME_PATTERNS = (
+    "*.min.js",
+    "*-min.js",
+    "*.bundle.js",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*_grpc.pb.go",
+    "*_pb.js",
+    "*_pb.ts",
+    "*_pb.d.ts",
+    "*.pb.ts",
+    "*.generated.ts",
+    "*.generated.js",
+)
+
+# Headers code generators write as a comment near the top of the file; prose that
+# merely mentions "do not edit" or "auto-generated" is not enough.
+GENERATED_HEADERS = tuple(
+    re.compile(pattern)
+    for pattern in (
+        r"^Code generated .* DO NOT EDIT\.$",
+        r"(^|\s)@generated(\s|$)",
+        r"^Generated by the protocol buffer compiler\.\s+DO NOT EDIT!$",
+    )
+)
+
+_COMMENT_PREFIXES = ("//", "#", "/*", "*", "--", ";", "<!--")
+_COMMENT_SUFFIXES = ("*/", "-->")
+
+
+@dataclass(frozen=True)
+class FileFilter:
+    max_bytes: int = 1_000_000
+    max_line_length: int = 2_000
+    max_average_line_length: int = 300
+    max_entropy: float = 6.0
+    header_bytes: int = 2_048
+    sample_bytes: int = 65_536
+    # Globs matched against the repo-relative path; ``include`` bypasses every heuristic.
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+
+    def classify_path(self, path: str) -> str | None:
+        if _matches(path, self.include):
+            return None
+        if _matches(path, self.exclude):
+            return "excluded"
+        if _matches(path, GENERATED_NAME_PATTERNS):
+            return "generated"
+        return None
+
+    def classify_size(self, path: str, size: int | None) -> str | None:
+        if size is None or _matches(path, self.include):
+            return None
+        return "too_large" if size > self.max_bytes else None
+
+    def classify_content(self, path: str, content: str) -> str | None:
+        if _matches(path, self.include) or not content:
+            return None
+        if any(map(_is_generated_header, content[: self.header_bytes].splitlines())):
+            return "generated"
+        lines = content.splitlines() or [""]
+        longest = max(map(len, lines))
+        if longest > self.max_line_length or len(content) / len(lines) > self.max_average_line_length:
+            return "minified"
+        if shannon_entropy(content[: self.sample_bytes].encode("utf-8", errors="ignore")) > self.max_entropy:
+            return "high_entropy"
+        return None
+
+    def with_overrides(self, overrides: dict) -> "FileFilter":
+        known = {item.name for item in fields(self)}
+        unknown = set(overrides) - known
+        if unknown:
+            raise ValueError(f"unknown file filter settings: {', '.join(sorted(unknown))}")
+        values = {
+            name: tuple(value) if name in {"include", "exclude"} else value for name, value in overrides.items()
+        }
+        return replace(self, **values)
+
+
+def _matches(path: str, patterns: tuple[str, ...]) -> bool:
+    name = path.rsplit("/", 1)[-1]
+    return any(fnmatch(path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+
+def _is_generated_header(line: str) -> bool:
+    line = line.strip()
+    prefix = next((prefix for prefix in _COMMENT_PREFIXES if line.startswith(prefix)), None)
+    if prefix is None:
+        return False
+    text = line[len(prefix) :]
+    for suffix in _COMMENT_SUFFIXES:
+        text = text.removesuffix(suffix)
+    text = text.strip()
+    return any(pattern.search(text) for pattern in GENERATED_HEADERS)
+
+
+def shannon_entropy(data: bytes) -> float:
+    """Bits per byte; source code sits around 4.5-5, base64 and compressed data near 6-8."""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+def file_filter_for_repo(repo_id: str, *, max_bytes: int, overrides_json: str = "") -> FileFilter:
+    """Default filter with ``max_bytes``, then ``"*"`` and ``repo_id`` entries from ``overrides_json``.
+
+    ``overrides_json`` maps a repo id (or ``"*"`` for every repo) to FileFilter
+    fields, e.g. ``{"web-1a2b3c": {"max_bytes": 5000000, "include": ["src/gen/*.ts"]}}``.
+    """
+    file_filter = FileFilter(max_bytes=max_bytes)
+    if not overrides_json:
+        return file_filter
+    overrides = json.loads(overrides_json)
+    for key in ("*", repo_id):
+        if key in overrides:
+            file_filter = file_filter.with_overrides(overrides[key])
+    return file_filter
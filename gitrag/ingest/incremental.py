@@ -0,0 +1,308 @@
+"""Incremental tree-sitter reparsing between consecutive versions of a file.
+
+The previous version's tree is edited with the git diff hunks and handed back
+to the parser so unchanged subtrees are reused. Chunks whose nodes lie
+outside every changed byte range are carried over from the previous version
+(shifted to their new position) instead of being rebuilt. Versions that parse
+with syntax errors, or follow one that did, are chunked from a fresh parse.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from itertools import accumulate
+import re
+
+from gitrag.ingest.chunker import (
+    DEFAULT_CHUNK_TOKEN_BUDGET,
+    CodeChunk,
+    file_chunks,
+    is_chunk_node,
+    node_chunks,
+    traverse,
+)
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+@dataclass(frozen=True)
+class LineEdit:
+    """A run of removed/added lines; starts are 1-based line numbers in each version."""
+
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+
+
+@dataclass(frozen=True)
+class ByteEdit:
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+    line_delta: int
+
+
+@dataclass
+class ParsedFile:
+    tree: object
+    source: bytes
+    spans: list[tuple[int, int, list[CodeChunk]]]
+
+
+class TreeCache:
+    """Most recent parsed versions keyed by git blob id, so a file's next version can find its parent."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, ParsedFile] = OrderedDict()
+
+    def get(self, oid: str | None) -> ParsedFile | None:
+        if oid is None:
+            return None
+        parsed = self._entries.get(oid)
+        if parsed is not None:
+            self._entries.move_to_end(oid)
+        return parsed
+
+    def put(self, oid: str | None, parsed: ParsedFile | None) -> None:
+        if oid is None or parsed is None:
+            return
+        self._entries[oid] = parsed
+        self._entries.move_to_end(oid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def line_edits_from_diff(diff_text: str | None) -> list[LineEdit] | None:
+    """Zero-context line edits from a unified diff, or None when it cannot be replayed."""
+    if not diff_text or "\r" in diff_text:
+        return None
+    edits: list[LineEdit] = []
+    old_line = new_line = 0
+    in_hunk = False
+    run: list[int] | None = None
+    for line in diff_text.split("\n"):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            if run:
+                edits.append(LineEdit(*run))
+                run = None
+            old_line, new_line = int(header.group(1)), int(header.group(2))
+            in_hunk = True
+            continue
+        if line.startswith("@@@"):
+            return None  # combined merge diff
+        if not in_hunk or line.startswith("\\"):
+            continue
+        marker = line[:1]
+        if marker in {"-", "+"}:
+            if run is None:
+                run = [old_line, 0, new_line, 0]
+            if marker == "-":
+                run[1] += 1
+                old_line += 1
+            else:
+                run[3] += 1
+                new_line += 1
+            continue
+        if run:
+            edits.append(LineEdit(*run))
+            run = None
+        if marker == " ":
+            old_line += 1
+            new_line += 1
+        else:
+            in_hunk = False
+    if run:
+        edits.append(LineEdit(*run))
+    return edits or None
+
+
+def _line_offsets(source: bytes) -> list[int]:
+    """Byte offset of every line start, plus the end of a final newline-less line."""
+    offsets = [0, *accumulate(len(line) + 1 for line in source.split(b"\n"))]
+    offsets[-1] = len(source)
+    if offsets[-2] == len(source):
+        offsets.pop()
+    return offsets
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    size = min(len(a), len(b))
+    for index in range(size):
+        if a[index] != b[index]:
+            return index
+    return size
+
+
+def _point(source: bytes, byte: int) -> tuple[int, int]:
+    row = source.count(b"\n", 0, byte)
+    return row, byte - (source.rfind(b"\n", 0, byte) + 1)
+
+
+def _advance(point: tuple[int, int], text: bytes) -> tuple[int, int]:
+    newlines = text.count(b"\n")
+    if not newlines:
+        return point[0], point[1] + len(text)
+    return point[0] + newlines, len(text) - text.rfind(b"\n") - 1
+
+
+def byte_edits(old: bytes, new: bytes, edits: list[LineEdit]) -> list[ByteEdit] | None:
+    """Line edits as byte ranges, or None if they do not turn ``old`` into ``new``."""
+    old_offsets, new_offsets = _line_offsets(old), _line_offsets(new)
+    result: list[ByteEdit] = []
+    delta = 0
+    for edit in edits:
+        old_first, new_first = edit.old_start - 1, edit.new_start - 1
+        if min(old_first, new_first) < 0:
+            return None
+        if old_first + edit.old_count >= len(old_offsets) or new_first + edit.new_count >= len(new_offsets):
+            return None
+        old_start, old_end = old_offsets[old_first], old_offsets[old_first + edit.old_count]
+        new_start, new_end = new_offsets[new_first], new_offsets[new_first + edit.new_count]
+        if old_start + delta != new_start:
+            return None
+        delta += (new_end - new_start) - (old_end - old_start)
+        # Whole-line edits make tree-sitter rescan the surrounding tokens; narrow to the bytes that differ.
+        prefix = _common_prefix(old[old_start:old_end], new[new_start:new_end])
+        suffix = _common_prefix(old[old_start + prefix : old_end][::-1], new[new_start + prefix : new_end][::-1])
+        result.append(
+            ByteEdit(
+                old_start=old_start + prefix,
+                old_end=old_end - suffix,
+                new_start=new_start + prefix,
+                new_end=new_end - suffix,
+                line_delta=edit.new_count - edit.old_count,
+            )
+        )
+    if len(old) + delta != len(new):
+        return None
+    return result
+
+
+def _touches(start: int, end: int, range_start: int, range_end: int) -> bool:
+    # Inclusive: error recovery can grow a node that merely abuts an edit.
+    return start <= range_end and range_start <= end
+
+
+def _map_offset(offset: int, edits: list[ByteEdit], *, at_end: bool = False) -> int:
+    """Map an old byte offset into the new version, clamping offsets inside an edit to its bounds."""
+    shift = 0
+    for edit in edits:
+        if offset < edit.old_start:
+            break
+        if offset <= edit.old_end:
+            return edit.new_end if at_end else edit.new_start
+        shift += (edit.new_end - edit.new_start) - (edit.old_end - edit.old_start)
+    return offset + shift
+
+
+def parse_file(
+    path: str,
+    content: str,
+    parser,
+    language: str,
+    *,
+    token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET,
+) -> tuple[list[CodeChunk], ParsedFile | None]:
+    if not content.strip():
+        return [], None
+    if parser is None:
+        return file_chunks(path, content, language, token_budget), None
+    source = content.encode("utf-8", errors="ignore")
+    tree = parser.parse(source)
+    spans = [
+        (node.start_byte, node.end_byte, node_chunks(node, source, path, language, token_budget))
+        for node in traverse(tree.root_node)
+        if is_chunk_node(node, language)
+    ]
+    return _finish(path, content, language, tree, source, spans, token_budget)
+
+
+def chunk_file_incremental(
+    path: str,
+    content: str,
+    parser,
+    language: str,
+    *,
+    previous: ParsedFile | None = None,
+    line_edits: list[LineEdit] | None = None,
+    token_budget: int | None = DEFAULT_CHUNK_TOKEN_BUDGET,
+) -> tuple[list[CodeChunk], ParsedFile | None]:
+    """Chunk ``content`` reusing ``previous`` when ``line_edits`` turn it into this version.
+
+    Returns the chunks (same output as ``chunk_file_content``) plus the parse
+    state to cache for the next version.
+    """
+    if previous is None or not line_edits or parser is None or not content.strip() or previous.tree.root_node.has_error:
+        return parse_file(path, content, parser, language, token_budget=token_budget)
+    source = content.encode("utf-8", errors="ignore")
+    edits = byte_edits(previous.source, source, line_edits)
+    if edits is None:
+        return parse_file(path, content, parser, language, token_budget=token_budget)
+
+    old_tree = previous.tree.copy()
+    for edit in edits:
+        # Applied in order, so the text before this edit already matches the new version.
+        start_point = _point(source, edit.new_start)
+        old_tree.edit(
+            edit.new_start,
+            edit.new_start + (edit.old_end - edit.old_start),
+            edit.new_end,
+            start_point,
+            _advance(start_point, previous.source[edit.old_start : edit.old_end]),
+            _advance(start_point, source[edit.new_start : edit.new_end]),
+        )
+    tree = parser.parse(source, old_tree)
+    if tree.root_node.has_error:
+        # Error recovery can retype or resize nodes outside ``changed_ranges``; only a fresh parse matches.
+        return parse_file(path, content, parser, language, token_budget=token_budget)
+
+    dirty = [(edit.new_start, edit.new_end) for edit in edits]
+    dirty += [(changed.start_byte, changed.end_byte) for changed in old_tree.changed_ranges(tree)]
+
+    spans: list[tuple[int, int, list[CodeChunk]]] = []
+    for start, end, pieces in previous.spans:
+        if any(_touches(start, end, edit.old_start, edit.old_end) for edit in edits):
+            # The node's new extent may have moved without any syntax change, so re-walk it.
+            dirty.append((_map_offset(start, edits), _map_offset(end, edits, at_end=True)))
+            continue
+        byte_shift = line_shift = 0
+        for edit in edits:
+            if edit.old_end < start:
+                byte_shift += (edit.new_end - edit.new_start) - (edit.old_end - edit.old_start)
+                line_shift += edit.line_delta
+        if line_shift or pieces[0].path != path:
+            pieces = [
+                replace(chunk, path=path, line_start=chunk.line_start + line_shift, line_end=chunk.line_end + line_shift)
+                for chunk in pieces
+            ]
+        spans.append((start + byte_shift, end + byte_shift, pieces))
+    # Carried chunks inside a range tree-sitter reports as changed are rebuilt below instead.
+    spans = [span for span in spans if not any(_touches(span[0], span[1], low, high) for low, high in dirty)]
+
+    def touches_dirty(node) -> bool:
+        return any(_touches(node.start_byte, node.end_byte, low, high) for low, high in dirty)
+
+    for node in traverse(tree.root_node, enter=touches_dirty):
+        if is_chunk_node(node, language):
+            spans.append((node.start_byte, node.end_byte, node_chunks(node, source, path, language, token_budget)))
+    # Pre-order traversal order: by start, enclosing nodes first.
+    spans.sort(key=lambda span: (span[0], -span[1]))
+    return _finish(path, content, language, tree, source, spans, token_budget)
+
+
+def _finish(
+    path: str,
+    content: str,
+    language: str,
+    tree,
+    source: bytes,
+    spans: list[tuple[int, int, list[CodeChunk]]],
+    token_budget: int | None,
+) -> tuple[list[CodeChunk], ParsedFile]:
+    chunks = [chunk for _, _, pieces in spans for chunk in pieces] or file_chunks(path, content, language, token_budget)
+    return chunks, ParsedFile(tree=tree, source=source, spans=spans)
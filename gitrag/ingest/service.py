@@ -2,16 +2,21 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import datetime, timezone
 import json
 from pathlib import Path
+import time
 import uuid
 
 from sqlalchemy.orm import Session
 
 from gitrag.config import Settings, get_settings
+from gitrag.db.session import insert_if_absent, upsert
 from gitrag.db.models import (
+    Blob,
+    BlobChunk,
     Chunk,
     ChunkRef,
     Commit,
@@ -26,17 +31,22 @@ from gitrag.db.models import (
 )
 from gitrag.git import (
     ZERO_SHA,
+    ChangedFile,
+    GitRef,
+    async_git_runner,
+    blob_sizes,
     build_commit_graph,
-    changed_files,
     clone_or_fetch_mirror,
-    diff_for_file,
-    file_at_sha,
+    diff_for_file_async,
+    iter_commit_changes,
     language_for_path,
     list_refs,
+    read_blobs,
     repo_display_name,
-    refs_containing_commit,
     rev_list_between,
+    set_git_concurrency,
 )
+from gitrag.graph import BRANCH_REF_TYPES, BranchIndex, CommitGraph
 from gitrag.ids import (
     chunk_id,
     content_hash,
@@ -46,14 +56,38 @@ from gitrag.ids import (
     stable_hash,
     symbol_id,
 )
-from gitrag.ingest.chunker import CodeChunk, build_parsers, chunk_file_content, should_index_path
+from gitrag.ingest.chunker import (
+    CHUNKER_VERSION,
+    CodeChunk,
+    get_parser,
+    should_index_path,
+)
+from gitrag.ingest.executor import ChunkedFile, chunking_executor
+from gitrag.ingest.filters import file_filter_for_repo
+from gitrag.ingest.incremental import TreeCache, chunk_file_incremental, line_edits_from_diff
 from gitrag.queue.kafka import KafkaPublisher
 from gitrag.retrieval.embedding import Embedder
 from gitrag.retrieval.vector import VectorStore, get_vector_store
-from gitrag.storage.object_store import ObjectStore, diff_key, snapshot_key
+from gitrag.storage.object_store import ObjectStore, StoredObject, blob_key, diff_key, snapshot_key
 from gitrag.storage.snapshot import choose_storage_kind, storage_reduction
 
 
+# Branch membership indexes kept per repo for the life of the worker process so
+# webhook jobs only move the refs that changed instead of rebuilding. Least
+# recently used repos are dropped past _BRANCH_INDEX_CACHE_REPOS.
+_branch_indexes: OrderedDict[str, BranchIndex] = OrderedDict()
+_BRANCH_INDEX_CACHE_REPOS = 16
+
+
+@dataclass(frozen=True)
+class _PendingChunk:
+    """A chunk row waiting for its vector; written together with the upsert."""
+
+    row: dict
+    refs: list[str]
+    vector_metadata: dict
+
+
 @dataclass(frozen=True)
 class BootstrapResult:
     repo_id: str
@@ -78,6 +112,7 @@ class IngestionService:
         self.vector_store = vector_store or get_vector_store(self.settings)
         self.object_store = object_store or ObjectStore(self.settings)
         self.publisher = publisher
+        set_git_concurrency(self.settings.git_concurrency)
 
     def bootstrap_repo(self, session: Session, *, repo_url: str, enqueue: bool = True) -> BootstrapResult:
         repo_id = normalize_repo_id(repo_url)
@@ -92,9 +127,17 @@ class IngestionService:
         repo.default_branch = _default_branch(refs)
         session.merge(repo)
 
+        # Re-bootstraps move refs in place and drop ones the mirror pruned.
+        stored_refs = {row.name: row for row in session.query(RepositoryRef).filter(RepositoryRef.repo_id == repo_id)}
         for ref in refs:
-            session.merge(RepositoryRef(repo_id=repo_id, name=ref.name, ref_type=ref.ref_type, sha=ref.sha))
-        self._persist_commit_graph(session, repo_id, graph)
+            row = stored_refs.pop(ref.name, None)
+            if row is None:
+                session.add(RepositoryRef(repo_id=repo_id, name=ref.name, ref_type=ref.ref_type, sha=ref.sha))
+            else:
+                row.ref_type, row.sha = ref.ref_type, ref.sha
+        for row in stored_refs.values():
+            session.delete(row)
+        self._persist_commit_graph(session, repo_id, graph, refresh=True)
 
         job_id = f"job_{stable_hash(str(uuid.uuid4()), 32)}"
         job = IngestionJob(
@@ -127,7 +170,13 @@ class IngestionService:
         repo_id = normalize_repo_id(repo_url)
         repo = session.get(Repository, repo_id)
         if repo is None:
-            repo_path = clone_or_fetch_mirror(repo_url, self.settings.clone_repo_dir)
+            repo_path = clone_or_fetch_mirror(
+                repo_url,
+                self.settings.clone_repo_dir,
+                want_sha=after,
+                want_ref=ref,
+                max_age_seconds=self.settings.mirror_fetch_max_age_seconds,
+            )
             repo = Repository(id=repo_id, url=repo_url, name=repo_display_name(repo_url), local_path=str(repo_path))
             session.add(repo)
 
@@ -176,20 +225,53 @@ class IngestionService:
         repo = session.get(Repository, payload["repo_id"])
         if repo is None:
             raise ValueError(f"Unknown repo_id: {payload['repo_id']}")
-        repo_path = clone_or_fetch_mirror(repo.url, self.settings.clone_repo_dir)
+        repo_path = clone_or_fetch_mirror(
+            repo.url,
+            self.settings.clone_repo_dir,
+            want_sha=payload.get("after") if payload.get("mode") != "bootstrap" else None,
+            want_ref=payload.get("ref") if payload.get("mode") != "bootstrap" else None,
+            max_age_seconds=self.settings.mirror_fetch_max_age_seconds,
+        )
         repo.local_path = str(repo_path)
 
         try:
+            refs = list_refs(repo_path)
             if payload.get("mode") == "bootstrap":
                 graph = build_commit_graph(repo_path)
-                shas = sorted(graph.keys(), key=lambda sha: graph[sha].get("depth", 0))
-                self._persist_commit_graph(session, repo.id, graph)
+                shas = graph.shas_by_depth()
+                self._persist_commit_graph(session, repo.id, graph, refresh=True)
+                branch_index = BranchIndex.build(graph, refs)
             else:
                 shas = rev_list_between(repo_path, payload.get("before"), payload["after"])
-                graph = build_commit_graph(repo_path)
+                graph = build_commit_graph(repo_path, shas)
+                external = graph.external_parents()
+                if external:
+                    graph.compute_depths(self._known_depths(session, repo.id, external))
                 self._persist_commit_graph(session, repo.id, graph)
-
-            stats = self.ingest_commits(session, repo_id=repo.id, repo_path=Path(repo_path), shas=shas)
+                branch_index = _branch_indexes.get(repo.id)
+                if branch_index is not None and self._branch_index_is_stale(session, repo.id, branch_index, graph, refs):
+                    # Another worker ingested pushes in between (e.g. after a partition rebalance).
+                    branch_index = None
+                if branch_index is None:
+                    branch_index = self._load_branch_index(session, repo.id, refs)
+                if branch_index is None:
+                    # Nothing persisted for this repo yet: fall back to the full walk.
+                    branch_index = BranchIndex.build(build_commit_graph(repo_path), refs)
+                else:
+                    branch_index.add_commits({sha: graph.parents(sha) for sha in graph})
+                    branch_index.update_refs(refs)
+            _branch_indexes[repo.id] = branch_index
+            _branch_indexes.move_to_end(repo.id)
+            while len(_branch_indexes) > _BRANCH_INDEX_CACHE_REPOS:
+                _branch_indexes.popitem(last=False)
+
+            stats = self.ingest_commits(
+                session,
+                repo_id=repo.id,
+                repo_path=Path(repo_path),
+                shas=shas,
+                branch_index=branch_index,
+            )
             repo.indexed_generation += 1
             job.status = "complete"
             job.stats_json = stats
@@ -199,35 +281,164 @@ class IngestionService:
             job.error = str(exc)
             raise
 
-    def ingest_commits(self, session: Session, *, repo_id: str, repo_path: Path, shas: list[str]) -> dict:
-        parsers = build_parsers()
-        stats = {"commits": 0, "files": 0, "chunks": 0, "vectors": 0, "naive_bytes": 0, "stored_bytes": 0}
-        vector_batch: list[tuple[str, list[float], dict]] = []
+    def ingest_commits(
+        self,
+        session: Session,
+        *,
+        repo_id: str,
+        repo_path: Path,
+        shas: list[str],
+        branch_index: BranchIndex | None = None,
+    ) -> dict:
+        if branch_index is None:
+            branch_index = BranchIndex.build(build_commit_graph(repo_path), list_refs(repo_path))
+        stats = {
+            "commits": 0,
+            "files": 0,
+            "chunks": 0,
+            "vectors": 0,
+            "naive_bytes": 0,
+            "stored_bytes": 0,
+            "blobs_reused": 0,
+            "renamed": 0,
+            "renames_reused": 0,
+            "chunks_inherited": 0,
+            "elided_tokens": 0,
+            "skipped": {},
+            "embedding_flushes": 0,
+        }
+        # Chunks from many files and commits share one cache lookup and full embedding batches.
+        pending: list[_PendingChunk] = []
+        pending_since = 0.0
         seen_chunk_ids: set[str] = set()
-        seen_symbol_ids: set[str] = set()
+        symbol_first_shas: dict[str, str] = {}
         seen_files: dict[str, File] = {}
+        known_blobs: dict[str, Blob] = {}
+        blob_chunk_cache: dict[str, list[CodeChunk]] = {}
+        tree_cache = TreeCache()
+        live_chunks: dict[tuple[str, str], dict[tuple, str]] = {}
+
+        embedding_before = dict(self.embedder.stats)
+        git_async = async_git_runner()
+        file_filter = file_filter_for_repo(
+            repo_id,
+            max_bytes=self.settings.max_file_bytes,
+            overrides_json=self.settings.file_filter_overrides,
+        )
+        chunking = (
+            chunking_executor(self.settings.chunk_workers, token_budget=self.settings.chunk_token_budget)
+            if self.settings.chunk_workers > 1
+            else None
+        )
 
-        for commit_index, sha in enumerate(shas, 1):
+        changes_stream = iter_commit_changes(
+            repo_path,
+            shas,
+            rename_threshold=self.settings.rename_similarity_threshold or None,
+        )
+        for commit_index, changes in enumerate(changes_stream, 1):
+            sha = changes.sha
             commit = session.get(Commit, {"repo_id": repo_id, "sha": sha})
-            commit_refs = refs_containing_commit(repo_path, sha)
-            is_merge = bool(commit.is_merge) if commit else False
+            commit_refs = branch_index.refs_for(sha)
+            is_merge = len(changes.parents) > 1
             commit_time = commit.commit_time if commit else None
-            parent_shas = [row.parent_sha for row in session.query(CommitParent).filter_by(repo_id=repo_id, child_sha=sha).all()]
-            parent_sha = parent_shas[0] if parent_shas else None
+            parent_sha = changes.parents[0] if changes.parents else None
+
+            candidates = [
+                changed
+                for changed in changes.files
+                if changed.status != "D"
+                and should_index_path(changed.path, include_vendor=self.settings.index_vendor_code)
+                and language_for_path(changed.path) is not None
+            ]
+            skipped: dict[str, str] = {}
+            for changed in candidates:
+                reason = file_filter.classify_path(changed.path)
+                if reason:
+                    skipped[changed.path] = reason
+            known_blobs.update(
+                self._lookup_blobs(
+                    session,
+                    repo_id,
+                    {changed.blob_oid for changed in candidates if changed.blob_oid and changed.blob_oid not in known_blobs},
+                )
+            )
+            fresh = [
+                changed
+                for changed in candidates
+                if changed.path not in skipped
+                and not _reusable_blob(known_blobs.get(changed.blob_oid), language_for_path(changed.path))
+            ]
+            # Blobs seen before already passed these checks; only new content is sized and sniffed.
+            sizes = blob_sizes(repo_path, (changed.blob_oid for changed in fresh))
+            for changed in fresh:
+                reason = file_filter.classify_size(changed.path, sizes.get(changed.blob_oid))
+                if reason:
+                    skipped[changed.path] = reason
+            fresh = [changed for changed in fresh if changed.path not in skipped]
+            contents = dict(zip((c.path for c in fresh), read_blobs(repo_path, [(sha, c.path) for c in fresh])))
+            # A blob first stored as a diff only has a patch against its first parent; read it here so
+            # the reuse below can give it a full-content object.
+            patched = [
+                changed
+                for changed in candidates
+                if changed.path not in skipped
+                and _reusable_blob(known_blobs.get(changed.blob_oid), language_for_path(changed.path))
+                and known_blobs[changed.blob_oid].storage_kind == "diff"
+            ]
+            patched_contents = dict(
+                zip((c.path for c in patched), read_blobs(repo_path, [(sha, c.path) for c in patched]))
+            )
+            for path, content in contents.items():
+                reason = file_filter.classify_content(path, content) if content is not None else None
+                if reason:
+                    skipped[path] = reason
+            if skipped:
+                for reason in skipped.values():
+                    stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+                candidates = [changed for changed in candidates if changed.path not in skipped]
+                fresh = [changed for changed in fresh if changed.path not in skipped]
+            # Diffs run concurrently in the background while this commit's files are chunked and embedded.
+            # Pure renames have no content diff, so they are skipped outright.
+            diffs = {
+                changed.path: git_async.submit(
+                    diff_for_file_async(repo_path, sha, changed.path, old_path=changed.old_path)
+                )
+                for changed in candidates
+                if not _pure_rename(changed)
+            }
+            parent_contents = (
+                dict(
+                    zip(
+                        (c.path for c in fresh),
+                        read_blobs(repo_path, [(parent_sha, c.old_path or c.path) for c in fresh]),
+                    )
+                )
+                if parent_sha
+                else {}
+            )
+            pooled: dict[str, ChunkedFile] = {}
+            if chunking is not None:
+                # Files with a cached parent tree reparse incrementally in-process; the rest fan out.
+                cold = [
+                    changed
+                    for changed in fresh
+                    if changed.path in contents and (is_merge or tree_cache.get(changed.old_blob_oid) is None)
+                ]
+                if len(cold) >= chunking.workers:
+                    results = chunking.map(
+                        (changed.path, contents[changed.path], language_for_path(changed.path)) for changed in cold
+                    )
+                    pooled = dict(zip((changed.path for changed in cold), results))
 
-            for changed in changed_files(repo_path, sha):
-                if changed.status == "D":
-                    continue
-                if not should_index_path(changed.path, include_vendor=self.settings.index_vendor_code):
-                    continue
+            for changed in candidates:
                 language = language_for_path(changed.path)
-                if language is None:
-                    continue
-                content = file_at_sha(repo_path, sha, changed.path)
-                if content is None:
+                blob = known_blobs.get(changed.blob_oid) if changed.blob_oid else None
+                reuse = _reusable_blob(blob, language)
+                content = None if reuse else contents.get(changed.path)
+                if not reuse and content is None:
                     continue
-                parent_content = file_at_sha(repo_path, parent_sha, changed.path) if parent_sha else None
-                file_hash = content_hash(content)
+                file_hash = blob.content_hash if reuse else content_hash(content)
                 current_file_id = file_id(repo_id, changed.path)
                 db_file = seen_files.get(current_file_id)
                 if db_file is None:
@@ -246,22 +457,49 @@ class IngestionService:
                     db_file.latest_sha = sha
                 seen_files[current_file_id] = db_file
 
-                decision = choose_storage_kind(
-                    has_parent=parent_sha is not None,
-                    is_merge=is_merge,
-                    version_index=commit_index,
-                    current_content=content,
-                    parent_content=parent_content,
-                    snapshot_interval=self.settings.snapshot_interval,
-                    change_threshold=self.settings.snapshot_change_threshold,
-                )
-                object_text = content
-                object_key = snapshot_key(repo_id, sha, changed.path)
-                if decision.kind == "diff" and parent_sha:
-                    object_text = diff_for_file(repo_path, sha, changed.path) or ""
-                    object_key = diff_key(repo_id, parent_sha, sha, changed.path)
-                stored = self.object_store.put_text(object_key, object_text, compress=True)
-                stats["naive_bytes"] += len(content.encode("utf-8"))
+                if reuse and blob.storage_kind == "diff":
+                    text = patched_contents.get(changed.path, contents.get(changed.path))
+                    materialized = self.object_store.put_text(
+                        blob_key(repo_id, changed.blob_oid), text or "", compress=True
+                    )
+                    blob.storage_kind = "snapshot"
+                    blob.s3_key = materialized.key
+                    stats["stored_bytes"] += materialized.stored_bytes
+                if reuse:
+                    # Same bytes already stored and chunked: point at the blob's full-content object.
+                    storage_kind = "blob_ref"
+                    naive_bytes = blob.size_bytes
+                    stored = StoredObject(key=blob.s3_key, raw_bytes=blob.size_bytes, stored_bytes=0)
+                    stats["blobs_reused"] += 1
+                    if changed.status == "R":
+                        stats["renames_reused"] += 1
+                else:
+                    decision = choose_storage_kind(
+                        has_parent=parent_sha is not None,
+                        is_merge=is_merge,
+                        version_index=commit_index,
+                        current_content=content,
+                        parent_content=parent_contents.get(changed.path),
+                        snapshot_interval=self.settings.snapshot_interval,
+                        change_threshold=self.settings.snapshot_change_threshold,
+                    )
+                    storage_kind = decision.kind
+                    if storage_kind == "diff" and changed.path not in diffs:
+                        # A pure rename has no diff to store; keep the content itself.
+                        storage_kind = "snapshot"
+                    naive_bytes = len(content.encode("utf-8"))
+                    object_text = content
+                    if changed.blob_oid:
+                        object_key = blob_key(repo_id, changed.blob_oid)
+                    else:
+                        object_key = snapshot_key(repo_id, sha, changed.path)
+                    if storage_kind == "diff" and parent_sha:
+                        object_text = diffs[changed.path].result() or ""
+                        object_key = diff_key(repo_id, parent_sha, sha, changed.path)
+                    stored = self.object_store.put_text(object_key, object_text, compress=True)
+                if changed.status == "R":
+                    stats["renamed"] += 1
+                stats["naive_bytes"] += naive_bytes
                 stats["stored_bytes"] += stored.stored_bytes
 
                 file_version = FileVersion(
@@ -272,32 +510,73 @@ class IngestionService:
                     path=changed.path,
                     parent_sha=parent_sha,
                     change_type=changed.status,
-                    storage_kind=decision.kind,
+                    storage_kind=storage_kind,
                     s3_key=stored.key,
                     content_hash=file_hash,
+                    blob_oid=changed.blob_oid,
                     size_bytes=stored.raw_bytes,
                     compressed_bytes=stored.stored_bytes,
                 )
                 session.merge(file_version)
                 session.merge(
                     SnapshotManifest(
-                        id=f"snap_{stable_hash(file_version.id + '|' + decision.kind, 32)}",
+                        id=f"snap_{stable_hash(file_version.id + '|' + storage_kind, 32)}",
                         repo_id=repo_id,
                         file_id=current_file_id,
                         sha=sha,
                         parent_sha=parent_sha,
                         path=changed.path,
-                        kind=decision.kind,
+                        kind=storage_kind,
                         s3_key=stored.key,
                         content_hash=file_hash,
-                        naive_bytes=len(content.encode("utf-8")),
+                        naive_bytes=naive_bytes,
                         stored_bytes=stored.stored_bytes,
                     )
                 )
 
-                parser = parsers.get(language)
-                chunks = chunk_file_content(changed.path, content, parser, language)
-                diff_text = diff_for_file(repo_path, sha, changed.path)
+                if reuse:
+                    chunks = [
+                        replace(chunk, path=changed.path)
+                        for chunk in self._blob_chunks(session, blob, blob_chunk_cache)
+                    ]
+                    chunk_hashes = [content_hash(chunk.content) for chunk in chunks]
+                elif changed.path in pooled:
+                    chunks = list(pooled[changed.path].chunks)
+                    chunk_hashes = list(pooled[changed.path].hashes)
+                else:
+                    previous = tree_cache.get(changed.old_blob_oid) if not is_merge else None
+                    line_edits = (
+                        line_edits_from_diff(diffs[changed.path].result())
+                        if previous is not None and changed.path in diffs
+                        else None
+                    )
+                    chunks, parsed = chunk_file_incremental(
+                        changed.path,
+                        content,
+                        get_parser(language),
+                        language,
+                        previous=previous,
+                        line_edits=line_edits,
+                        token_budget=self.settings.chunk_token_budget,
+                    )
+                    tree_cache.put(changed.blob_oid, parsed)
+                    chunk_hashes = [content_hash(chunk.content) for chunk in chunks]
+                if not reuse and changed.blob_oid:
+                    known_blobs[changed.blob_oid] = self._record_blob(
+                        session,
+                        repo_id=repo_id,
+                        oid=changed.blob_oid,
+                        language=language,
+                        content=content,
+                        sha=sha,
+                        storage_kind=storage_kind,
+                        s3_key=stored.key,
+                        chunks=chunks,
+                        stale=blob is not None,
+                    )
+                    blob_chunk_cache[changed.blob_oid] = list(chunks)
+
+                diff_text = diffs[changed.path].result() if changed.path in diffs else None
                 if diff_text:
                     chunks.append(
                         CodeChunk(
@@ -311,15 +590,38 @@ class IngestionService:
                             symbol_name=None,
                         )
                     )
+                    chunk_hashes.append(content_hash(chunks[-1].content))
 
-                vectors_by_hash = self.embedder.embed_with_cache(session, [chunk.content for chunk in chunks])
-                for code_chunk in chunks:
-                    chunk_hash = content_hash(code_chunk.content)
+                parent_chunks: dict[tuple, str] = {}
+                if self.settings.hunk_scoped_chunks and parent_sha and changed.old_blob_oid:
+                    parent_chunks = self._parent_chunk_ids(
+                        session, repo_id, changed, chunks, chunk_hashes, live_chunks
+                    )
+                version_chunks: dict[tuple, str] = {}
+                fresh_chunks = []
+                for code_chunk, chunk_hash in zip(chunks, chunk_hashes):
+                    key = _chunk_key(code_chunk, chunk_hash)
+                    if code_chunk.chunk_type != "diff" and key in parent_chunks:
+                        # Untouched symbol: the parent version's chunk and vector stand for this one too.
+                        version_chunks[key] = parent_chunks[key]
+                        stats["chunks_inherited"] += 1
+                    else:
+                        fresh_chunks.append((code_chunk, chunk_hash))
+
+                for code_chunk, chunk_hash in fresh_chunks:
                     symbol_pk = None
                     if code_chunk.symbol_name:
                         symbol_pk = symbol_id(repo_id, changed.path, code_chunk.symbol_name, code_chunk.node_type)
-                        if symbol_pk not in seen_symbol_ids:
-                            seen_symbol_ids.add(symbol_pk)
+                        if symbol_pk not in symbol_first_shas:
+                            first_sha = sha
+                            if changed.old_path:
+                                # Keep the symbol's history across the move.
+                                first_sha = self._symbol_first_sha(
+                                    session,
+                                    symbol_id(repo_id, changed.old_path, code_chunk.symbol_name, code_chunk.node_type),
+                                    symbol_first_shas,
+                                ) or sha
+                            symbol_first_shas[symbol_pk] = first_sha
                             session.merge(
                                 Symbol(
                                     id=symbol_pk,
@@ -329,7 +631,7 @@ class IngestionService:
                                     name=code_chunk.symbol_name,
                                     kind=code_chunk.node_type,
                                     language=language,
-                                    first_sha=sha,
+                                    first_sha=first_sha,
                                     last_sha=sha,
                                 )
                             )
@@ -344,36 +646,36 @@ class IngestionService:
                         hash_value=chunk_hash,
                         embedding_model=self.embedder.model,
                     )
+                    if code_chunk.chunk_type != "diff":
+                        version_chunks[_chunk_key(code_chunk, chunk_hash)] = current_chunk_id
                     if current_chunk_id in seen_chunk_ids:
                         continue
                     seen_chunk_ids.add(current_chunk_id)
-                    db_chunk = Chunk(
-                        id=current_chunk_id,
-                        repo_id=repo_id,
-                        sha=sha,
-                        file_id=current_file_id,
-                        symbol_id=symbol_pk,
-                        path=changed.path,
-                        language=language,
-                        chunk_type=code_chunk.chunk_type,
-                        symbol_name=code_chunk.symbol_name,
-                        line_start=code_chunk.line_start,
-                        line_end=code_chunk.line_end,
-                        content=code_chunk.content,
-                        content_hash=chunk_hash,
-                        embedding_model=self.embedder.model,
-                        vector_id=current_chunk_id,
-                        commit_time=commit_time,
-                        metadata_json={"node_type": code_chunk.node_type, "storage_kind": decision.kind},
-                    )
-                    session.merge(db_chunk)
-                    for ref_name in commit_refs:
-                        session.merge(ChunkRef(chunk_id=current_chunk_id, repo_id=repo_id, ref_name=ref_name))
-                    vector_batch.append(
-                        (
-                            current_chunk_id,
-                            vectors_by_hash[chunk_hash],
-                            {
+                    if not pending:
+                        pending_since = time.monotonic()
+                    pending.append(
+                        _PendingChunk(
+                            row={
+                                "id": current_chunk_id,
+                                "repo_id": repo_id,
+                                "sha": sha,
+                                "file_id": current_file_id,
+                                "symbol_id": symbol_pk,
+                                "path": changed.path,
+                                "language": language,
+                                "chunk_type": code_chunk.chunk_type,
+                                "symbol_name": code_chunk.symbol_name,
+                                "line_start": code_chunk.line_start,
+                                "line_end": code_chunk.line_end,
+                                "content": code_chunk.content,
+                                "content_hash": chunk_hash,
+                                "embedding_model": self.embedder.model,
+                                "vector_id": current_chunk_id,
+                                "commit_time": commit_time,
+                                "metadata_json": {"node_type": code_chunk.node_type, "storage_kind": storage_kind},
+                            },
+                            refs=commit_refs,
+                            vector_metadata={
                                 "repo_id": repo_id,
                                 "sha": sha,
                                 "path": changed.path,
@@ -386,41 +688,239 @@ class IngestionService:
                         )
                     )
                     stats["chunks"] += 1
+                    stats["elided_tokens"] += code_chunk.elided_tokens
+                if self.settings.hunk_scoped_chunks and changed.blob_oid:
+                    live_chunks[(changed.path, changed.blob_oid)] = version_chunks
                 stats["files"] += 1
+                if pending and (
+                    len(pending) >= self.settings.embedding_flush_chunks
+                    or time.monotonic() - pending_since >= self.settings.embedding_flush_seconds
+                ):
+                    self._flush_pending(session, pending, stats)
 
             stats["commits"] += 1
-            if len(vector_batch) >= self.settings.vector_upsert_batch_size:
-                self.vector_store.upsert(vector_batch)
-                stats["vectors"] += len(vector_batch)
-                vector_batch.clear()
-                session.flush()
-
-        if vector_batch:
-            self.vector_store.upsert(vector_batch)
-            stats["vectors"] += len(vector_batch)
+
+        self._flush_pending(session, pending, stats)
         session.flush()
+        requests = self.embedder.stats["requests"] - embedding_before["requests"]
+        stats["embedding_requests"] = requests
+        stats["embedding_batch_fill"] = self.embedder.batch_fill(
+            requests, self.embedder.stats["tokens"] - embedding_before["tokens"]
+        )
+        stats["embedding_truncated"] = self.embedder.stats["truncated"] - embedding_before["truncated"]
         stats["storage_reduction"] = storage_reduction(stats["naive_bytes"], stats["stored_bytes"])
         self._write_storage_report(repo_id, stats)
         return stats
 
-    def _persist_commit_graph(self, session: Session, repo_id: str, graph: dict[str, dict]) -> None:
-        for sha, data in graph.items():
-            commit_time = datetime.fromtimestamp(int(data.get("timestamp") or 0), tz=timezone.utc)
-            session.merge(
-                Commit(
+    def _flush_pending(self, session: Session, pending: list[_PendingChunk], stats: dict) -> None:
+        """Embed every pending chunk in one pass, then write its rows and upsert its vectors."""
+        if not pending:
+            return
+        vectors_by_hash = self.embedder.embed_with_cache(session, [item.row["content"] for item in pending])
+        vector_batch = []
+        for item in pending:
+            session.merge(Chunk(**item.row))
+            for ref_name in item.refs:
+                session.merge(ChunkRef(chunk_id=item.row["id"], repo_id=item.row["repo_id"], ref_name=ref_name))
+            vector_batch.append((item.row["id"], vectors_by_hash[item.row["content_hash"]], item.vector_metadata))
+        size = self.settings.vector_upsert_batch_size
+        for start in range(0, len(vector_batch), size):
+            self.vector_store.upsert(vector_batch[start : start + size])
+        stats["vectors"] += len(vector_batch)
+        stats["embedding_flushes"] += 1
+        pending.clear()
+        session.flush()
+
+    def _persist_commit_graph(
+        self, session: Session, repo_id: str, graph: CommitGraph, *, refresh: bool = False
+    ) -> None:
+        """Write commits and parent edges; ``refresh`` also rewrites refs and depth of stored commits."""
+        commit_rows = (
+            {
+                "repo_id": repo_id,
+                "sha": sha,
+                "author": data["author"],
+                "email": data["email"],
+                "message": data["message"],
+                "commit_time": datetime.fromtimestamp(int(data["timestamp"] or 0), tz=timezone.utc),
+                "is_merge": data["is_merge"],
+                "depth": data["depth"],
+                "refs_json": data["refs"],
+            }
+            for sha, data in graph.items()
+        )
+        if refresh:
+            # A bootstrap walks every ref, so stored commits pick up refs moved since the last one.
+            upsert(session, Commit, commit_rows, update=("depth", "refs_json"))
+        else:
+            insert_if_absent(session, Commit, commit_rows)
+        parent_rows = (
+            {"repo_id": repo_id, "child_sha": sha, "parent_sha": parent_sha, "position": position}
+            for sha in graph
+            for position, parent_sha in enumerate(graph.parents(sha))
+        )
+        insert_if_absent(session, CommitParent, parent_rows)
+
+    def _parent_chunk_ids(
+        self,
+        session: Session,
+        repo_id: str,
+        changed: ChangedFile,
+        chunks: list[CodeChunk],
+        chunk_hashes: list[str],
+        live_chunks: dict[tuple[str, str], dict[tuple, str]],
+    ) -> dict[tuple, str]:
+        """Chunk ids standing for the parent version's chunks, keyed by ``_chunk_key``."""
+        parent_path = changed.old_path or changed.path
+        live = live_chunks.get((parent_path, changed.old_blob_oid))
+        if live is not None:
+            return live
+        hashes = {chunk_hash for chunk, chunk_hash in zip(chunks, chunk_hashes) if chunk.chunk_type != "diff"}
+        if not hashes:
+            return {}
+        # Not seen earlier in this job: only chunks written for the parent blob at this path, so a
+        # version on another branch with a matching symbol is never borrowed.
+        rows = (
+            session.query(Chunk.id, Chunk.chunk_type, Chunk.symbol_name, Chunk.content_hash, Chunk.line_start, Chunk.line_end)
+            .join(
+                FileVersion,
+                (FileVersion.repo_id == Chunk.repo_id)
+                & (FileVersion.sha == Chunk.sha)
+                & (FileVersion.path == Chunk.path),
+            )
+            .filter(
+                FileVersion.blob_oid == changed.old_blob_oid,
+                Chunk.repo_id == repo_id,
+                Chunk.path == parent_path,
+                Chunk.embedding_model == self.embedder.model,
+                Chunk.chunk_type != "diff",
+                Chunk.content_hash.in_(hashes),
+            )
+            .all()
+        )
+        return {tuple(key): pk for pk, *key in rows}
+
+    def _symbol_first_sha(self, session: Session, pk: str, seen: dict[str, str]) -> str | None:
+        if pk in seen:
+            return seen[pk]
+        symbol = session.get(Symbol, pk)
+        return symbol.first_sha if symbol else None
+
+    def _lookup_blobs(self, session: Session, repo_id: str, oids: set[str]) -> dict[str, Blob]:
+        if not oids:
+            return {}
+        rows = session.query(Blob).filter(Blob.repo_id == repo_id, Blob.oid.in_(oids)).all()
+        return {row.oid: row for row in rows}
+
+    def _blob_chunks(self, session: Session, blob: Blob, cache: dict[str, list[CodeChunk]]) -> list[CodeChunk]:
+        chunks = cache.get(blob.oid)
+        if chunks is None:
+            rows = (
+                session.query(BlobChunk)
+                .filter(BlobChunk.repo_id == blob.repo_id, BlobChunk.blob_oid == blob.oid)
+                .order_by(BlobChunk.ordinal)
+                .all()
+            )
+            chunks = cache[blob.oid] = [
+                CodeChunk(
+                    content=row.content,
+                    path="",
+                    language=blob.language or "",
+                    chunk_type=row.chunk_type,
+                    node_type=row.node_type,
+                    line_start=row.line_start,
+                    line_end=row.line_end,
+                    symbol_name=row.symbol_name,
+                )
+                for row in rows
+            ]
+        return chunks
+
+    def _record_blob(
+        self,
+        session: Session,
+        *,
+        repo_id: str,
+        oid: str,
+        language: str,
+        content: str,
+        sha: str,
+        storage_kind: str,
+        s3_key: str,
+        chunks: list[CodeChunk],
+        stale: bool = False,
+    ) -> Blob:
+        if stale:
+            # Chunked by an older chunker or as another language: replace wholesale.
+            session.query(BlobChunk).filter(BlobChunk.repo_id == repo_id, BlobChunk.blob_oid == oid).delete()
+        blob = session.merge(
+            Blob(
+                repo_id=repo_id,
+                oid=oid,
+                language=language,
+                chunker_version=CHUNKER_VERSION,
+                content_hash=content_hash(content),
+                size_bytes=len(content.encode("utf-8")),
+                first_sha=sha,
+                storage_kind=storage_kind,
+                s3_key=s3_key,
+            )
+        )
+        for ordinal, chunk in enumerate(chunks):
+            session.add(
+                BlobChunk(
                     repo_id=repo_id,
-                    sha=sha,
-                    author=data.get("author", ""),
-                    email=data.get("email", ""),
-                    message=data.get("message", ""),
-                    commit_time=commit_time,
-                    is_merge=bool(data.get("is_merge")),
-                    depth=int(data.get("depth") or 0),
-                    refs_json=data.get("refs", []),
+                    blob_oid=oid,
+                    ordinal=ordinal,
+                    chunk_type=chunk.chunk_type,
+                    node_type=chunk.node_type,
+                    symbol_name=chunk.symbol_name,
+                    line_start=chunk.line_start,
+                    line_end=chunk.line_end,
+                    content=chunk.content,
+                    content_hash=content_hash(chunk.content),
                 )
             )
-            for position, parent_sha in enumerate(data.get("parents", [])):
-                session.merge(CommitParent(repo_id=repo_id, child_sha=sha, parent_sha=parent_sha, position=position))
+        return blob
+
+    def _branch_index_is_stale(
+        self,
+        session: Session,
+        repo_id: str,
+        branch_index: BranchIndex,
+        graph: CommitGraph,
+        refs: list[GitRef],
+    ) -> bool:
+        """Whether commits persisted by other workers are missing from this worker's index."""
+        if any(parent not in branch_index for parent in graph.external_parents()):
+            return True
+        unknown_tips = [
+            ref.sha
+            for ref in refs
+            if ref.ref_type in BRANCH_REF_TYPES and ref.sha not in branch_index and ref.sha not in graph
+        ]
+        return bool(unknown_tips) and bool(self._known_depths(session, repo_id, unknown_tips))
+
+    def _load_branch_index(self, session: Session, repo_id: str, refs: list[GitRef]) -> BranchIndex | None:
+        """Branch index seeded from the persisted commit graph instead of walking the mirror."""
+        order = session.query(Commit.sha).filter(Commit.repo_id == repo_id).order_by(Commit.depth.desc())
+        parents_by_sha: dict[str, list[str]] = {sha: [] for (sha,) in order.yield_per(10_000)}
+        if not parents_by_sha:
+            return None
+        edges = (
+            session.query(CommitParent.child_sha, CommitParent.parent_sha)
+            .filter(CommitParent.repo_id == repo_id)
+            .order_by(CommitParent.child_sha, CommitParent.position)
+        )
+        for child_sha, parent_sha in edges.yield_per(10_000):
+            parents = parents_by_sha.get(child_sha)
+            if parents is not None:
+                parents.append(parent_sha)
+        return BranchIndex.from_parents(parents_by_sha, refs)
+
+    def _known_depths(self, session: Session, repo_id: str, shas: list[str]) -> dict[str, int]:
+        rows = session.query(Commit.sha, Commit.depth).filter(Commit.repo_id == repo_id, Commit.sha.in_(shas)).all()
+        return {sha: depth for sha, depth in rows}
 
     def _publish(self, payload: dict, *, key: str) -> None:
         if self.publisher is not None:
@@ -432,6 +932,20 @@ class IngestionService:
         path.write_text(json.dumps(report, indent=2), encoding="utf-8")
 
 
+def _chunk_key(chunk: CodeChunk, chunk_hash: str) -> tuple:
+    # The line range is part of the key: a chunk that moved is re-emitted so citations
+    # point at its lines in this version (its vector still comes from the embedding cache).
+    return (chunk.chunk_type, chunk.symbol_name, chunk_hash, chunk.line_start, chunk.line_end)
+
+
+def _pure_rename(changed: ChangedFile) -> bool:
+    return changed.status == "R" and changed.blob_oid is not None and changed.blob_oid == changed.old_blob_oid
+
+
+def _reusable_blob(blob: Blob | None, language: str | None) -> bool:
+    return blob is not None and blob.language == language and blob.chunker_version == CHUNKER_VERSION
+
+
 def _default_branch(refs) -> str | None:
     for candidate in ("origin/main", "main", "origin/master", "master"):
         if any(ref.name == candidate for ref in refs):
@@ -0,0 +1,102 @@
+"""Process-wide counters exported when prometheus_client is installed.
+
+The API serves them on ``/metrics``; the ingestion worker, which records the
+mirror fetch and embedding cache numbers, serves them via ``start_metrics_server``.
+"""
+
+from __future__ import annotations
+
+from collections import Counter as _Tally
+import threading
+
+try:
+    from prometheus_client import Counter, Gauge
+except Exception:  # pragma: no cover - optional dependency
+    Counter = Gauge = None
+
+MIRROR_FETCH_RESULTS = ("cloned", "fetched", "skipped")
+EMBEDDING_CACHE_TIERS = ("memory", "redis", "sql", "query")
+
+_lock = threading.Lock()
+_mirror_fetches: _Tally[str] = _Tally()
+_embedding_cache: _Tally[tuple[str, str]] = _Tally()
+
+if Counter is not None:
+    _mirror_fetch_total = Counter(
+        "gitrag_mirror_fetch_total",
+        "Mirror clone/fetch requests by outcome.",
+        ["result"],
+    )
+    _mirror_fetch_skip_ratio = Gauge(
+        "gitrag_mirror_fetch_skip_ratio",
+        "Share of mirror fetch requests answered without a network round trip.",
+    )
+    _embedding_cache_total = Counter(
+        "gitrag_embedding_cache_lookups_total",
+        "Embedding cache lookups by tier and outcome.",
+        ["tier", "result"],
+    )
+    _embedding_cache_hit_ratio = Gauge(
+        "gitrag_embedding_cache_hit_ratio",
+        "Share of lookups reaching a tier that it answered.",
+        ["tier"],
+    )
+else:
+    _mirror_fetch_total = _mirror_fetch_skip_ratio = None
+    _embedding_cache_total = _embedding_cache_hit_ratio = None
+
+
+def start_metrics_server(port: int) -> bool:
+    """Serve this process's metrics on ``port``; False when disabled or prometheus_client is missing."""
+    if Counter is None or port <= 0:
+        return False
+    from prometheus_client import start_http_server
+
+    start_http_server(port)
+    return True
+
+
+def record_mirror_fetch(result: str) -> None:
+    with _lock:
+        _mirror_fetches[result] += 1
+        ratio = mirror_fetch_skip_ratio()
+    if _mirror_fetch_total is not None:
+        _mirror_fetch_total.labels(result=result).inc()
+        _mirror_fetch_skip_ratio.set(ratio)
+
+
+def mirror_fetch_counts() -> dict[str, int]:
+    return {result: _mirror_fetches[result] for result in MIRROR_FETCH_RESULTS}
+
+
+def mirror_fetch_skip_ratio() -> float:
+    total = sum(_mirror_fetches.values())
+    return _mirror_fetches["skipped"] / total if total else 0.0
+
+
+def record_embedding_cache(tier: str, hits: int, misses: int) -> None:
+    if not hits and not misses:
+        return
+    with _lock:
+        _embedding_cache[(tier, "hit")] += hits
+        _embedding_cache[(tier, "miss")] += misses
+        ratio = embedding_cache_hit_ratios()[tier]
+    if _embedding_cache_total is not None:
+        _embedding_cache_total.labels(tier=tier, result="hit").inc(hits)
+        _embedding_cache_total.labels(tier=tier, result="miss").inc(misses)
+        _embedding_cache_hit_ratio.labels(tier=tier).set(ratio)
+
+
+def embedding_cache_counts() -> dict[str, dict[str, int]]:
+    return {
+        tier: {result: _embedding_cache[(tier, result)] for result in ("hit", "miss")}
+        for tier in EMBEDDING_CACHE_TIERS
+    }
+
+
+def embedding_cache_hit_ratios() -> dict[str, float]:
+    ratios = {}
+    for tier in EMBEDDING_CACHE_TIERS:
+        hits, misses = _embedding_cache[(tier, "hit")], _embedding_cache[(tier, "miss")]
+        ratios[tier] = hits / (hits + misses) if hits + misses else 0.0
+    return ratios
@@ -1,8 +1,11 @@
-"""Redis-backed query response caching."""
+"""Redis-backed query response caching, the query-vector cache, and the memory/Redis tiers of the embedding cache."""
 
 from __future__ import annotations
 
+from collections import OrderedDict
 import json
+import threading
+import time
 
 from gitrag.config import Settings, get_settings
 
@@ -36,3 +39,162 @@ class QueryCache:
         if not client:
             return
         client.setex(key, ttl_seconds or self.settings.query_cache_ttl_seconds, json.dumps(value))
+
+
+class VectorLRU:
+    """Packed vectors keyed by string, evicting least recently used past ``max_bytes``."""
+
+    # Rough per-entry cost of the key string, bytes object and dict slot.
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        cost = len(data) + self.ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous) + self.ENTRY_OVERHEAD
+            self._entries[key] = data
+            self.size_bytes += cost
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted) + self.ENTRY_OVERHEAD
+
+
+_vector_lrus: dict[int, VectorLRU] = {}
+_vector_lrus_lock = threading.Lock()
+
+
+def shared_vector_lru(max_bytes: int) -> VectorLRU:
+    """One memory tier per size in the process, so the byte limit and hit ratio span every embedder."""
+    with _vector_lrus_lock:
+        cache = _vector_lrus.get(max_bytes)
+        if cache is None:
+            cache = _vector_lrus[max_bytes] = VectorLRU(max_bytes)
+        return cache
+
+
+class RedisVectorCache:
+    """Shared tier between API and worker processes; values are packed float32 vectors."""
+
+    def __init__(self, settings: Settings | None = None, *, prefix: str = "gitrag:emb", ttl_seconds: int | None = None):
+        self.settings = settings or get_settings()
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds or self.settings.embedding_redis_ttl_seconds
+        self._client = None
+
+    def _redis(self):
+        if self._client is not None:
+            return self._client
+        try:
+            import redis
+
+            self._client = redis.Redis.from_url(self.settings.redis_url)
+            self._client.ping()
+        except Exception:
+            self._client = False
+        return self._client
+
+    def _key(self, model: str, hash_value: str) -> str:
+        return f"{self.prefix}:{model}:{hash_value}"
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, bytes]:
+        client = self._redis()
+        if not client or not hashes:
+            return {}
+        try:
+            values = client.mget([self._key(model, hash_value) for hash_value in hashes])
+        except Exception:
+            return {}
+        return {hash_value: value for hash_value, value in zip(hashes, values) if value}
+
+    def set_many(self, model: str, vectors: dict[str, bytes]) -> None:
+        client = self._redis()
+        if not client or not vectors:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for hash_value, data in vectors.items():
+                pipe.setex(self._key(model, hash_value), self.ttl_seconds, data)
+            pipe.execute()
+        except Exception:
+            # The SQL tier stays authoritative; a Redis outage only costs hit ratio.
+            pass
+
+
+class QueryVectorCache:
+    """Packed question vectors keyed by model and normalized question hash, expiring after ``ttl_seconds``.
+
+    A bounded in-process tier sits in front of Redis, so repeat questions skip
+    the embedding round trip whatever their filters or the repo's index generation.
+    A TTL of 0 disables the cache.
+    """
+
+    def __init__(self, settings: Settings | None = None, *, clock=time.monotonic):
+        self.settings = settings or get_settings()
+        self.ttl_seconds = self.settings.query_embedding_cache_ttl_seconds
+        self.max_entries = self.settings.query_embedding_cache_entries
+        self.redis = RedisVectorCache(self.settings, prefix="gitrag:qemb", ttl_seconds=self.ttl_seconds)
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, key: str) -> bytes | None:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get((model, key))
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end((model, key))
+                    return entry[1]
+                del self._entries[(model, key)]
+        data = self.redis.get_many(model, [key]).get(key)
+        if data is not None:
+            self._remember(model, key, data)
+        return data
+
+    def set(self, model: str, key: str, data: bytes) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._remember(model, key, data)
+        self.redis.set_many(model, {key: data})
+
+    def _remember(self, model: str, key: str, data: bytes) -> None:
+        with self._lock:
+            self._entries[(model, key)] = (self._clock() + self.ttl_seconds, data)
+            self._entries.move_to_end((model, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_query_vector_caches: dict[tuple[int, int, str], QueryVectorCache] = {}
+_query_vector_caches_lock = threading.Lock()
+
+
+def shared_query_vector_cache(settings: Settings | None = None) -> QueryVectorCache:
+    """One cache per configuration in the process; the API builds a QueryService per request."""
+    settings = settings or get_settings()
+    key = (settings.query_embedding_cache_ttl_seconds, settings.query_embedding_cache_entries, settings.redis_url)
+    with _query_vector_caches_lock:
+        cache = _query_vector_caches.get(key)
+        if cache is None:
+            cache = _query_vector_caches[key] = QueryVectorCache(settings)
+        return cache
@@ -0,0 +1,207 @@
+"""Concurrent embedding requests under requests/min and tokens/min limits.
+
+``EmbeddingDispatcher`` sends batches from a thread pool. Each request first
+takes its share from a pair of token buckets, so bursts stay inside the
+account quota. Rate-limit (429) and server (5xx) errors are retried with
+full-jitter exponential backoff, honouring ``Retry-After`` when the response
+carries one. Results come back in the order the batches were given.
+"""
+
+from __future__ import annotations
+
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+from typing import Callable, Sequence
+
+from gitrag.tokens import estimate_tokens
+
+Vector = list[float]
+
+
+class TokenBucket:
+    """Refills continuously at ``rate_per_minute``; ``acquire`` blocks until enough is available.
+
+    A rate of 0 disables the bucket. Requests larger than the capacity are
+    clamped to it so a single oversized batch cannot wait forever.
+    """
+
+    def __init__(self, rate_per_minute: float, *, capacity: float | None = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` and return the seconds spent waiting for it."""
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                delay = (amount - self._level) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens: int) -> float:
+        return self.requests.acquire(1) + self.tokens.acquire(tokens)
+
+
+_limiters: dict[tuple[float, float], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def shared_rate_limiter(requests_per_minute: float, tokens_per_minute: float) -> RateLimiter:
+    """One limiter per quota in the process, since every embedder draws on the same account."""
+    key = (requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return limiter
+
+
+_executors: dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(max_workers: int) -> ThreadPoolExecutor:
+    """One request pool per size in the process; embedders are built per job or request and never close theirs."""
+    max_workers = max(1, max_workers)
+    with _executors_lock:
+        pool = _executors.get(max_workers)
+        if pool is None:
+            pool = _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="gitrag-embed"
+            )
+        return pool
+
+
+@atexit.register
+def close_shared_executors() -> None:
+    with _executors_lock:
+        for pool in _executors.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+def error_status(exc: BaseException) -> int | None:
+    """HTTP status of an OpenAI/httpx/urllib error, if it has one."""
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is None:
+        # Connection resets and timeouts carry no status and are worth another try.
+        return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in {
+            "APIConnectionError",
+            "APITimeoutError",
+        }
+    return status == 429 or status >= 500
+
+
+def retry_after(exc: BaseException) -> float | None:
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(float(headers.get("retry-after")), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingDispatcher:
+    def __init__(
+        self,
+        send: Callable[[list[str]], list[Vector]],
+        *,
+        max_workers: int = 4,
+        limiter: RateLimiter | None = None,
+        max_retries: int = 6,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        sleep: Callable[[float], None] = time.sleep,
+        executor: ThreadPoolExecutor | None = None,
+    ):
+        self.send = send
+        self.max_workers = max(1, max_workers)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        # A caller-supplied pool is shared and left running by ``close``.
+        self._pool = executor
+        self._owns_pool = executor is None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "throttled_seconds": 0.0}
+
+    def dispatch(self, batches: Sequence[list[str]], tokens: Sequence[int] | None = None) -> list[list[Vector]]:
+        """Send every batch; result ``i`` holds the vectors for ``batches[i]``.
+
+        ``tokens`` gives each batch's token count when the caller already has it.
+        """
+        if tokens is None:
+            tokens = [sum(estimate_tokens(text) for text in batch) for batch in batches]
+        if len(batches) <= 1 or self.max_workers == 1:
+            return [self._send_with_retry(batch, count) for batch, count in zip(batches, tokens)]
+        pool = self._executor()
+        return list(pool.map(self._send_with_retry, batches, tokens))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gitrag-embed")
+            return self._pool
+
+    def _send_with_retry(self, batch: list[str], tokens: int) -> list[Vector]:
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                waited = self.limiter.acquire(tokens)
+                if waited:
+                    self._count("throttled_seconds", waited)
+            self._count("requests", 1)
+            try:
+                return self.send(batch)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_retryable(exc):
+                    raise
+                self._count("retries", 1)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+                self._sleep(max(delay, retry_after(exc) or 0.0))
+                attempt += 1
+
+    def _count(self, key: str, value: float) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None and self._owns_pool:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -2,15 +2,24 @@
 
 from __future__ import annotations
 
+from array import array
 import hashlib
-import math
+import itertools
+import struct
+import sys
 from typing import Iterable
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from gitrag.config import Settings, get_settings
 from gitrag.db.models import EmbeddingCache
+from gitrag.db.session import insert_if_absent
 from gitrag.ids import content_hash, embedding_cache_id
+from gitrag.metrics import record_embedding_cache
+from gitrag.retrieval.cache import RedisVectorCache, shared_vector_lru
+from gitrag.retrieval.dispatch import EmbeddingDispatcher, shared_executor, shared_rate_limiter
+from gitrag.tokens import estimate_tokens, truncate_to_tokens
 
 
 EMBEDDING_DIMENSIONS = {
@@ -19,21 +28,66 @@ EMBEDDING_DIMENSIONS = {
     "text-embedding-ada-002": 1536,
 }
 
+VECTOR_DTYPES = {"float32", "float16"}
+# Keeps ``IN (...)`` lists under SQLite's bound-parameter limit.
+_CACHE_LOOKUP_BATCH = 500
+
+
+def pack_vector(vector: list[float], dtype: str = "float32") -> bytes:
+    """Little-endian packed floats for ``EmbeddingCache.vector_blob``."""
+    if dtype == "float16":
+        return struct.pack(f"<{len(vector)}e", *vector)
+    if dtype != "float32":
+        raise ValueError(f"unsupported embedding cache dtype: {dtype}")
+    packed = array("f", vector)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_vector(data: bytes, dtype: str = "float32") -> list[float]:
+    if dtype == "float16":
+        return list(struct.unpack(f"<{len(data) // 2}e", data))
+    if dtype != "float32":
+        raise ValueError(f"unsupported embedding cache dtype: {dtype}")
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def pack_batches(token_counts: list[int], *, max_tokens: int, max_items: int) -> list[tuple[int, int]]:
+    """Contiguous ``(start, end)`` slices, each filled up to ``max_tokens`` and ``max_items``."""
+    batches: list[tuple[int, int]] = []
+    start = total = 0
+    for index, tokens in enumerate(token_counts):
+        if index > start and (total + tokens > max_tokens or index - start >= max_items):
+            batches.append((start, index))
+            start, total = index, 0
+        total += tokens
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+def deterministic_vectors(texts: list[str], dimensions: int = 1536) -> list[list[float]]:
+    """Unit vectors derived from each text's SHAKE-256 stream; the same text always maps to the same vector.
+
+    One hash call per text fills the whole row, and scaling and normalisation run
+    over the batch as a single array.
+    """
+    if not texts:
+        return []
+    stream = b"".join(hashlib.shake_256(text.encode("utf-8")).digest(4 * dimensions) for text in texts)
+    matrix = np.frombuffer(stream, dtype="<u4").reshape(len(texts), dimensions) * (2.0 / 2**32) - 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).tolist()
+
 
 def deterministic_vector(text: str, dimensions: int = 1536) -> list[float]:
-    seed = hashlib.sha256(text.encode("utf-8")).digest()
-    values: list[float] = []
-    counter = 0
-    while len(values) < dimensions:
-        digest = hashlib.sha256(seed + counter.to_bytes(4, "big")).digest()
-        for idx in range(0, len(digest), 4):
-            value = int.from_bytes(digest[idx : idx + 4], "big") / 2**32
-            values.append((value * 2.0) - 1.0)
-            if len(values) == dimensions:
-                break
-        counter += 1
-    norm = math.sqrt(sum(v * v for v in values)) or 1.0
-    return [v / norm for v in values]
+    return deterministic_vectors([text], dimensions)[0]
 
 
 class Embedder:
@@ -42,7 +96,12 @@ class Embedder:
         self.model = self.settings.openai_embedding_model
         self.dimensions = EMBEDDING_DIMENSIONS.get(self.model, 1536)
         self._client = None
-        self._local_vectors: dict[tuple[str, str], list[float]] = {}
+        self._dispatcher: EmbeddingDispatcher | None = None
+        self.stats = {"requests": 0, "tokens": 0, "truncated": 0}
+        # Tiers in front of the durable SQL table: the memory tier is shared within the
+        # process and keyed by model and content hash, Redis is shared between processes.
+        self.memory_cache = shared_vector_lru(self.settings.embedding_memory_cache_bytes)
+        self.redis_cache = RedisVectorCache(self.settings) if self.settings.embedding_redis_cache else None
 
     def _openai_client(self):
         if self._client is None:
@@ -50,56 +109,130 @@ class Embedder:
                 raise RuntimeError("OPENAI_API_KEY is required unless deterministic embeddings are enabled")
             from openai import OpenAI
 
-            self._client = OpenAI(api_key=self.settings.openai_api_key)
+            # Retries are handled by the dispatcher, which also sees the rate limits.
+            self._client = OpenAI(
+                api_key=self.settings.openai_api_key,
+                base_url=self.settings.openai_base_url or None,
+                max_retries=0,
+            )
         return self._client
 
+    def _send_batch(self, batch: list[str]) -> list[list[float]]:
+        resp = self._openai_client().embeddings.create(model=self.model, input=batch)
+        return [row.embedding for row in sorted(resp.data, key=lambda row: row.index)]
+
+    def dispatcher(self) -> EmbeddingDispatcher:
+        if self._dispatcher is None:
+            self._dispatcher = EmbeddingDispatcher(
+                self._send_batch,
+                max_workers=self.settings.embedding_concurrency,
+                limiter=shared_rate_limiter(
+                    self.settings.embedding_requests_per_minute,
+                    self.settings.embedding_tokens_per_minute,
+                ),
+                max_retries=self.settings.embedding_max_retries,
+                executor=shared_executor(self.settings.embedding_concurrency),
+            )
+        return self._dispatcher
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         if self.settings.deterministic_embeddings:
-            return [deterministic_vector(text or " ", self.dimensions) for text in texts]
-        client = self._openai_client()
-        out: list[list[float]] = []
-        for i in range(0, len(texts), self.settings.embedding_batch_size):
-            batch = [text if text else " " for text in texts[i : i + self.settings.embedding_batch_size]]
-            resp = client.embeddings.create(model=self.model, input=batch)
-            out.extend([row.embedding for row in resp.data])
-        return out
+            return deterministic_vectors([text or " " for text in texts], self.dimensions)
+        max_input = self.settings.embedding_max_input_tokens
+        texts = [text if text else " " for text in texts]
+        counts = [estimate_tokens(text) for text in texts]
+        for index, count in enumerate(counts):
+            if count > max_input:
+                # One vector per input: an overlong chunk is cut rather than split.
+                texts[index] = truncate_to_tokens(texts[index], max_input)
+                counts[index] = estimate_tokens(texts[index])
+                self.stats["truncated"] += 1
+        slices = pack_batches(
+            counts,
+            max_tokens=self.settings.embedding_batch_tokens,
+            max_items=self.settings.embedding_batch_size,
+        )
+        self.stats["requests"] += len(slices)
+        self.stats["tokens"] += sum(counts)
+        batches = [texts[start:end] for start, end in slices]
+        tokens = [sum(counts[start:end]) for start, end in slices]
+        return [vector for vectors in self.dispatcher().dispatch(batches, tokens) for vector in vectors]
+
+    def batch_fill(self, requests: int, tokens: int) -> float:
+        """Average share of ``embedding_batch_tokens`` used per request."""
+        if not requests:
+            return 0.0
+        return round(tokens / (requests * self.settings.embedding_batch_tokens), 4)
 
     def embed_query(self, text: str) -> list[float]:
         return self.embed_texts([text])[0]
 
     def embed_with_cache(self, session: Session, contents: Iterable[str]) -> dict[str, list[float]]:
+        """Vectors by content hash, read through memory, Redis and SQL before embedding the rest."""
         unique = {content_hash(content): content for content in contents}
         vectors: dict[str, list[float]] = {}
 
-        for hash_value in list(unique):
-            cached = self._local_vectors.get((hash_value, self.model))
-            if cached is not None:
-                vectors[hash_value] = cached
+        for hash_value in unique:
+            packed = self.memory_cache.get(self._memory_key(hash_value))
+            if packed is not None:
+                vectors[hash_value] = unpack_vector(packed)
+        record_embedding_cache("memory", len(vectors), len(unique) - len(vectors))
 
         lookup_hashes = [hash_value for hash_value in unique if hash_value not in vectors]
-        cached_rows = (
-            session.query(EmbeddingCache)
-            .filter(EmbeddingCache.content_hash.in_(lookup_hashes), EmbeddingCache.model == self.model)
-            .all()
-            if lookup_hashes
-            else []
-        )
-        for row in cached_rows:
-            if row.vector_json:
-                vectors[row.content_hash] = list(row.vector_json)
-                self._local_vectors[(row.content_hash, self.model)] = vectors[row.content_hash]
+        if self.redis_cache is not None and lookup_hashes:
+            shared = self.redis_cache.get_many(self.model, lookup_hashes)
+            for hash_value, packed in shared.items():
+                vectors[hash_value] = unpack_vector(packed)
+                self.memory_cache.put(self._memory_key(hash_value), packed)
+            record_embedding_cache("redis", len(shared), len(lookup_hashes) - len(shared))
+            lookup_hashes = [hash_value for hash_value in lookup_hashes if hash_value not in shared]
+
+        if lookup_hashes:
+            stored = self._cached_vectors(session, lookup_hashes)
+            record_embedding_cache("sql", len(stored), len(lookup_hashes) - len(stored))
+            vectors.update(stored)
+            self._promote(stored)
+
         missing = [(hash_value, text) for hash_value, text in unique.items() if hash_value not in vectors]
         if missing:
             generated = self.embed_texts([text for _, text in missing])
+            dtype = self.settings.embedding_cache_dtype
+            rows = []
             for (hash_value, _), vector in zip(missing, generated):
                 vectors[hash_value] = vector
-                self._local_vectors[(hash_value, self.model)] = vector
-                session.merge(
-                    EmbeddingCache(
-                        id=embedding_cache_id(hash_value, self.model),
-                        content_hash=hash_value,
-                        model=self.model,
-                        vector_json=vector,
-                    )
+                rows.append(
+                    {
+                        "id": embedding_cache_id(hash_value, self.model),
+                        "content_hash": hash_value,
+                        "model": self.model,
+                        "vector_blob": pack_vector(vector, dtype),
+                        "vector_dtype": dtype,
+                    }
                 )
+            insert_if_absent(session, EmbeddingCache, rows)
+            self._promote({hash_value: vectors[hash_value] for hash_value, _ in missing})
+        return vectors
+
+    def _memory_key(self, hash_value: str) -> str:
+        return f"{self.model}:{hash_value}"
+
+    def _promote(self, vectors: dict[str, list[float]]) -> None:
+        """Copy vectors into the memory and Redis tiers."""
+        packed = {hash_value: pack_vector(vector) for hash_value, vector in vectors.items()}
+        for hash_value, data in packed.items():
+            self.memory_cache.put(self._memory_key(hash_value), data)
+        if self.redis_cache is not None:
+            self.redis_cache.set_many(self.model, packed)
+
+    def _cached_vectors(self, session: Session, hashes: list[str]) -> dict[str, list[float]]:
+        """Stored vectors for ``hashes``, looked up by primary key."""
+        vectors: dict[str, list[float]] = {}
+        ids = iter({embedding_cache_id(hash_value, self.model): hash_value for hash_value in hashes}.items())
+        while batch := dict(itertools.islice(ids, _CACHE_LOOKUP_BATCH)):
+            rows = session.query(EmbeddingCache.id, EmbeddingCache.vector_blob, EmbeddingCache.vector_dtype).filter(
+                EmbeddingCache.id.in_(list(batch))
+            )
+            for pk, blob, dtype in rows:
+                if blob:
+                    vectors[batch[pk]] = unpack_vector(blob, dtype)
         return vectors
@@ -9,9 +9,10 @@ from sqlalchemy.orm import Session
 
 from gitrag.config import Settings, get_settings
 from gitrag.db.models import Chunk, ChunkRef, Repository
-from gitrag.ids import query_cache_key
-from gitrag.retrieval.cache import QueryCache
-from gitrag.retrieval.embedding import Embedder
+from gitrag.ids import content_hash, normalize_question, query_cache_key
+from gitrag.metrics import record_embedding_cache
+from gitrag.retrieval.cache import QueryCache, QueryVectorCache, shared_query_vector_cache
+from gitrag.retrieval.embedding import Embedder, pack_vector, unpack_vector
 from gitrag.retrieval.vector import VectorStore, get_vector_store
 
 
@@ -35,11 +36,13 @@ class QueryService:
         embedder: Embedder | None = None,
         vector_store: VectorStore | None = None,
         cache: QueryCache | None = None,
+        query_vectors: QueryVectorCache | None = None,
     ):
         self.settings = settings or get_settings()
         self.embedder = embedder or Embedder(self.settings)
         self.vector_store = vector_store or get_vector_store(self.settings)
         self.cache = cache or QueryCache(self.settings)
+        self.query_vectors = query_vectors or shared_query_vector_cache(self.settings)
 
     def query(
         self,
@@ -76,7 +79,7 @@ class QueryService:
 
         timings: dict[str, float] = {}
         start = perf_counter()
-        query_vector = self.embedder.embed_query(question)
+        query_vector, embed_hit = self._query_vector(question)
         timings["embed_ms"] = (perf_counter() - start) * 1000
 
         pinecone_filter: dict = {"repo_id": repo_id}
@@ -157,11 +160,24 @@ class QueryService:
                 for match, chunk, _ in hydrated
             ],
             "cache_hit": False,
+            # Whether the question vector came from the query-vector cache rather than the embedding API.
+            "embed_cache_hit": embed_hit,
             "timings_ms": timings,
         }
         self.cache.set(cache_key, response)
         return response
 
+    def _query_vector(self, question: str) -> tuple[list[float], bool]:
+        """Question vector and whether it came from the query-vector cache."""
+        key = content_hash(normalize_question(question))
+        cached = self.query_vectors.get(self.embedder.model, key)
+        record_embedding_cache("query", int(cached is not None), int(cached is None))
+        if cached is not None:
+            return unpack_vector(cached), True
+        vector = self.embedder.embed_query(question)
+        self.query_vectors.set(self.embedder.model, key, pack_vector(vector))
+        return vector, False
+
     def _answer(self, question: str, chunks: list[Chunk]) -> str:
         if not chunks:
             return "I do not have enough indexed context to answer that."
@@ -173,7 +189,7 @@ class QueryService:
             f"{chunk.path}@{chunk.sha[:8]}:{chunk.line_start}-{chunk.line_end}\n{chunk.content[:4000]}"
             for chunk in chunks
         )
-        client = OpenAI(api_key=self.settings.openai_api_key)
+        client = OpenAI(api_key=self.settings.openai_api_key, base_url=self.settings.openai_base_url or None)
         resp = client.chat.completions.create(
             model=self.settings.openai_chat_model,
             messages=[
@@ -60,5 +60,9 @@ def snapshot_key(repo_id: str, sha: str, path: str) -> str:
     return f"repos/{repo_id}/snapshots/{path_hash(path)}/{sha}.txt.zst"
 
 
+def blob_key(repo_id: str, oid: str) -> str:
+    return f"repos/{repo_id}/blobs/{oid[:2]}/{oid}.txt.zst"
+
+
 def diff_key(repo_id: str, parent_sha: str, sha: str, path: str) -> str:
     return f"repos/{repo_id}/diffs/{path_hash(path)}/{parent_sha}_{sha}.patch.zst"
@@ -0,0 +1,38 @@
+"""Token counting for chunk budgets, with tiktoken when it is installed."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+# Conservative bytes-per-token ratio for source code when tiktoken is unavailable.
+_BYTES_PER_TOKEN = 3
+
+
+@lru_cache(maxsize=8)
+def _encoding(name: str):
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str, *, encoding: str = "cl100k_base") -> int:
+    if not text:
+        return 0
+    enc = _encoding(encoding)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return -(-len(text.encode("utf-8", errors="ignore")) // _BYTES_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, *, encoding: str = "cl100k_base") -> str:
+    """Longest prefix of ``text`` within ``max_tokens`` (estimated the same way as ``estimate_tokens``)."""
+    enc = _encoding(encoding)
+    if enc is not None:
+        tokens = enc.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
+    data = text.encode("utf-8", errors="ignore")
+    limit = max_tokens * _BYTES_PER_TOKEN
+    return text if len(data) <= limit else data[:limit].decode("utf-8", errors="ignore")
@@ -5,6 +5,7 @@ from __future__ import annotations
 from gitrag.config import get_settings
 from gitrag.db.session import create_all, session_scope
 from gitrag.ingest.service import IngestionService
+from gitrag.metrics import start_metrics_server
 from gitrag.queue.kafka import KafkaConsumerLoop
 
 
@@ -18,6 +19,7 @@ def handle_payload(payload: dict) -> dict:
 
 def main() -> None:
     settings = get_settings()
+    start_metrics_server(settings.worker_metrics_port)
     KafkaConsumerLoop(settings).run(lambda payload: handle_payload(payload))
 
 
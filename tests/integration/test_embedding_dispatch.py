@@ -0,0 +1,104 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from gitrag.retrieval.dispatch import EmbeddingDispatcher, RateLimiter, TokenBucket
+
+
+class FakeEmbeddings(BaseHTTPRequestHandler):
+    """``/v1/embeddings`` stand-in: random latency, and every third request is rate limited."""
+
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        with self.lock:
+            type(self).calls += 1
+            throttle = self.calls % 3 == 0
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(random.uniform(0.001, 0.02))
+        if throttle:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        data = [{"index": i, "embedding": [float(len(text)), float(i)]} for i, text in enumerate(body["input"])]
+        random.shuffle(data)
+        payload = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_endpoint():
+    FakeEmbeddings.calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddings)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/embeddings"
+    server.shutdown()
+    server.server_close()
+
+
+def test_dispatcher_retries_rate_limits_and_keeps_batch_order(fake_endpoint):
+    def send(batch):
+        request = urllib.request.Request(
+            fake_endpoint,
+            data=json.dumps({"model": "fake", "input": batch}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as resp:
+            data = json.load(resp)["data"]
+        return [row["embedding"] for row in sorted(data, key=lambda row: row["index"])]
+
+    batches = [[f"text-{n}-" + "x" * k for k in range(3)] for n in range(20)]
+    dispatcher = EmbeddingDispatcher(
+        send, max_workers=4, limiter=RateLimiter(60_000, 0), backoff_base=0.001, max_retries=10
+    )
+    try:
+        results = dispatcher.dispatch(batches)
+    finally:
+        dispatcher.close()
+
+    assert results == [[[float(len(text)), float(i)] for i, text in enumerate(batch)] for batch in batches]
+    assert dispatcher.stats["retries"] > 0
+    assert dispatcher.stats["requests"] == FakeEmbeddings.calls == len(batches) + dispatcher.stats["retries"]
+
+
+def test_dispatcher_gives_up_on_client_errors():
+    class BadRequest(Exception):
+        status_code = 400
+
+    calls = []
+
+    def send(batch):
+        calls.append(batch)
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        EmbeddingDispatcher(send, max_workers=1, sleep=lambda _: None).dispatch([["a"]])
+    assert len(calls) == 1
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(600, capacity=10, clock=lambda: now[0], sleep=sleep)
+
+    assert bucket.acquire(10) == 0.0
+    assert bucket.acquire(5) == pytest.approx(0.5)
+    assert bucket.acquire(50) == pytest.approx(1.0)
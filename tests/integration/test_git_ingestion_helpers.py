@@ -1,6 +1,24 @@
+import asyncio
 import subprocess
 
-from gitrag.git import build_commit_graph, changed_files, clone_or_fetch_mirror, list_refs, rev_list_between
+from gitrag.git import (
+    AsyncGitRunner,
+    build_commit_graph,
+    changed_files,
+    changed_files_async,
+    clone_or_fetch_mirror,
+    diff_for_file,
+    diff_for_file_async,
+    file_at_sha,
+    file_at_sha_async,
+    iter_commit_changes,
+    list_refs,
+    read_blobs,
+    ref_sha,
+    rev_list_between,
+    set_git_concurrency,
+)
+from gitrag.metrics import mirror_fetch_counts
 
 
 def run(cmd, cwd):
@@ -35,3 +53,165 @@ def test_git_helpers_handle_branches_merges_and_deltas(tmp_path):
     assert feature_tip in graph
     assert delta == [feature_tip]
     assert files[0].path == "app.py"
+
+
+def test_read_blobs_uses_batch_reader_and_reports_missing_paths(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    (repo / "with space.py").write_text("x = 1\r\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    mirror = clone_or_fetch_mirror(str(repo), tmp_path / "mirrors")
+    contents = read_blobs(mirror, [(sha, "app.py"), (sha, "missing.py"), (sha, "with space.py"), (sha, "")])
+
+    assert contents == ["def one():\n    return 1\n", None, "x = 1\n", None]
+    assert file_at_sha(mirror, sha, "app.py") == contents[0]
+
+
+def test_iter_commit_changes_streams_roots_merges_and_blob_ids(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    run(["git", "add", "app.py"], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    run(["git", "checkout", "-b", "feature"], repo)
+    (repo / "app.py").write_text("def one():\n    return 2\n", encoding="utf-8")
+    run(["git", "commit", "-am", "change one"], repo)
+    run(["git", "checkout", "main"], repo)
+    (repo / "lib.py").write_text("def lib():\n    return 0\n", encoding="utf-8")
+    run(["git", "add", "lib.py"], repo)
+    run(["git", "commit", "-m", "add lib"], repo)
+    run(["git", "merge", "--no-edit", "feature"], repo)
+    (repo / "lib.py").unlink()
+    run(["git", "commit", "-am", "drop lib"], repo)
+
+    mirror = clone_or_fetch_mirror(str(repo), tmp_path / "mirrors")
+    shas = rev_list_between(mirror, None, "main")
+    changes = list(iter_commit_changes(mirror, shas))
+
+    assert [item.sha for item in changes] == shas
+    by_sha = {item.sha: item for item in changes}
+    root = by_sha[shas[0]]
+    assert root.parents == []
+    assert [(f.path, f.status) for f in root.files] == [("app.py", "A")]
+    app_oid = subprocess.check_output(["git", "rev-parse", f"{shas[0]}:app.py"], cwd=repo, text=True).strip()
+    assert root.files[0].blob_oid == app_oid
+
+    merge = next(item for item in changes if len(item.parents) == 2)
+    assert {(f.path, f.status) for f in merge.files} == {("app.py", "M"), ("lib.py", "A")}
+    drop = by_sha[shas[-1]]
+    assert drop.files[0].status == "D"
+    assert drop.files[0].blob_oid is None
+    assert changed_files(mirror, shas[-1]) == drop.files
+
+
+def test_async_git_helpers_match_sync_results(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    for name in ("a.py", "b.py", "c.py"):
+        (repo / name).write_text(f"def {name[0]}():\n    return 1\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    for name in ("a.py", "b.py", "c.py"):
+        (repo / name).write_text(f"def {name[0]}():\n    return 2\n", encoding="utf-8")
+    run(["git", "commit", "-am", "bump"], repo)
+    sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    mirror = clone_or_fetch_mirror(str(repo), tmp_path / "mirrors")
+
+    async def gather():
+        return await asyncio.gather(
+            changed_files_async(mirror, sha),
+            *(diff_for_file_async(mirror, sha, name) for name in ("a.py", "b.py", "c.py")),
+            diff_for_file_async(mirror, "0" * 40, "a.py"),
+            file_at_sha_async(mirror, sha, "b.py"),
+        )
+
+    set_git_concurrency(2)
+    try:
+        files, *diffs, missing, content = asyncio.run(gather())
+        with AsyncGitRunner() as runner:
+            background = runner.submit(diff_for_file_async(mirror, sha, "c.py")).result(timeout=30)
+    finally:
+        set_git_concurrency(8)
+
+    assert files == changed_files(mirror, sha)
+    assert diffs == [diff_for_file(mirror, sha, name) for name in ("a.py", "b.py", "c.py")]
+    assert "+    return 2" in diffs[0]
+    assert missing is None
+    assert content == file_at_sha(mirror, sha, "b.py")
+    assert background == diffs[2]
+
+
+def test_mirror_fetch_skips_when_fresh_mirror_has_wanted_commit(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("x = 1\n", encoding="utf-8")
+    run(["git", "add", "app.py"], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    first = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    clone_dir = tmp_path / "mirrors"
+    mirror = clone_or_fetch_mirror(str(repo), clone_dir)
+
+    (repo / "app.py").write_text("x = 2\n", encoding="utf-8")
+    run(["git", "commit", "-am", "second"], repo)
+    second = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    before = mirror_fetch_counts()
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=first, max_age_seconds=60)
+    assert mirror_fetch_counts()["skipped"] == before["skipped"] + 1
+    assert rev_list_between(mirror, None, "main") == [first]
+
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=second, max_age_seconds=60)
+    assert mirror_fetch_counts()["fetched"] == before["fetched"] + 1
+    assert rev_list_between(mirror, None, "main") == [first, second]
+
+    clone_or_fetch_mirror(str(repo), clone_dir)
+    assert mirror_fetch_counts()["fetched"] == before["fetched"] + 2
+
+
+def test_mirror_fetch_runs_when_wanted_ref_has_not_moved_yet(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("x = 1\n", encoding="utf-8")
+    run(["git", "add", "app.py"], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    clone_dir = tmp_path / "mirrors"
+    mirror = clone_or_fetch_mirror(str(repo), clone_dir)
+
+    # A new branch at a commit the mirror already has.
+    run(["git", "branch", "feature"], repo)
+    before = mirror_fetch_counts()
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=head, want_ref="refs/heads/feature", max_age_seconds=60)
+    assert mirror_fetch_counts()["fetched"] == before["fetched"] + 1
+    assert ref_sha(mirror, "refs/heads/feature") == head
+
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=head, want_ref="refs/heads/feature", max_age_seconds=60)
+    assert mirror_fetch_counts()["skipped"] == before["skipped"] + 1
+
+    run(["git", "branch", "-D", "feature"], repo)
+    zero = "0" * 40
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=zero, want_ref="refs/heads/feature", max_age_seconds=60)
+    assert mirror_fetch_counts()["fetched"] == before["fetched"] + 2
+    assert ref_sha(mirror, "feature") is None
+
+    clone_or_fetch_mirror(str(repo), clone_dir, want_sha=zero, want_ref="refs/heads/feature", max_age_seconds=60)
+    assert mirror_fetch_counts()["skipped"] == before["skipped"] + 2
@@ -1,15 +1,27 @@
+import gzip
 import subprocess
 
-from gitrag.db.models import Chunk, File
+from gitrag.db.models import Blob, Chunk, ChunkRef, Commit, CommitParent, File, FileVersion, RepositoryRef, Symbol
 from gitrag.db.session import create_all, session_scope
 from gitrag.ingest.service import IngestionService
 from gitrag.retrieval.service import QueryService
+from gitrag.storage.object_store import blob_key
 
 
 def run(cmd, cwd):
     subprocess.run(cmd, cwd=cwd, check=True, capture_output=True, text=True)
 
 
+def read_object(path):
+    data = path.read_bytes()
+    try:
+        import zstandard as zstd
+
+        return zstd.ZstdDecompressor().decompress(data).decode("utf-8")
+    except ImportError:
+        return gzip.decompress(data).decode("utf-8")
+
+
 def reset_db_session():
     import gitrag.db.session as session_module
 
@@ -73,3 +85,486 @@ def test_ingestion_service_skips_dependencies_and_queries_repeated_file_changes(
             include_answer=False,
         )
         assert result["citations"]
+
+        narrowed = QueryService().query(
+            session,
+            repo_id=boot.repo_id,
+            question="  where is the ROUTE defined? ",
+            path_prefix="server",
+            top_k=1,
+            include_answer=False,
+        )
+        assert narrowed["cache_hit"] is False
+        assert narrowed["embed_cache_hit"] is True
+
+
+def test_webhook_job_persists_only_pushed_commits(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    before = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+    for n in (2, 3):
+        (repo / "app.py").write_text(f"def one():\n    return {n}\n", encoding="utf-8")
+        run(["git", "commit", "-am", f"change {n}"], repo)
+    after = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    with session_scope() as session:
+        service = IngestionService()
+        job = service.enqueue_webhook_job(
+            session, repo_url=str(repo), ref="refs/heads/main", before=before, after=after, delivery_id="d1"
+        )
+        payload = {"job_id": job.id, "repo_id": job.repo_id, "mode": "webhook", "before": before, "after": after}
+        stats = service.process_job(session, payload)
+
+        assert stats["commits"] == 2
+        assert session.query(Commit).count() == 3
+        assert session.query(Commit).filter_by(sha=after).one().depth == 2
+        assert session.query(CommitParent).filter_by(child_sha=after).count() == 1
+        assert session.query(ChunkRef).filter_by(ref_name="main").count() > 0
+
+
+def test_rebootstrap_updates_refs_of_stored_commits(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    first = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    run(["git", "branch", "release"], repo)
+    (repo / "app.py").write_text("def one():\n    return 2\n", encoding="utf-8")
+    run(["git", "commit", "-am", "second"], repo)
+    second = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        boot = IngestionService().bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        assert "release" in str(session.get(Commit, {"repo_id": boot.repo_id, "sha": first}).refs_json)
+
+    run(["git", "branch", "-f", "release", second], repo)
+
+    with session_scope() as session:
+        boot = IngestionService().bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        old = session.get(Commit, {"repo_id": boot.repo_id, "sha": first})
+        new = session.get(Commit, {"repo_id": boot.repo_id, "sha": second})
+        assert "release" not in str(old.refs_json)
+        assert "release" in str(new.refs_json)
+        assert (old.depth, new.depth) == (0, 1)
+        release = session.query(RepositoryRef).filter_by(repo_id=boot.repo_id, name="release").one()
+        assert release.sha == second
+
+
+def test_reverted_blob_reuses_stored_object_and_chunks(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    original = "def handler():\n    return 'v1'\n"
+    (repo / "app.py").write_text(original, encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    (repo / "app.py").write_text("def handler():\n    return 'v2'\n", encoding="utf-8")
+    run(["git", "commit", "-am", "v2"], repo)
+    run(["git", "revert", "--no-edit", "HEAD"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["blobs_reused"] == 1
+        reverted = session.query(FileVersion).filter_by(sha=head, path="app.py").one()
+        first = session.query(FileVersion).filter_by(blob_oid=reverted.blob_oid).filter(FileVersion.sha != head).one()
+        assert reverted.storage_kind == "blob_ref"
+        assert reverted.s3_key == first.s3_key
+        assert session.query(Blob).count() == 2
+        code = session.query(Chunk).filter_by(sha=head, chunk_type="code").one()
+        assert code.symbol_name == "handler"
+        assert code.content == original.rstrip("\n")
+
+
+def test_reverted_blob_first_stored_as_diff_points_at_full_content(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    lines = [f"def step_{n}():\n    return {n}\n" for n in range(8)]
+    (repo / "app.py").write_text("".join(lines), encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    lines[2] = "def step_2():\n    return 'two'\n"
+    second = "".join(lines)
+    (repo / "app.py").write_text(second, encoding="utf-8")
+    run(["git", "commit", "-am", "small change"], repo)
+    lines[5] = "def step_5():\n    return 'five'\n"
+    (repo / "app.py").write_text("".join(lines), encoding="utf-8")
+    run(["git", "commit", "-am", "another small change"], repo)
+    run(["git", "revert", "--no-edit", "HEAD"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["blobs_reused"] == 1
+        reverted = session.query(FileVersion).filter_by(sha=head, path="app.py").one()
+        first = session.query(FileVersion).filter_by(blob_oid=reverted.blob_oid).filter(FileVersion.sha != head).one()
+        assert first.storage_kind == "diff"
+        assert reverted.storage_kind == "blob_ref"
+        assert reverted.s3_key == blob_key(boot.repo_id, reverted.blob_oid)
+        assert reverted.s3_key != first.s3_key
+        blob = session.query(Blob).filter_by(oid=reverted.blob_oid).one()
+        assert blob.storage_kind == "snapshot"
+        assert blob.s3_key == reverted.s3_key
+        assert read_object(tmp_path / "objects" / reverted.s3_key) == second
+
+
+def test_renamed_file_reuses_chunks_and_keeps_symbol_history(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def handler():\n    return 'v1'\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    first = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    run(["git", "mv", "app.py", "handlers.py"], repo)
+    run(["git", "commit", "-m", "move"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["renamed"] == 1
+        assert stats["renames_reused"] == 1
+        moved = session.query(FileVersion).filter_by(sha=head, path="handlers.py").one()
+        assert moved.change_type == "R"
+        assert moved.storage_kind == "blob_ref"
+        assert session.query(Chunk).filter_by(sha=head, chunk_type="diff").count() == 0
+        symbol = session.query(Symbol).filter_by(path="handlers.py", name="handler").one()
+        assert symbol.first_sha == first
+
+
+def test_hunk_scoped_mode_only_rechunks_touched_symbols(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    functions = [f"def f{n}():\n    return {n}\n" for n in range(3)]
+    (repo / "app.py").write_text("\n\n".join(functions), encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    functions[1] = "def f1():\n    return 'changed'\n"
+    (repo / "app.py").write_text("\n\n".join(functions), encoding="utf-8")
+    run(["git", "commit", "-am", "touch f1"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setenv("HUNK_SCOPED_CHUNKS", "true")
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["chunks_inherited"] == 2
+        head_code = session.query(Chunk).filter_by(sha=head, chunk_type="code").all()
+        assert [chunk.symbol_name for chunk in head_code] == ["f1"]
+        assert session.query(Chunk).filter_by(chunk_type="code").count() == 4
+
+
+def test_hunk_scoped_mode_never_inherits_chunks_from_another_branch(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    functions = [f"def f{n}():\n    return {n}\n" for n in range(3)]
+    (repo / "app.py").write_text("\n\n".join(functions), encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    before = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+    run(["git", "checkout", "-b", "feature"], repo)
+    changed = list(functions)
+    changed[1] = "def f1():\n    return 'changed'\n"
+    (repo / "app.py").write_text("\n\n".join(changed), encoding="utf-8")
+    run(["git", "commit", "-am", "touch f1 on feature"], repo)
+    run(["git", "checkout", "main"], repo)
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setenv("HUNK_SCOPED_CHUNKS", "true")
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+    # The same edit lands on main independently of the feature branch.
+    changed[0] = "def f0():\n    return 'zero'\n"
+    (repo / "app.py").write_text("\n\n".join(changed), encoding="utf-8")
+    run(["git", "commit", "-am", "touch f0 and f1 on main"], repo)
+    after = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    with session_scope() as session:
+        service = IngestionService()
+        job = service.enqueue_webhook_job(
+            session, repo_url=str(repo), ref="refs/heads/main", before=before, after=after, delivery_id="d1"
+        )
+        payload = {
+            "job_id": job.id,
+            "repo_id": job.repo_id,
+            "mode": "webhook",
+            "ref": "refs/heads/main",
+            "before": before,
+            "after": after,
+        }
+        stats = service.process_job(session, payload)
+
+        assert stats["chunks_inherited"] == 1
+        head_code = session.query(Chunk).filter_by(sha=after, chunk_type="code").all()
+        assert sorted(chunk.symbol_name for chunk in head_code) == ["f0", "f1"]
+        f1 = next(chunk for chunk in head_code if chunk.symbol_name == "f1")
+        assert session.query(ChunkRef).filter_by(chunk_id=f1.id, ref_name="main").count() == 1
+
+
+def test_generated_minified_and_oversized_files_are_skipped_before_parsing(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def handler():\n    return 1\n", encoding="utf-8")
+    (repo / "api_pb2.py").write_text("DESCRIPTOR = None\n", encoding="utf-8")
+    (repo / "bundle.js").write_text("var a=1;" * 200, encoding="utf-8")
+    (repo / "schema.ts").write_text("// @generated by codegen\nexport type A = string;\n", encoding="utf-8")
+    (repo / "fixtures.py").write_text("DATA = [\n" + "    1,\n" * 400 + "]\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setenv("MAX_FILE_BYTES", "2000")
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["skipped"] == {"generated": 2, "minified": 1, "too_large": 1}
+        assert [row.path for row in session.query(File).all()] == ["app.py"]
+
+
+def test_chunks_from_many_commits_are_embedded_in_one_flush(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    for index in range(3):
+        (repo / f"mod{index}.py").write_text(f"def handler_{index}():\n    return {index}\n", encoding="utf-8")
+        run(["git", "add", "."], repo)
+        run(["git", "commit", "-m", f"add mod{index}"], repo)
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_FLUSH_CHUNKS", "10000")
+    monkeypatch.setenv("EMBEDDING_FLUSH_SECONDS", "3600")
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["commits"] == 3
+        assert stats["embedding_flushes"] == 1
+        assert stats["vectors"] == stats["chunks"] == session.query(Chunk).count()
+        assert session.query(ChunkRef).count() == stats["chunks"]
+
+
+def test_webhook_branch_index_is_seeded_from_db_and_rebuilt_when_stale(tmp_path, monkeypatch):
+    import gitrag.ingest.service as service_module
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    (repo / "app.py").write_text("def one():\n    return 1\n", encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setattr(service_module, "_branch_indexes", service_module.OrderedDict())
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+    full_walk = service_module.build_commit_graph
+
+    def partial_walks_only(repo_path, shas=None):
+        assert shas is not None, "webhook jobs must not walk the whole history"
+        return full_walk(repo_path, shas)
+
+    monkeypatch.setattr(service_module, "build_commit_graph", partial_walks_only)
+
+    def push(n):
+        before = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+        (repo / "app.py").write_text(f"def one():\n    return {n}\n", encoding="utf-8")
+        run(["git", "commit", "-am", f"change {n}"], repo)
+        after = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+        with session_scope() as session:
+            service = IngestionService()
+            job = service.enqueue_webhook_job(
+                session, repo_url=str(repo), ref="refs/heads/main", before=before, after=after, delivery_id=f"d{n}"
+            )
+            service.process_job(
+                session, {"job_id": job.id, "repo_id": job.repo_id, "mode": "webhook", "before": before, "after": after}
+            )
+        return after
+
+    service_module._branch_indexes.clear()
+    first = push(2)
+    this_worker = service_module._branch_indexes[boot.repo_id]
+    # Another worker takes the next push, then this worker gets the one after.
+    service_module._branch_indexes.clear()
+    second = push(3)
+    service_module._branch_indexes[boot.repo_id] = this_worker
+    third = push(4)
+
+    index = service_module._branch_indexes[boot.repo_id]
+    assert index is not this_worker
+    assert all(index.refs_for(sha) == ["main"] for sha in (first, second, third))
+
+
+def test_hunk_scoped_mode_re_emits_chunks_that_moved(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run(["git", "init", "-b", "main"], repo)
+    run(["git", "config", "user.email", "dev@example.com"], repo)
+    run(["git", "config", "user.name", "Dev"], repo)
+    functions = [f"def f{n}():\n    return {n}\n" for n in range(3)]
+    (repo / "app.py").write_text("\n\n".join(functions), encoding="utf-8")
+    run(["git", "add", "."], repo)
+    run(["git", "commit", "-m", "initial"], repo)
+    (repo / "app.py").write_text("import os\n\n\n" + "\n\n".join(functions), encoding="utf-8")
+    run(["git", "commit", "-am", "add import"], repo)
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo, text=True).strip()
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'gitrag.db'}")
+    monkeypatch.setenv("GITRAG_VECTOR_BACKEND", "memory")
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("CLONE_REPO_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setenv("LOCAL_OBJECT_DIR", str(tmp_path / "objects"))
+    monkeypatch.setenv("PROJECT_DIR", str(tmp_path))
+    monkeypatch.setenv("HUNK_SCOPED_CHUNKS", "true")
+    reset_db_session()
+    create_all()
+
+    with session_scope() as session:
+        service = IngestionService()
+        boot = service.bootstrap_repo(session, repo_url=str(repo), enqueue=False)
+        stats = service.process_job(session, {"job_id": boot.job_id, "repo_id": boot.repo_id, "mode": "bootstrap"})
+
+        assert stats["chunks_inherited"] == 0
+        head_code = session.query(Chunk).filter_by(sha=head, chunk_type="code").order_by(Chunk.line_start).all()
+        assert [(chunk.symbol_name, chunk.line_start) for chunk in head_code] == [("f0", 4), ("f1", 8), ("f2", 12)]
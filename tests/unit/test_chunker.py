@@ -1,4 +1,9 @@
-from gitrag.ingest.chunker import chunk_file_content, should_index_path
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gitrag.ingest.chunker import chunk_file_content, get_parser, get_ts_language, should_index_path
+from gitrag.tokens import estimate_tokens
 
 
 def test_chunker_falls_back_to_whole_file_without_parser():
@@ -15,3 +20,143 @@ def test_should_index_path_skips_vendor_dependencies_by_default():
     assert not should_index_path("node_modules/package/index.js")
     assert not should_index_path("vendor/tree-sitter/parser.c")
     assert should_index_path("node_modules/package/index.js", include_vendor=True)
+
+
+def test_get_parser_is_cached_per_thread_and_shares_grammars():
+    pytest.importorskip("tree_sitter_python")
+    parser = get_parser("Python")
+
+    assert parser is get_parser("Python")
+    assert get_parser("Cobol") is None
+    assert get_parser(None) is None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other = pool.submit(get_parser, "Python").result()
+    assert other is not parser
+    assert other.language is parser.language is get_ts_language("Python")
+
+    chunks = chunk_file_content("app.py", "def hello():\n    return 'world'\n", parser, "Python")
+    assert [chunk.symbol_name for chunk in chunks] == ["hello"]
+
+
+def test_chunker_walks_deeply_nested_trees_without_recursion():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    content = "x = " + "[" * 3000 + "1" + "]" * 3000 + "\n\n\ndef tail():\n    return 1\n"
+
+    chunks = chunk_file_content("deep.py", content, parser, "Python")
+
+    assert [(chunk.symbol_name, chunk.line_start) for chunk in chunks] == [("tail", 4)]
+
+
+def test_file_fallback_is_split_by_token_budget_with_overlap_and_line_numbers():
+    lines = [f"line {n} = {'x' * 40}" for n in range(1, 201)]
+    content = "\n".join(lines) + "\n"
+    budget = estimate_tokens(content) // 5
+
+    chunks = chunk_file_content("notes.py", content, None, "Python", token_budget=budget)
+
+    assert len(chunks) > 1
+    assert chunks[0].line_start == 1
+    assert chunks[-1].line_end == 200
+    for chunk in chunks:
+        assert estimate_tokens(chunk.content) <= budget
+        assert chunk.content == "\n".join(lines[chunk.line_start - 1 : chunk.line_end])
+    for before, after in zip(chunks, chunks[1:]):
+        assert after.line_start == before.line_end - 1
+
+
+def test_oversized_function_is_split_at_statement_boundaries():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    body = "".join(f"    value_{n} = compute({n}, 'padding padding padding')\n" for n in range(120))
+    content = "import os\n\n\ndef big():\n" + body + "    return value_0\n"
+    source_lines = content.splitlines()
+
+    chunks = chunk_file_content("big.py", content, parser, "Python", token_budget=300)
+
+    assert len(chunks) > 1
+    assert {chunk.symbol_name for chunk in chunks} == {"big"}
+    assert chunks[0].line_start == 4
+    assert chunks[-1].line_end == len(source_lines)
+    for chunk in chunks:
+        assert chunk.content == "\n".join(source_lines[chunk.line_start - 1 : chunk.line_end])
+
+
+def test_split_pieces_keep_source_line_numbers_across_form_feeds():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    body = "".join(
+        f"    value_{n} = compute({n}, 'padding padding')  # \x0c page \u2028 break\n" for n in range(600)
+    )
+    content = "import os\n\n\ndef big():\n" + body + "    return value_0\n"
+    source_lines = content.split("\n")
+
+    chunks = chunk_file_content("big.py", content, parser, "Python", token_budget=300)
+
+    assert len(chunks) > 1
+    assert chunks[-1].line_end == 605
+    for chunk in chunks:
+        assert chunk.content == "\n".join(source_lines[chunk.line_start - 1 : chunk.line_end])
+
+
+def test_line_longer_than_budget_is_cut_at_token_boundaries():
+    content = "short = 1\n" + "data = '" + "x" * 3000 + "'\n" + "tail = 2\n"
+
+    chunks = chunk_file_content("blob.py", content, None, "Python", token_budget=100)
+
+    assert all(estimate_tokens(chunk.content) <= 100 for chunk in chunks)
+    long_pieces = [chunk for chunk in chunks if chunk.line_start == chunk.line_end == 2]
+    assert len(long_pieces) > 1
+    assert "".join(chunk.content for chunk in long_pieces) == content.split("\n")[1]
+    assert chunks[-1].line_end == 3
+
+
+def test_class_chunks_are_skeletons_and_method_bodies_live_in_method_chunks():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    content = (
+        "class Service:\n"
+        '    """Sends payloads."""\n'
+        "\n"
+        "    retries = 3\n"
+        "\n"
+        "    def run(self, payload):\n"
+        "        for item in payload:\n"
+        "            self.client.send(item)\n"
+        "        return len(payload)\n"
+    )
+
+    chunks = chunk_file_content("service.py", content, parser, "Python")
+
+    by_name = {chunk.symbol_name: chunk for chunk in chunks}
+    skeleton = by_name["Service"]
+    assert skeleton.content == (
+        'class Service:\n    """Sends payloads."""\n\n    retries = 3\n\n    def run(self, payload):\n        ...'
+    )
+    assert (skeleton.line_start, skeleton.line_end) == (1, 9)
+    assert skeleton.elided_tokens > 0
+    assert "self.client.send(item)" in by_name["run"].content
+    assert by_name["run"].elided_tokens == 0
+
+
+def test_large_class_skeleton_with_form_feeds_splits_within_source_rows():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    methods = "\x0c\n".join(
+        f"    def method_{n}(self, value):\n        return value + {n}  #   note\n" for n in range(300)
+    )
+    content = "class Big:\n" + methods
+    total_lines = content.count("\n")
+
+    chunks = chunk_file_content("big.py", content, parser, "Python")
+
+    skeleton = [chunk for chunk in chunks if chunk.symbol_name == "Big"]
+    assert len(skeleton) > 1
+    assert skeleton[0].line_start == 1
+    assert skeleton[-1].line_end == total_lines
+    assert all(1 <= chunk.line_start <= chunk.line_end <= total_lines for chunk in skeleton)
@@ -0,0 +1,189 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from gitrag.config import Settings
+from gitrag.db.models import Base, EmbeddingCache
+from gitrag.metrics import embedding_cache_counts
+from gitrag.retrieval.cache import QueryVectorCache, VectorLRU
+from gitrag.retrieval.embedding import (
+    Embedder,
+    deterministic_vector,
+    deterministic_vectors,
+    pack_batches,
+    pack_vector,
+    unpack_vector,
+)
+
+
+def test_packed_vectors_round_trip():
+    vector = [0.5, -0.25, 1.0, 0.1]
+
+    assert unpack_vector(pack_vector(vector)) == [0.5, -0.25, 1.0, 0.10000000149011612]
+    assert len(pack_vector(vector, "float16")) == 8
+    assert unpack_vector(pack_vector(vector, "float16"), "float16") == [0.5, -0.25, 1.0, 0.0999755859375]
+
+
+def test_embed_with_cache_reads_packed_rows_by_primary_key(monkeypatch):
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("EMBEDDING_CACHE_DTYPE", "float16")
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        first = Embedder(Settings()).embed_with_cache(session, ["def a(): pass", "def b(): pass"])
+        session.commit()
+        rows = session.query(EmbeddingCache).all()
+        assert {row.vector_dtype for row in rows} == {"float16"}
+        assert all(len(row.vector_blob) == 2 * 1536 for row in rows)
+
+        fresh = Embedder(Settings())
+        fresh.memory_cache = VectorLRU(1 << 20)  # a new process starts with a cold memory tier
+        monkeypatch.setattr(fresh, "embed_texts", lambda texts: (_ for _ in ()).throw(AssertionError(texts)))
+        cached = fresh.embed_with_cache(session, ["def a(): pass", "def b(): pass"])
+
+    assert cached.keys() == first.keys()
+    for hash_value, vector in cached.items():
+        assert max(abs(a - b) for a, b in zip(vector, first[hash_value])) < 1e-3
+
+
+def test_pack_batches_fills_token_ceiling_and_item_cap():
+    assert pack_batches([10, 10, 10, 10, 10], max_tokens=25, max_items=10) == [(0, 2), (2, 4), (4, 5)]
+    assert pack_batches([1] * 5, max_tokens=100, max_items=2) == [(0, 2), (2, 4), (4, 5)]
+    assert pack_batches([50, 1], max_tokens=20, max_items=10) == [(0, 1), (1, 2)]
+    assert pack_batches([], max_tokens=20, max_items=10) == []
+
+
+def test_embed_texts_packs_requests_and_truncates_overlong_inputs(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BATCH_TOKENS", "100")
+    monkeypatch.setenv("EMBEDDING_BATCH_SIZE", "50")
+    monkeypatch.setenv("EMBEDDING_MAX_INPUT_TOKENS", "80")
+    monkeypatch.setenv("EMBEDDING_CONCURRENCY", "1")
+    embedder = Embedder(Settings())
+    sent = []
+
+    def send(batch):
+        sent.append(batch)
+        return [[float(len(text))] for text in batch]
+
+    monkeypatch.setattr(embedder, "_send_batch", send)
+    texts = ["x"] * 30 + ["y" * 3000] + [""]
+
+    vectors = embedder.embed_texts(texts)
+
+    assert len(vectors) == len(texts)
+    assert [len(batch) for batch in sent] == [30, 2]
+    assert max(len(text) for batch in sent for text in batch) < 3000
+    assert vectors[-1] == [1.0]
+    assert embedder.stats["requests"] == 2
+    assert embedder.stats["truncated"] == 1
+    assert 0 < embedder.batch_fill(embedder.stats["requests"], embedder.stats["tokens"]) <= 1
+
+
+def test_vector_lru_evicts_least_recently_used_past_byte_budget():
+    cache = VectorLRU(max_bytes=3 * (100 + VectorLRU.ENTRY_OVERHEAD))
+    for key in "abc":
+        cache.put(key, bytes(100))
+    cache.get("a")
+    cache.put("d", bytes(100))
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.size_bytes <= cache.max_bytes
+    cache.put("huge", bytes(cache.max_bytes))
+    assert cache.get("huge") is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def execute(self):
+        pass
+
+
+def test_redis_tier_serves_vectors_to_other_processes(monkeypatch):
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("EMBEDDING_REDIS_CACHE", "true")
+    shared = FakeRedis()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        worker = Embedder(Settings())
+        worker.memory_cache = VectorLRU(1 << 20)
+        worker.redis_cache._client = shared
+        first = worker.embed_with_cache(session, ["def a(): pass"])
+        assert worker.embed_with_cache(session, ["def a(): pass"]).keys() == first.keys()
+
+        before = embedding_cache_counts()
+        api = Embedder(Settings())
+        api.memory_cache = VectorLRU(1 << 20)
+        api.redis_cache._client = shared
+        monkeypatch.setattr(api, "_cached_vectors", lambda *args: (_ for _ in ()).throw(AssertionError("sql")))
+        cached = api.embed_with_cache(session, ["def a(): pass"])
+        after = embedding_cache_counts()
+
+    assert cached.keys() == first.keys()
+    assert after["memory"]["miss"] == before["memory"]["miss"] + 1
+    assert after["redis"]["hit"] == before["redis"]["hit"] + 1
+
+
+def test_deterministic_vectors_are_stable_unit_vectors():
+    vectors = deterministic_vectors(["alpha", "beta", "alpha"], 64)
+
+    assert vectors[0] == vectors[2] != vectors[1]
+    assert vectors[1] == deterministic_vector("beta", 64)
+    assert all(len(vector) == 64 for vector in vectors)
+    assert all(abs(sum(value * value for value in vector) - 1.0) < 1e-9 for vector in vectors)
+    assert deterministic_vectors([]) == []
+
+
+def test_query_vector_cache_expires_and_evicts(monkeypatch):
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "60")
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_ENTRIES", "2")
+    now = [0.0]
+    cache = QueryVectorCache(Settings(), clock=lambda: now[0])
+    cache.redis._client = False
+
+    cache.set("model", "a", b"1")
+    cache.set("model", "b", b"2")
+    assert cache.get("model", "a") == b"1"
+    assert cache.get("other", "a") is None
+    cache.set("model", "c", b"3")
+    assert cache.get("model", "b") is None
+
+    now[0] = 61.0
+    assert cache.get("model", "a") is None
+
+
+def test_memory_tier_is_shared_across_embedders_and_keyed_by_model(monkeypatch):
+    monkeypatch.setenv("GITRAG_DETERMINISTIC_EMBEDDINGS", "true")
+    monkeypatch.setenv("EMBEDDING_MEMORY_CACHE_BYTES", str(1 << 20))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        first = Embedder(Settings()).embed_with_cache(session, ["def shared(): pass"])
+        second = Embedder(Settings())
+        monkeypatch.setattr(second, "_cached_vectors", lambda *args: (_ for _ in ()).throw(AssertionError("sql")))
+        assert second.embed_with_cache(session, ["def shared(): pass"]).keys() == first.keys()
+
+        monkeypatch.setenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-large")
+        large = Embedder(Settings())
+        assert large.memory_cache is second.memory_cache
+        assert len(large.embed_with_cache(session, ["def shared(): pass"])[next(iter(first))]) == 3072
+
+
+def test_embedders_share_one_request_pool(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_CONCURRENCY", "3")
+    first, second = Embedder(Settings()).dispatcher(), Embedder(Settings()).dispatcher()
+
+    assert first._executor() is second._executor()
+    first.close()
+    assert second._executor() is first._executor()
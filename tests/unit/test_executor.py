@@ -0,0 +1,20 @@
+import pytest
+
+from gitrag.ids import content_hash
+from gitrag.ingest.chunker import chunk_file_content, get_parser
+from gitrag.ingest.executor import ChunkingExecutor
+
+
+def test_process_pool_matches_in_process_chunking_in_submission_order():
+    if get_parser("Python") is None:
+        pytest.skip("tree_sitter_python is not installed")
+    items = [(f"pkg/mod_{n}.py", f"def handler_{n}():\n    return {n}\n" * (1 + n % 3), "Python") for n in range(12)]
+
+    with ChunkingExecutor(2, batch_files=2) as executor:
+        results = executor.map(items)
+
+    assert len(results) == len(items)
+    for (path, content, language), result in zip(items, results):
+        expected = chunk_file_content(path, content, get_parser(language), language)
+        assert result.chunks == expected
+        assert result.hashes == [content_hash(chunk.content) for chunk in expected]
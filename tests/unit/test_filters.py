@@ -0,0 +1,56 @@
+import base64
+import json
+import random
+
+import pytest
+
+from gitrag.ingest.filters import FileFilter, file_filter_for_repo
+
+
+def test_file_filter_classifies_generated_minified_and_large_files():
+    file_filter = FileFilter(max_bytes=1000)
+    code = "def handler(event):\n    return event\n" * 20
+
+    assert file_filter.classify_path("api/service_pb2.py") == "generated"
+    assert file_filter.classify_path("static/app.min.js") == "generated"
+    assert file_filter.classify_path("src/app.py") is None
+    assert file_filter.classify_size("src/app.py", 5000) == "too_large"
+    assert file_filter.classify_size("src/app.py", None) is None
+    assert file_filter.classify_content("src/app.py", code) is None
+    assert file_filter.classify_content("src/gen.go", "// Code generated by mockgen. DO NOT EDIT.\n" + code) == "generated"
+    assert file_filter.classify_content("dist.js", "var a=1;" * 500) == "minified"
+    blob = base64.b64encode(random.Random(0).randbytes(6000)).decode()
+    lines = "\n".join(blob[i : i + 76] for i in range(0, len(blob), 76))
+    assert file_filter.classify_content("data.js", lines) == "high_entropy"
+
+
+def test_generated_headers_must_be_conventional_comments():
+    file_filter = FileFilter()
+    code = "def handler(event):\n    return event\n" * 20
+
+    protobuf = "# Generated by the protocol buffer compiler.  DO NOT EDIT!\n" + code
+    assert file_filter.classify_content("api_pb2.py", protobuf) == "generated"
+    assert file_filter.classify_content("schema.ts", "/**\n * @generated SignedSource<<abc>>\n */\n" + code) == "generated"
+    hand_written = (
+        '"""Settings loader.\n\nDo not edit the defaults at runtime; auto-generated ids come from the DB."""\n'
+        "# Autogenerated keys are rejected below.\n"
+        "# Code generated by hand once, then maintained. Do not edit without review.\n"
+        'WARNING = "Code generated by the CLI. DO NOT EDIT."\n' + code
+    )
+    assert file_filter.classify_content("src/settings.py", hand_written) is None
+
+
+def test_repo_overrides_apply_after_global_entries():
+    overrides = json.dumps(
+        {"*": {"exclude": ["*.snap.js"], "max_bytes": 10}, "web": {"include": ["src/gen/*"], "max_bytes": 50}}
+    )
+
+    web = file_filter_for_repo("web", max_bytes=1000, overrides_json=overrides)
+    other = file_filter_for_repo("other", max_bytes=1000, overrides_json=overrides)
+
+    assert (web.max_bytes, other.max_bytes) == (50, 10)
+    assert web.classify_path("src/gen/api_pb2.py") is None
+    assert other.classify_path("src/gen/api_pb2.py") == "generated"
+    assert other.classify_path("tests/view.snap.js") == "excluded"
+    with pytest.raises(ValueError):
+        file_filter_for_repo("web", max_bytes=1000, overrides_json=json.dumps({"web": {"max_size": 1}}))
@@ -0,0 +1,66 @@
+from gitrag.git import GitRef
+from gitrag.graph import BranchIndex, CommitGraph
+
+
+def _graph(edges: dict[str, list[str]]) -> CommitGraph:
+    graph = CommitGraph()
+    for sha, parents in edges.items():
+        graph.add(sha, parents)
+    return graph.finalize()
+
+
+def test_commit_graph_depths_children_and_external_parents():
+    # Added newest-first like ``git log``; "root" is outside the graph (shallow boundary).
+    graph = _graph({"m": ["c", "d"], "d": ["b"], "c": ["b"], "b": ["a"], "a": ["root"]})
+
+    assert len(graph) == 5
+    assert "root" not in graph
+    assert graph["a"]["depth"] == 1
+    assert graph["m"]["depth"] == 4
+    assert graph["m"]["is_merge"]
+    assert graph["a"]["parents"] == ["root"]
+    assert sorted(graph["b"]["children"]) == ["c", "d"]
+    assert graph.shas_by_depth() == ["a", "b", "c", "d", "m"]
+
+
+def test_commit_graph_handles_histories_deeper_than_the_recursion_limit():
+    graph = CommitGraph()
+    total = 50_000
+    for n in reversed(range(total)):
+        graph.add(f"c{n}", [f"c{n - 1}"] if n else [])
+    graph.finalize()
+
+    assert graph.depth(f"c{total - 1}") == total - 1
+
+
+def test_branch_index_matches_contains_and_follows_ref_moves():
+    #   a - b - c        main
+    #        \
+    #         d - e      feature (merged into f on main later)
+    graph = _graph({"a": [], "b": ["a"], "c": ["b"], "d": ["b"], "e": ["d"]})
+    index = BranchIndex.build(
+        graph,
+        [
+            GitRef(name="main", sha="c", ref_type="branch"),
+            GitRef(name="feature", sha="e", ref_type="branch"),
+            GitRef(name="v1", sha="a", ref_type="tag"),
+        ],
+    )
+
+    assert index.refs_for("a") == ["feature", "main"]
+    assert index.refs_for("c") == ["main"]
+    assert index.refs_for("e") == ["feature"]
+
+    index.add_commits({"f": ["c", "e"]})
+    index.move_ref("main", "f")
+    assert index.refs_for("e") == ["feature", "main"]
+    assert index.refs_for("f") == ["main"]
+
+    # Force-push feature back to d: e is no longer on feature, only on main via f.
+    index.update_refs([GitRef(name="main", sha="f", ref_type="branch"), GitRef(name="feature", sha="d", ref_type="branch")])
+    assert index.refs_for("e") == ["main"]
+    assert index.refs_for("d") == ["feature", "main"]
+
+    index.update_refs([GitRef(name="main", sha="f", ref_type="branch")])
+    assert index.refs_for("d") == ["main"]
+    assert index.refs_for("unknown") == []
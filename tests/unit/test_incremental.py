@@ -0,0 +1,134 @@
+import difflib
+
+import pytest
+
+from gitrag.ingest.chunker import chunk_file_content, get_parser
+from gitrag.ingest.incremental import (
+    LineEdit,
+    TreeCache,
+    chunk_file_incremental,
+    line_edits_from_diff,
+    parse_file,
+)
+
+
+def unified_diff(old, new):
+    return "\n".join(difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=80))
+
+
+def test_line_edits_from_diff_splits_hunks_into_changed_runs():
+    old = "a\nb\nc\nd\ne\n"
+    new = "a\nB\nc\nd\nx\ny\ne\n"
+
+    assert line_edits_from_diff(unified_diff(old, new)) == [LineEdit(2, 1, 2, 1), LineEdit(5, 0, 5, 2)]
+    assert line_edits_from_diff("") is None
+    assert line_edits_from_diff("@@@ -1,2 -1,2 +1,2 @@@\n") is None
+
+
+def test_incremental_chunks_match_full_parse_and_carry_untouched_chunks():
+    parser = get_parser("Python")
+    if parser is None:
+        pytest.skip("tree_sitter_python is not installed")
+    versions = [
+        "def one():\n    return 1\n\n\ndef two():\n    return 2\n\n\nclass Three:\n    def m(self):\n        return 3\n",
+        "def one():\n    return 10\n\n\ndef two():\n    return 2\n\n\nclass Three:\n    def m(self):\n        return 3\n",
+        "import os\n\ndef one():\n    return 10\n\n\ndef two():\n    return (2\n\n\nclass Three:\n    def m(self):\n        return 3\n",
+        "import os\n\ndef one():\n    return 10\n\n\ndef two():\n    return 2\n\n\nclass Three:\n    def m(self):\n        return 'é'\n",
+    ]
+    chunks, previous = parse_file("app.py", versions[0], parser, "Python")
+    for old, new in zip(versions, versions[1:]):
+        chunks, previous = chunk_file_incremental(
+            "app.py", new, parser, "Python", previous=previous, line_edits=line_edits_from_diff(unified_diff(old, new))
+        )
+        assert chunks == chunk_file_content("app.py", new, parser, "Python")
+
+    appended = versions[-1] + "\n\ndef four():\n    return 4\n"
+    carried, _ = chunk_file_incremental(
+        "app.py",
+        appended,
+        parser,
+        "Python",
+        previous=previous,
+        line_edits=line_edits_from_diff(unified_diff(versions[-1], appended)),
+    )
+    assert carried == chunk_file_content("app.py", appended, parser, "Python")
+    assert carried[0] is chunks[0]
+    assert carried[-1].symbol_name == "four"
+
+
+def test_tree_cache_evicts_least_recently_used():
+    cache = TreeCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get(None) is None
+
+
+_PYTHON_LINES = [
+    "def f{n}(a, b):",
+    "    return a + {n}",
+    "class C{n}:",
+    "    def m{n}(self):",
+    "        x = [{n},",
+    "        ]",
+    "    '''doc {n}",
+    "'''",
+    "    if a:",
+    "        pass",
+    "",
+    "value_{n} = lambda q: q * {n}",
+]
+_JS_LINES = [
+    "function f{n}(a) {{",
+    "  return `t${{a}}{n}`;",
+    "}}",
+    "const a{n} = (x) => {{",
+    "  return x + {n};",
+    "}};",
+    "class K{n} {{",
+    "  m{n}() {{ return {n}; }}",
+    "  `",
+    "  /* note {n}",
+    "  */",
+    "",
+]
+
+
+@pytest.mark.parametrize("language, path, pool", [("Python", "mod.py", _PYTHON_LINES), ("JavaScript", "mod.js", _JS_LINES)])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_random_edit_sequences_match_full_parse(language, path, pool, seed):
+    import random
+
+    parser = get_parser(language)
+    if parser is None:
+        pytest.skip(f"{language} grammar is not installed")
+    rng = random.Random(seed)
+    lines = [line.format(n=n) for n in range(8) for line in pool[:6]]
+    content = "\n".join(lines) + "\n"
+    chunks, previous = parse_file(path, content, parser, language, token_budget=60)
+    for step in range(200):
+        new_lines = list(lines)
+        action = rng.random()
+        position = rng.randrange(len(new_lines) + 1)
+        if action < 0.4 and len(new_lines) > 3:
+            del new_lines[min(position, len(new_lines) - 1)]
+        elif action < 0.8:
+            new_lines.insert(position, rng.choice(pool).format(n=100 + step))
+        else:
+            new_lines[min(position, len(new_lines) - 1)] = rng.choice(pool).format(n=200 + step)
+        new = "\n".join(new_lines) + "\n"
+        chunks, previous = chunk_file_incremental(
+            path,
+            new,
+            parser,
+            language,
+            previous=previous,
+            line_edits=line_edits_from_diff(unified_diff(content, new)),
+            token_budget=60,
+        )
+        assert chunks == chunk_file_content(path, new, parser, language, token_budget=60), (seed, step)
+        lines, content = new_lines, new
@@ -0,0 +1,20 @@
+import gitrag.workers.ingestion_worker as worker
+
+
+def test_worker_serves_metrics_before_consuming(monkeypatch):
+    monkeypatch.setenv("WORKER_METRICS_PORT", "9123")
+    calls = []
+    monkeypatch.setattr(worker, "start_metrics_server", lambda port: calls.append(("metrics", port)))
+
+    class Loop:
+        def __init__(self, settings):
+            pass
+
+        def run(self, handler):
+            calls.append(("consume", None))
+
+    monkeypatch.setattr(worker, "KafkaConsumerLoop", Loop)
+
+    worker.main()
+
+    assert calls == [("metrics", 9123), ("consume", None)]